@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Inference CPU time on a synthetic flood with and without the prediction
+cache. The flood repeats a few Deauth frames from samples.csv with their
+timestamps advancing at `--rate` packets per second, scored in batches as
+the streaming pipeline does; verdicts are checked against the engine.
+
+    python -m benchmarks.bench_cache [--model src/ml_model/rf_attacks.joblib] [--packets 200000]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.ml_model.model import feature_cols, preprocess_matrix
+from src.ml_model.registry import get_registry
+from src.ml_model.cache import PredictionCache
+
+
+def flood(samples: pd.DataFrame, packets, rate, label="Deauth", frames=4):
+    """Feature matrix of `packets` replays of `frames` sample frames, `rate` packets per second."""
+    source = samples[samples['Label'] == label] if 'Label' in samples else samples
+    X = preprocess_matrix(source.head(frames), feature_cols)[np.arange(packets) % frames]
+    elapsed = np.arange(packets) / rate
+    X[:, feature_cols.index('frame.time_epoch')] += elapsed
+    X[:, feature_cols.index('frame.time_relative')] += elapsed
+    X[:, feature_cols.index('radiotap.timestamp.ts')] += elapsed * 1e6
+    return X
+
+
+def score(predictor, X, batch):
+    start = time.process_time()
+    labels = [predictor.predict(X[i:i + batch])[0] for i in range(0, len(X), batch)]
+    return np.concatenate(labels), time.process_time() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the prediction cache on a flood')
+    parser.add_argument('--model', default='src/ml_model/rf_attacks.joblib',
+                        help='Model to score with (default: src/ml_model/rf_attacks.joblib)')
+    parser.add_argument('--packets', type=int, default=200000,
+                        help='Flood length in packets (default: 200000)')
+    parser.add_argument('--rate', type=float, default=5000.0,
+                        help='Flood rate in packets per second (default: 5000)')
+    parser.add_argument('--batch', type=int, default=256,
+                        help='Inference batch size (default: 256)')
+    args = parser.parse_args()
+
+    engine = get_registry(args.model).engine
+    X = flood(pd.read_csv("samples.csv"), args.packets, args.rate)
+    cache = PredictionCache(engine, verify_rate=0.01)
+
+    expected, engine_cpu = score(engine, X, args.batch)
+    labels, cache_cpu = score(cache, X, args.batch)
+    print(f"verdicts equal: {(labels == expected).all()}")
+    print(f"engine: {engine_cpu:.2f} s CPU ({engine_cpu / len(X) * 1e6:.1f} us/packet)")
+    print(f"cache:  {cache_cpu:.2f} s CPU ({cache_cpu / len(X) * 1e6:.1f} us/packet)")
+    print(f"cache statistics: {cache.stats()}")
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Small-batch latency and memory of the compiled forest evaluator against
+sklearn's predict_proba, after checking the two agree on samples.csv.
+
+    python -m benchmarks.bench_compiled [--model src/ml_model/rf_attacks.joblib]
+"""
+import argparse
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import load
+
+from src.ml_model.model import feature_cols, preprocess_matrix
+from src.ml_model.compiled import compile_forest
+
+
+def median_ms(func, repeat):
+    func()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return np.median(times) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the compiled forest evaluator')
+    parser.add_argument('--model', default='src/ml_model/rf_attacks.joblib',
+                        help='Fitted forest (default: src/ml_model/rf_attacks.joblib)')
+    parser.add_argument('--repeat', type=int, default=200,
+                        help='Timed calls per batch size (default: 200)')
+    args = parser.parse_args()
+
+    rf_model = load(args.model)
+    start = time.perf_counter()
+    forest = compile_forest(rf_model)
+    print(f"compiled {len(forest.roots)} trees, {len(forest.nodes)} nodes in {(time.perf_counter() - start) * 1000:.1f} ms")
+    print(f"memory: {forest.nbytes / 2**10:.0f} KiB arrays vs {len(pickle.dumps(rf_model)) / 2**10:.0f} KiB pickled")
+
+    X = preprocess_matrix(pd.read_csv("samples.csv"), feature_cols)
+    frame = pd.DataFrame(X, columns=feature_cols)
+    expected = rf_model.predict_proba(frame)
+    labels, _, proba = forest.predict(X)
+    print(f"max |proba diff|: {np.abs(expected - proba).max():.3g}, "
+          f"labels equal: {(labels == rf_model.predict(frame)).all()}")
+
+    for rows in (1, 8, 16, 32, 64, 256):
+        compiled = median_ms(lambda: forest.predict_proba(X[:rows]), args.repeat)
+        sklearn = median_ms(lambda: rf_model.predict_proba(frame[:rows]), args.repeat)
+        print(f"{rows:4d} rows: compiled {compiled:7.3f} ms   sklearn {sklearn:7.3f} ms")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Processes spawned and rules installed for `--detections` block requests
+from `--attackers` distinct sources: one `iptables -A` per detection
+against the batched Firewall, with fake iptables/iptables-restore/ipset
+binaries that only record what they are given.
+
+    python -m benchmarks.bench_firewall [--detections 2000] [--attackers 50] [--no-ipset]
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import tempfile
+import time
+
+from src.mitigator.commands import run_command
+from src.mitigator.firewall import Firewall
+
+FAKE = """#!/bin/sh
+{{ echo "$(basename "$0") $*"; [ "$(basename "$0")" = iptables ] || sed 's/^/  /'; }} >> {log}
+[ "$1" = -C ] && exit 1
+exit 0
+"""
+
+
+def install_fakes(directory, log, ipset=True):
+    for name in ("iptables", "iptables-restore") + (("ipset",) if ipset else ()):
+        path = os.path.join(directory, name)
+        with open(path, "w") as f:
+            f.write(FAKE.format(log=log))
+        os.chmod(path, 0o755)
+    os.environ["PATH"] = directory + os.pathsep + os.environ["PATH"]
+
+
+def read_log(log):
+    with open(log) as f:
+        lines = f.read().splitlines()
+    open(log, "w").close()
+    return lines
+
+
+async def legacy(addresses):
+    for ip in addresses:
+        await run_command("iptables", "-A", "INPUT", "-s", ip, "-j", "DROP")
+
+
+async def batched(addresses, concurrency):
+    firewall = Firewall()
+    queue = list(addresses)
+
+    async def worker():
+        while queue:
+            await firewall.block(ip=queue.pop())
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return firewall
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the batched firewall backend')
+    parser.add_argument('--detections', type=int, default=2000, help='Block requests (default: 2000)')
+    parser.add_argument('--attackers', type=int, default=50, help='Distinct source IPs (default: 50)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrent mitigations (default: 4)')
+    parser.add_argument('--no-ipset', action='store_true', help='Leave ipset off PATH (iptables-restore only)')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    attackers = [f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" for i in range(1, args.attackers + 1)]
+    addresses = [rng.choice(attackers) for _ in range(args.detections)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        log = os.path.join(directory, "commands.log")
+        install_fakes(directory, log, ipset=not args.no_ipset)
+
+        start = time.perf_counter()
+        asyncio.run(legacy(addresses))
+        elapsed = time.perf_counter() - start
+        lines = read_log(log)
+        print(f"iptables -A: {elapsed:6.2f} s, {len(lines)} processes, {len(lines)} rules in INPUT")
+
+        start = time.perf_counter()
+        firewall = asyncio.run(batched(addresses, args.concurrency))
+        elapsed = time.perf_counter() - start
+        lines = read_log(log)
+        added = sum(re.match(r"\s+(add |-A WIDS-BLOCK -(s|m mac) )", line) is not None for line in lines)
+        print(f"Firewall:    {elapsed:6.2f} s, {firewall.processes} processes, {added} addresses added, "
+              f"{firewall.stats()}")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Packets/second of the built-in mmap radiotap decoder against tshark
+(`-T fields` + decoder.decode_block) on the same capture file.
+
+    python -m benchmarks.bench_native [capture.pcap] [-n 200000]
+
+Without a file, a radiotap pcap with beacon, deauth and data frames is
+synthesised first. The tshark side is skipped when tshark is not installed.
+"""
+import argparse
+import os
+import random
+import shutil
+import struct
+import subprocess
+import tempfile
+import time
+
+from src.packet_sniffer.decoder import decode_block
+from src.packet_sniffer.fields import capture_fields
+from src.packet_sniffer.radiotap import read_pcap
+from src.packet_sniffer.sniffer import build_command
+
+
+def _radiotap(rate, freq, signal, tsf):
+    # present: flags, rate, channel, dBm antsignal, timestamp
+    present = (1 << 1) | (1 << 2) | (1 << 3) | (1 << 5) | (1 << 22)
+    body = struct.pack('<BBHHb', 0x10, rate * 2, freq, 0x0140 if freq > 4000 else 0x00a0, signal)
+    body += b'\x00' * (-(8 + len(body)) % 8)
+    body += struct.pack('<QHBB', tsf, 0, 0x01, 0)
+    return struct.pack('<BBHI', 0, 0, 8 + len(body), present) + body
+
+
+def _dot11(subtype_byte, flags, a1, a2, a3, payload_len):
+    return (struct.pack('<BBH', subtype_byte, flags, 314) + a1 + a2 + a3 + struct.pack('<H', 1234 << 4)
+            + os.urandom(payload_len) + b'\x00' * 4)
+
+
+def write_pcap(path, count=200000, seed=0):
+    rng = random.Random(seed)
+    macs = [bytes(rng.randrange(256) for _ in range(6)) for _ in range(64)]
+    broadcast = b'\xff' * 6
+    epoch = 1608066236.0
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, 127))
+        for _ in range(count):
+            kind = rng.random()
+            if kind < 0.3:
+                frame = _dot11(0x80, 0, broadcast, macs[0], macs[0], 180)          # beacon
+            elif kind < 0.5:
+                frame = _dot11(0xc0, 0, broadcast, rng.choice(macs), macs[0], 2)  # deauth
+            else:
+                frame = _dot11(0x08, 0x01, macs[0], rng.choice(macs), broadcast, rng.randrange(40, 1500))
+            packet = _radiotap(rng.choice((1, 6, 24, 54)), rng.choice((2437, 5180)), -rng.randrange(30, 90),
+                               rng.randrange(1 << 40)) + frame
+            epoch += rng.random() / 1000
+            seconds, micros = int(epoch), int((epoch % 1) * 1e6)
+            f.write(struct.pack('<IIII', seconds, micros, len(packet), len(packet)) + packet)
+
+
+def native(path):
+    columns = read_pcap(path)
+    return len(columns['features'])
+
+
+def tshark(path):
+    fields = capture_fields()
+    cmd = build_command(fields=fields, pcap_file=path)
+    output = subprocess.run(cmd, capture_output=True, check=True).stdout
+    return len(decode_block(output, fields)['features'])
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    packets = func(*args)
+    return packets, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the built-in radiotap decoder')
+    parser.add_argument('pcap', nargs='?', default=None, help='radiotap pcap/pcapng file (default: synthesised)')
+    parser.add_argument('-n', '--packets', type=int, default=200000,
+                        help='Packets to synthesise when no file is given (default: 200000)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.pcap
+        if path is None:
+            path = os.path.join(tmp, 'synthetic.pcap')
+            write_pcap(path, args.packets)
+
+        packets, elapsed = timed(native, path)
+        print(f"built-in mmap decoder: {packets / elapsed:12,.0f} packets/s ({packets} packets)")
+        if shutil.which('tshark'):
+            packets, reference = timed(tshark, path)
+            print(f"tshark + decode_block: {packets / reference:12,.0f} packets/s ({elapsed and reference / elapsed:.1f}x slower)")
+        else:
+            print("tshark not installed, skipping the comparison")
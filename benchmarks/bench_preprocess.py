@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Time and peak memory per 1M rows of model.preprocess_matrix against the
+reindex / apply(to_numeric) / fillna / astype chain preprocess_capture
+used to run, after checking the two agree bit for bit on samples.csv.
+
+    python -m benchmarks.bench_preprocess [-n 1000000]
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from src.ml_model.model import DEFAULTS, feature_cols, preprocess_matrix
+
+
+def legacy_preprocess(df, feature_cols):
+    df = df.copy()
+    df = df.reindex(columns=feature_cols)
+    df = df.apply(pd.to_numeric, errors='coerce')
+    df = df.fillna(DEFAULTS)
+    df = df.astype('float64')
+    return df
+
+
+def same_bits(a, b):
+    return a.shape == b.shape and np.array_equal(a.view(np.uint64), b.view(np.uint64))
+
+
+def check(samples):
+    # As read (float columns) and as text with some holes and junk to coerce
+    text = samples.astype(str)
+    text.iloc[::7, 0] = ''
+    text.iloc[::11, 3] = 'n/a'
+    text.iloc[::13, 6] = '-'
+    text = text.drop(columns=feature_cols[-1])
+    for name, df in (("samples.csv", samples), ("samples.csv as text", text)):
+        expected = legacy_preprocess(df, feature_cols).to_numpy()
+        actual = preprocess_matrix(df, feature_cols)
+        print(f"{name:20s} bit-identical: {same_bits(expected, actual)}, C-order: {actual.flags.c_contiguous}")
+
+
+def measure(func, df):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(df, feature_cols)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark capture preprocessing')
+    parser.add_argument('-n', '--rows', type=int, default=1000000,
+                        help='Number of rows to preprocess (default: 1000000)')
+    args = parser.parse_args()
+
+    samples = pd.read_csv("samples.csv")
+    check(samples)
+
+    big = samples.sample(args.rows, replace=True, random_state=0).reset_index(drop=True)
+    scale = 1e6 / args.rows
+    for name, func in (("copy/reindex/apply/fillna/astype", legacy_preprocess),
+                       ("preprocess_matrix", preprocess_matrix)):
+        elapsed, peak = measure(func, big)
+        print(f"{name:34s} {elapsed * scale * 1000:8.1f} ms  {peak * scale / 2**20:8.1f} MiB peak per 1M rows")
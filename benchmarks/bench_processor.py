@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Per-packet cost of the pyshark row extraction in packet_processor: the old
+per-field split/join/hasattr/getattr loop with a writerow per packet against
+the compiled accessor table with batched writes. Dissection is done up
+front so only the extraction and CSV writing are timed.
+
+    python -m benchmarks.bench_processor [capture.pcap] [-n 20000]
+
+Without a capture file, packets are stand-ins built from samples.csv that
+expose their fields as layer attributes the way pyshark does.
+"""
+import argparse
+import csv
+import io
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import pandas as pd
+
+from src.packet_sniffer.fields import capture_fields
+from src.packet_sniffer.packet_processor import compile_fields
+
+
+def load_capture(pcap_file, count):
+    import pyshark
+
+    capture = pyshark.FileCapture(pcap_file)
+    packets = []
+    for packet in capture:
+        packets.append(packet)
+        if len(packets) >= count:
+            break
+    capture.close()
+    return packets
+
+
+def synthesize_packets(fields, samples_csv="samples.csv", count=20000):
+    samples = pd.read_csv(samples_csv)
+    samples['wlan.sa'] = samples['wlan.ra']
+    records = samples.reindex(columns=fields).astype(object).fillna('').astype(str).to_dict('records')
+    packets = []
+    for record in records:
+        layers = {}
+        for field, value in record.items():
+            layer_name, _, attr_name = field.partition('.')
+            layer_name = 'frame_info' if layer_name == 'frame' else layer_name
+            layers.setdefault(layer_name, {})[attr_name.replace('.', '_')] = value
+        packet = SimpleNamespace(**{name: SimpleNamespace(**attrs) for name, attrs in layers.items()})
+        packet.sniff_timestamp = record.get('frame.time_epoch', '')
+        packets.append(packet)
+    return (packets * (count // len(packets) + 1))[:count]
+
+
+def legacy_loop(packets, fields):
+    with io.StringIO() as csvfile:
+        writer = csv.writer(csvfile)
+        for counter, packet in enumerate(packets, start=1):
+            row_data = [datetime.now().isoformat()]
+            for field in fields:
+                try:
+                    parts = field.split('.')
+                    layer_name = parts[0]
+                    if layer_name == 'frame' and hasattr(packet, 'frame_info'):
+                        value = getattr(packet.frame_info, '_'.join(parts[1:]), '')
+                    elif hasattr(packet, layer_name):
+                        layer = getattr(packet, layer_name)
+                        value = getattr(layer, '_'.join(parts[1:]), '')
+                    else:
+                        value = ''
+                except (AttributeError, IndexError):
+                    value = ''
+                row_data.append(value)
+            writer.writerow(row_data)
+            if counter % 10 == 0:
+                csvfile.flush()
+
+
+def compiled_loop(packets, fields, batch_size=1000):
+    extract = compile_fields(fields)
+    with io.StringIO() as csvfile:
+        writer = csv.writer(csvfile)
+        rows = []
+        for packet in packets:
+            rows.append(extract(packet, packet.sniff_timestamp))
+            if len(rows) >= batch_size:
+                writer.writerows(rows)
+                csvfile.flush()
+                rows.clear()
+        writer.writerows(rows)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark packet_processor field extraction')
+    parser.add_argument('pcap', nargs='?', default=None,
+                        help='Recorded capture to dissect with pyshark (default: samples.csv stand-ins)')
+    parser.add_argument('-n', '--packets', type=int, default=20000,
+                        help='Number of packets (default: 20000)')
+    args = parser.parse_args()
+
+    fields = capture_fields()
+    if args.pcap:
+        packets = load_capture(args.pcap, args.packets)
+    else:
+        packets = synthesize_packets(fields, count=args.packets)
+
+    legacy = timed(legacy_loop, packets, fields)
+    fast = timed(compiled_loop, packets, fields)
+    print(f"{len(packets)} packets, {len(fields)} fields")
+    print(f"per-field split/getattr loop: {legacy / len(packets) * 1e6:8.2f} us/packet")
+    print(f"compiled accessor table:      {fast / len(packets) * 1e6:8.2f} us/packet ({legacy / fast:.1f}x)")
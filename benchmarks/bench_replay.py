@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput of the streaming pipeline on a recorded capture:
+tshark replay -> decode -> batching -> inference, without mitigation or database
+writes, so runs are repeatable on any Linux box with tshark installed.
+
+    python -m benchmarks.bench_replay capture.pcapng [--speed 10] [--model src/ml_model/rf_attacks.joblib]
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+import src.packet_sniffer.sniffer as sniffer
+from src.packet_sniffer.fields import capture_fields
+from src.ml_model.registry import get_registry
+from src.pipeline.batcher import AdaptiveBatcher
+from src.pipeline.stream import feature_stage, inference_stage
+
+
+async def drain(in_queue: asyncio.Queue, latencies: list, batcher):
+    packets = 0
+    while (batch := await in_queue.get()) is not None:
+        batcher.observe(batch)
+        packets += batch.size
+        latencies.append((time.monotonic() - batch.captured_at) * 1000)
+    return packets
+
+
+async def replay(pcap_file, model_path, speed=None, queue_size=64, tshark="tshark", target_p99_ms=100.0):
+    registry = get_registry(model_path)
+    fields = capture_fields(registry.engine.rf_model)
+    capture = sniffer.AsyncCapture(fields=fields, queue_size=queue_size, tshark=tshark,
+                                   pcap_file=pcap_file, speed=speed, drop_when_full=bool(speed))
+    batcher = AdaptiveBatcher(target_p99_ms=target_p99_ms)
+    feature_queue = asyncio.Queue(maxsize=queue_size)
+    batch_queue = asyncio.Queue(maxsize=queue_size)
+    scored_queue = asyncio.Queue(maxsize=queue_size)
+    latencies = []
+
+    start = time.perf_counter()
+    *_, packets = await asyncio.gather(
+        capture.run(),
+        feature_stage(capture.queue, feature_queue, fields),
+        batcher.run(feature_queue, batch_queue),
+        inference_stage(batch_queue, scored_queue, registry),
+        drain(scored_queue, latencies, batcher),
+    )
+    elapsed = time.perf_counter() - start
+    return packets, elapsed, latencies, capture.stats(), batcher.stats()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the streaming pipeline on a pcap replay')
+    parser.add_argument('pcap', help='pcap/pcapng file to replay')
+    parser.add_argument('--model', default='src/ml_model/rf_attacks.joblib',
+                        help='Model to score with (default: src/ml_model/rf_attacks.joblib)')
+    parser.add_argument('--speed', type=float, default=None,
+                        help='Replay at original timing times this factor (default: as fast as possible)')
+    parser.add_argument('--p99-ms', type=float, default=100.0,
+                        help='Latency target of the adaptive batcher (default: 100)')
+    parser.add_argument('--tshark', default='tshark', help='tshark binary to run')
+    args = parser.parse_args()
+
+    packets, elapsed, latencies, stats, batching = asyncio.run(
+        replay(args.pcap, args.model, speed=args.speed, tshark=args.tshark, target_p99_ms=args.p99_ms))
+    print(f"{packets} packets in {elapsed:.2f}s: {packets / elapsed:,.0f} packets/s")
+    if latencies:
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print(f"batch capture-to-verdict latency: p50 {p50:.1f} ms, p99 {p99:.1f} ms over {len(latencies)} batches")
+    print(f"capture: {stats}")
+    print(f"batching: {batching}")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Time to first prediction and memory per worker process for a
+joblib-pickled forest against the memory-mapped compiled artifact.
+
+    python -m benchmarks.bench_startup [--model src/ml_model/rf_attacks.joblib] [-w 4]
+
+The artifact is converted into a temporary directory when --forest is
+not given. Workers start one after another and stay alive until all have
+reported, so PSS (RSS with shared pages divided among the processes
+mapping them) shows what each really costs.
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+
+def memory_kib():
+    """(RSS, PSS) of this process in KiB; PSS is None without smaps_rollup."""
+    rss = pss = None
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                rss = int(line.split()[1])
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    pss = int(line.split()[1])
+    except OSError:
+        pass
+    return rss, pss
+
+
+def worker(mode, path, results, done):
+    start = time.perf_counter()
+    import numpy as np
+    from src.ml_model.inference import InferenceEngine
+    if mode == "joblib":
+        from joblib import load
+        model = load(path)
+    else:
+        from src.ml_model.compiled import load_forest
+        model = load_forest(path, mmap_mode='r')
+    engine = InferenceEngine(model, n_threads=1)
+    engine.predict(np.zeros((1, engine.n_features)))
+    first_prediction = time.perf_counter() - start
+
+    # Score spread-out rows so the node pages are touched before measuring,
+    # in small batches to keep evaluation buffers out of the numbers
+    rng = np.random.default_rng(0)
+    for _ in range(16):
+        engine.predict(rng.normal(size=(256, engine.n_features)) * 1e9)
+    rss, pss = memory_kib()
+    results.put((first_prediction, rss, pss))
+    done.wait()
+
+
+def run(mode, path, workers):
+    context = multiprocessing.get_context('spawn')
+    results, done = context.Queue(), context.Event()
+    processes, measured = [], []
+    for _ in range(workers):
+        # One at a time so start-up is timed without contention
+        process = context.Process(target=worker, args=(mode, path, results, done))
+        process.start()
+        processes.append(process)
+        measured.append(results.get())
+    done.set()
+    for process in processes:
+        process.join()
+    return measured
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark model startup and per-process memory')
+    parser.add_argument('--model', default='src/ml_model/rf_attacks.joblib',
+                        help='joblib forest (default: src/ml_model/rf_attacks.joblib)')
+    parser.add_argument('--forest', default=None,
+                        help='Compiled artifact directory (default: converted from --model)')
+    parser.add_argument('-w', '--workers', type=int, default=4,
+                        help='Worker processes loading the model at once (default: 4)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        forest_path = args.forest
+        if forest_path is None:
+            from joblib import load
+            from src.ml_model.compiled import compile_forest, save_forest
+            forest_path = os.path.join(tmp, "model.forest")
+            save_forest(compile_forest(load(args.model)), forest_path)
+
+        print(f"{args.workers} workers, joblib {os.path.getsize(args.model) / 2**20:.1f} MiB")
+        for mode, path in (("joblib", args.model), ("mmap", forest_path)):
+            measured = run(mode, path, args.workers)
+            first = sorted(m[0] for m in measured)
+            rss = sum(m[1] for m in measured) / len(measured) / 1024
+            pss = [m[2] for m in measured]
+            pss = f"{sum(pss) / len(pss) / 1024:7.1f} MiB" if None not in pss else "    n/a"
+            print(f"{mode:6s}: first prediction {first[len(first) // 2] * 1000:7.1f} ms (median), "
+                  f"RSS {rss:7.1f} MiB, PSS {pss} per worker")
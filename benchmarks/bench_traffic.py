@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+tc processes spawned for `--detections` rate-limit requests from
+`--clients` distinct sources: three `tc` calls per detection against the
+batched TrafficControl, with a fake tc that only records what it is given.
+
+    python -m benchmarks.bench_traffic [--detections 2000] [--clients 200]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from src.mitigator.commands import run_command
+from src.mitigator.traffic import TrafficControl
+
+FAKE = """#!/bin/sh
+{{ echo "tc $*"; [ "$1" = -batch ] && sed 's/^/  /'; }} >> {log}
+exit 0
+"""
+
+
+async def legacy(clients, rate="512kbit", interface="wlo1"):
+    for ip in clients:
+        await run_command("tc", "qdisc", "add", "dev", interface, "root", "handle", "1:", "htb")
+        await run_command("tc", "class", "add", "dev", interface, "parent", "1:", "classid", "1:1",
+                          "htb", "rate", rate)
+        await run_command("tc", "filter", "add", "dev", interface, "protocol", "ip", "parent", "1:0",
+                          "prio", "1", "u32", "match", "ip", "src", ip, "flowid", "1:1")
+
+
+async def batched(clients, concurrency, rate="512kbit"):
+    traffic = TrafficControl()
+    queue = list(clients)
+
+    async def worker():
+        while queue:
+            await traffic.limit(queue.pop(), rate=rate)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return traffic
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the batched traffic-control manager')
+    parser.add_argument('--detections', type=int, default=2000, help='Rate-limit requests (default: 2000)')
+    parser.add_argument('--clients', type=int, default=200, help='Distinct source IPs (default: 200)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrent mitigations (default: 4)')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    clients = [f"10.0.{i // 256 % 256}.{i % 256}" for i in range(1, args.clients + 1)]
+    requests = [rng.choice(clients) for _ in range(args.detections)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        log = os.path.join(directory, "commands.log")
+        with open(os.path.join(directory, "tc"), "w") as f:
+            f.write(FAKE.format(log=log))
+        os.chmod(os.path.join(directory, "tc"), 0o755)
+        os.environ["PATH"] = directory + os.pathsep + os.environ["PATH"]
+
+        start = time.perf_counter()
+        asyncio.run(legacy(requests))
+        elapsed = time.perf_counter() - start
+        print(f"tc per call:    {elapsed:6.2f} s, {3 * len(requests)} processes, "
+              f"{len(requests)} filters on one shared class")
+
+        start = time.perf_counter()
+        traffic = asyncio.run(batched(requests, args.concurrency))
+        elapsed = time.perf_counter() - start
+        print(f"TrafficControl: {elapsed:6.2f} s, {traffic.processes} processes, {traffic.stats()}")
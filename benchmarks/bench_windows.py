@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Per-packet cost of the per-source sliding windows against recomputing the
+same counts from the retained DataFrame on every batch, on synthetic
+traffic from `--sources` stations.
+
+    python -m benchmarks.bench_windows [--packets 200000] [--batch 512]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.pipeline.aggregator import SourceWindows, WINDOW_COLUMNS
+
+
+def traffic(packets, sources, rate, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        'wlan.sa': rng.integers(1, sources + 1, packets).astype(np.uint64),
+        'frame.time_epoch': 1.6e9 + np.arange(packets) / rate,
+        'wlan.fc.type': rng.choice([0.0, 2.0], packets, p=[0.2, 0.8]),
+        'wlan.fc.subtype': rng.integers(0, 16, packets).astype(np.float64),
+        'wlan_radio.signal_dbm': rng.normal(-50, 5, packets).round(),
+    }
+
+
+def recompute(history: pd.DataFrame, batch: pd.DataFrame, window_s, n_buckets=10):
+    """Frames per source in the window of the batch's newest bucket, from the whole history."""
+    bucket_s = window_s / n_buckets
+    buckets = np.floor(history['frame.time_epoch'] / bucket_s)
+    recent = history[buckets > np.floor(batch['frame.time_epoch'].max() / bucket_s) - n_buckets]
+    return batch['wlan.sa'].map(recent.groupby('wlan.sa').size())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the per-source sliding windows')
+    parser.add_argument('--packets', type=int, default=200000, help='Packets (default: 200000)')
+    parser.add_argument('--sources', type=int, default=2000, help='Distinct sources (default: 2000)')
+    parser.add_argument('--rate', type=float, default=5000.0, help='Packets per second (default: 5000)')
+    parser.add_argument('--batch', type=int, default=512, help='Batch size (default: 512)')
+    parser.add_argument('--window-s', type=float, default=10.0, help='Window length (default: 10)')
+    args = parser.parse_args()
+
+    columns = traffic(args.packets, args.sources, args.rate)
+    windows = SourceWindows(window_s=args.window_s)
+    start = time.perf_counter()
+    for i in range(0, args.packets, args.batch):
+        batch = {name: values[i:i + args.batch] for name, values in columns.items()}
+        features = windows.update(batch['wlan.sa'], batch['frame.time_epoch'], batch['wlan.fc.type'],
+                                  batch['wlan.fc.subtype'], batch['wlan_radio.signal_dbm'])
+    elapsed = time.perf_counter() - start
+    print(f"windows:   {elapsed / args.packets * 1e6:6.2f} us/packet, {windows.stats()}")
+
+    # The naive version only counts frames, over the history kept so far;
+    # its cost per batch grows with the capture
+    frame = pd.DataFrame(columns)
+    for history in (args.packets // 10, args.packets):
+        end = history - history % args.batch
+        start = time.perf_counter()
+        for i in range(end - 10 * args.batch, end, args.batch):
+            counts = recompute(frame.iloc[:i + args.batch], frame.iloc[i:i + args.batch], args.window_s)
+        elapsed = time.perf_counter() - start
+        print(f"recompute: {elapsed / (10 * args.batch) * 1e6:6.2f} us/packet after {history} packets")
+    tail = (args.packets - 1) // args.batch * args.batch
+    expected = recompute(frame, frame.iloc[tail:], args.window_s).to_numpy()
+    print(f"last batch frame counts equal: {(features[:, WINDOW_COLUMNS.index('window.frames')] == expected).all()}")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Rows/second of in-process inference against InferencePool with 1..N
+worker processes, on a flood of micro-batches resampled from samples.csv.
+
+    python -m benchmarks.bench_workers [--model src/ml_model/rf_attacks.joblib] [-n 200000] [--batch 512]
+"""
+import argparse
+import os
+import time
+from collections import deque
+
+import pandas as pd
+
+from src.ml_model.model import feature_cols, preprocess_matrix
+from src.ml_model.registry import get_registry
+from src.ml_model.workers import InferencePool
+
+
+def in_process(engine, batches):
+    for X in batches:
+        engine.predict(X)
+
+
+def pooled(pool, batches):
+    # Keep every slot busy, collecting results in submission order
+    pending = deque()
+    for X in batches:
+        if not pool.free_slots():
+            pool.result(pending.popleft())
+        pending.append(pool.submit(X))
+    while pending:
+        pool.result(pending.popleft())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark multi-process inference')
+    parser.add_argument('--model', default='src/ml_model/rf_attacks.joblib',
+                        help='Model artifact (default: src/ml_model/rf_attacks.joblib)')
+    parser.add_argument('-n', '--rows', type=int, default=200000,
+                        help='Rows to score (default: 200000)')
+    parser.add_argument('--batch', type=int, default=512,
+                        help='Rows per micro-batch (default: 512)')
+    parser.add_argument('-w', '--max-workers', type=int, default=os.cpu_count(),
+                        help='Largest worker count to try (default: all cores)')
+    args = parser.parse_args()
+
+    engine = get_registry(args.model, n_threads=1).engine
+    samples = pd.read_csv("samples.csv").sample(args.rows, replace=True, random_state=0)
+    X = preprocess_matrix(samples, feature_cols)
+    batches = [X[start:start + args.batch] for start in range(0, len(X), args.batch)]
+
+    start = time.perf_counter()
+    in_process(engine, batches)
+    base = len(X) / (time.perf_counter() - start)
+    print(f"{os.cpu_count()} cores, {len(batches)} batches of {args.batch} rows")
+    print(f"in-process:   {base:10,.0f} rows/s")
+
+    for workers in sorted({1, 2, 4, 8, args.max_workers} & set(range(1, args.max_workers + 1))):
+        pool = InferencePool(engine, n_workers=workers, slot_rows=args.batch)
+        start = time.perf_counter()
+        pooled(pool, batches)
+        rate = len(X) / (time.perf_counter() - start)
+        pool.close()
+        print(f"{workers:2d} workers:   {rate:10,.0f} rows/s ({rate / base:.2f}x)")
@@ -1,16 +1,21 @@
+import argparse
 import asyncio
 import src.packet_sniffer.sniffer as sniffer
 import src.ml_model.model as model
 import src.mitigator.mitigator as mitigator
-import src.utils.database as database
+from src.mitigator.executor import MitigationExecutor
+import src.pipeline.stream as stream
 from src.utils.utils import *
 import csv
 
-async def run_pipeline():
+async def run_pipeline(interface="wlo1", pcap_file=None, speed=None, model_path='src/ml_model/rf_attacks.joblib',
+                       workers=None, cache_size=0, cache_verify=0.0,
+                       suppress_ttl=mitigator.SUPPRESS_TTL, mitigation_workers=4,
+                       action_timeout=mitigator.ACTION_TIMEOUT):
     # Step 1: Capture network packets
     print("Capturing network packets...")
     sniffer.capture_packets(
-        interface="wlo1", output_file="captured_packets.csv")
+        interface=interface, output_file="captured_packets.csv", pcap_file=pcap_file, speed=speed)
 
     # Step 2: Concatenate 'samples.csv' and 'captured_packets.csv' with relevant columns
     print("Concatenating samples.csv and captured_packets.csv...")
@@ -24,42 +29,136 @@ async def run_pipeline():
     print("Running predictions...")
     model.make_predictions(
         input_csv="concatenated_file.csv",
-        model_path='src/ml_model/rf_attacks.joblib',
-        output_csv='predictions.csv'
+        model_path=model_path,
+        output_csv='predictions.csv',
+        workers=workers,
+        cache_size=cache_size,
+        cache_verify=cache_verify
     )
 
     # Step 4: Apply mitigations based on predictions
     print("Applying mitigations...")
-    mitigator_instance = mitigator.Mitigator()
+    mitigator_instance = mitigator.Mitigator(suppress_ttl=suppress_ttl, action_timeout=action_timeout)
+    executor = None
+    if mitigation_workers:
+        executor = MitigationExecutor(mitigator_instance, workers=mitigation_workers, timeout=2 * action_timeout,
+                                      on_done=stream.record_threat)
 
     predictions = model.load_predictions('predictions.csv')
+    await stream.handle_predictions(predictions, mitigator_instance, executor)
+    if executor is not None:
+        await executor.close()
+        print(f"Mitigation statistics: {executor.stats()}")
 
-    for _, prediction in predictions.iterrows():
-        threat_type = prediction['predictions']
+    # Step 5: Clean up mitigations (optional)
+    # mitigator_instance.reset_mitigations()
 
-        if threat_type == 'Normal':
-            print("No threat detected.")
-            continue
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='WLAN attack detection and mitigation pipeline')
 
-        packet_details = prediction.to_dict()
-        packet_details['ip'] = retrieve_ip(packet_details['wlan.sa'])
+    parser.add_argument('--stream', action='store_true',
+                        help='Run capture, inference and mitigation continuously on in-memory micro-batches')
 
-        # Handle the threat based on the prediction
-        actions = await mitigator_instance.handle_threat(threat_type, packet_details)
-        print(f"Actions taken for {threat_type}: {actions}")
+    parser.add_argument('-i', '--interface', default='wlo1',
+                        help='Network interface to capture from (default: wlo1)')
 
-        # Insert the threat and its details into the database
-        database.insert_threat(
-            threat_type=threat_type,
-            packet=packet_details,
-            confidence=prediction['confidence'],
-            actions=actions
-        )
-        message = f"{threat_type} detected from {packet_details['ip']} — countermeasures deployed."
-        database.insert_log(message)
+    parser.add_argument('-r', '--read', default=None,
+                        help='Replay a pcap/pcapng file instead of capturing live')
 
-    # Step 5: Clean up mitigations (optional)
-    # mitigator_instance.reset_mitigations()
+    parser.add_argument('--speed', type=float, default=None,
+                        help='Replay at original timing times this factor (default: as fast as possible)')
 
-if __name__ == "__main__":
-    asyncio.run(run_pipeline())
+    parser.add_argument('--backend', choices=['tshark', 'native'], default='tshark',
+                        help='Streaming capture backend: tshark, or the built-in radiotap decoder (default: tshark)')
+
+    parser.add_argument('-m', '--model', default='src/ml_model/rf_attacks.joblib',
+                        help='joblib model, or a forest directory from src.ml_model.compiled (default: src/ml_model/rf_attacks.joblib)')
+
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='Run inference in this many worker processes (default: in-process)')
+
+    parser.add_argument('--cache-size', type=int, default=0,
+                        help='Remember the verdicts of this many distinct feature vectors (default: 0, no cache)')
+
+    parser.add_argument('--cache-verify', type=float, default=0.0,
+                        help='Fraction of cache hits re-scored to check the cached verdict (default: 0)')
+
+    parser.add_argument('--known-bssid', action='append', default=[],
+                        help='Trusted AP whose --prefilter-type frames skip the model when streaming (repeatable)')
+
+    parser.add_argument('--prefilter-type', action='append', default=[],
+                        help='type:subtype of the frames of trusted APs that skip the model, '
+                             'not a management type (repeatable, default: none)')
+
+    parser.add_argument('--prefilter-max-rate', type=float, default=50.0,
+                        help='Frames per second above which a source is always scored (default: 50)')
+
+    parser.add_argument('--window-s', type=float, default=None,
+                        help='Add per-source sliding-window features over this many seconds when streaming')
+
+    parser.add_argument('--shed-latency-ms', type=float, default=500.0,
+                        help='Start sampling per source when decoded blocks are this old; 0 disables (default: 500)')
+
+    parser.add_argument('--suppress-ttl', type=float, default=60.0,
+                        help='Seconds a mitigated threat is not mitigated again for the same source; 0 disables (default: 60)')
+
+    parser.add_argument('--mitigation-workers', type=int, default=4,
+                        help='Threats mitigated concurrently, in order per source; 0 mitigates one at a time (default: 4)')
+
+    parser.add_argument('--action-timeout', type=float, default=30.0,
+                        help='Seconds a mitigation command may run before it is killed (default: 30)')
+
+    parser.add_argument('-d', '--duration', type=int, default=None,
+                        help='Stop streaming after this many seconds (default: run until interrupted)')
+
+    parser.add_argument('--queue-size', type=int, default=64,
+                        help='Micro-batches buffered between streaming stages before capture drops (default: 64)')
+
+    parser.add_argument('--max-batch', type=int, default=4096,
+                        help='Largest streaming inference batch in packets (default: 4096)')
+
+    parser.add_argument('--deadline-ms', type=float, default=20.0,
+                        help='Longest a packet waits for its streaming batch to fill (default: 20)')
+
+    parser.add_argument('--p99-ms', type=float, default=100.0,
+                        help='p99 capture-to-verdict latency the streaming batch size is tuned for (default: 100)')
+
+    parser.add_argument('-e', '--extra-field', action='append', default=[],
+                        help='Extra tshark field to capture besides the model features (repeatable)')
+
+    parser.add_argument('-o', '--output', default=None,
+                        help='Optional CSV file receiving the streamed predictions')
+
+    args = parser.parse_args()
+
+    if args.stream:
+        asyncio.run(stream.run_stream(
+            interface=args.interface,
+            model_path=args.model,
+            queue_size=args.queue_size,
+            duration=args.duration,
+            output_csv=args.output,
+            extras=args.extra_field,
+            pcap_file=args.read,
+            speed=args.speed,
+            backend=args.backend,
+            workers=args.workers,
+            max_batch=args.max_batch,
+            deadline_ms=args.deadline_ms,
+            target_p99_ms=args.p99_ms,
+            cache_size=args.cache_size,
+            cache_verify=args.cache_verify,
+            known_bssids=args.known_bssid,
+            prefilter_types=[tuple(int(part) for part in value.split(':')) for value in args.prefilter_type],
+            prefilter_max_rate=args.prefilter_max_rate,
+            window_s=args.window_s,
+            shed_latency_ms=args.shed_latency_ms,
+            suppress_ttl=args.suppress_ttl,
+            mitigation_workers=args.mitigation_workers,
+            action_timeout=args.action_timeout
+        ))
+    else:
+        asyncio.run(run_pipeline(interface=args.interface, pcap_file=args.read, speed=args.speed,
+                                 model_path=args.model, workers=args.workers, cache_size=args.cache_size,
+                                 cache_verify=args.cache_verify, suppress_ttl=args.suppress_ttl,
+                                 mitigation_workers=args.mitigation_workers, action_timeout=args.action_timeout))
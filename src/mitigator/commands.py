@@ -0,0 +1,30 @@
+import asyncio
+import logging
+
+# Seconds a mitigation command may run before it is killed
+ACTION_TIMEOUT = 30.0
+
+
+async def run_command(*args, input=None, timeout=ACTION_TIMEOUT):
+    """
+    Run a mitigation command, feeding it `input` (text) on stdin, and return
+    (returncode, stdout, stderr). The process is killed when it runs longer
+    than `timeout` seconds (asyncio.TimeoutError is raised) or the caller is
+    cancelled.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdin=asyncio.subprocess.PIPE if input is not None else None,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(
+            process.communicate(input.encode() if input is not None else None), timeout)
+    except BaseException:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+            logging.warning(f"Command killed: {' '.join(args)}")
+        raise
+    return process.returncode, stdout, stderr
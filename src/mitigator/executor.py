@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from src.mitigator.mitigator import threat_target
+
+# Latency samples kept for the percentiles in stats()
+LATENCY_SAMPLES = 4096
+
+# Tells a worker to stop; targets themselves may be None (no MAC, no IP)
+_STOP = object()
+
+
+class MitigationExecutor:
+    """
+    Runs Mitigator.handle_threat for many threats at once.
+
+    Threats are queued per target (threat_target(): the source MAC, else
+    the IP; threats with neither share one target) and `workers` tasks
+    take turns on the targets with work waiting, one threat at a time per
+    target: threats against different targets are mitigated concurrently,
+    those against one target strictly in submission order. A mitigation
+    running longer than `timeout` seconds is cancelled (its commands are
+    killed, see run_command) and reported with no actions.
+    `on_done(threat_type, packet, actions)` is called after each one, in
+    the same per-target order.
+
+    submit() waits while `max_pending` threats are queued, so a mitigation
+    backlog slows the caller down instead of growing without bound. Queue
+    wait (submission to start) and execution time are reported by stats().
+    """
+
+    def __init__(self, mitigator_instance, workers=4, timeout=60.0, max_pending=1024, on_done=None):
+        self.mitigator = mitigator_instance
+        self.workers = workers
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.on_done = on_done
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.max_pending_seen = 0
+        self._targets = OrderedDict()
+        self._ready = None
+        self._tasks = []
+        self._pending = 0
+        self._space = None
+        self._idle = None
+        self._queue_wait = deque(maxlen=LATENCY_SAMPLES)
+        self._execution = deque(maxlen=LATENCY_SAMPLES)
+
+    def _start(self):
+        self._ready = asyncio.Queue()
+        self._space = asyncio.Condition()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def submit(self, threat_type, packet):
+        """Queue a threat for mitigation."""
+        if self._ready is None:
+            self._start()
+        async with self._space:
+            await self._space.wait_for(lambda: self._pending < self.max_pending)
+            self._pending += 1
+        self.max_pending_seen = max(self.max_pending_seen, self._pending)
+        self._idle.clear()
+        self.submitted += 1
+
+        target = threat_target(packet)
+        queue = self._targets.get(target)
+        if queue is None:
+            # No threat of this target queued or running: it becomes ready
+            queue = self._targets[target] = deque()
+            self._ready.put_nowait(target)
+        queue.append((threat_type, packet, time.monotonic()))
+
+    async def _work(self):
+        while (target := await self._ready.get()) is not _STOP:
+            queue = self._targets[target]
+            threat_type, packet, submitted_at = queue[0]
+            started_at = time.monotonic()
+            self._queue_wait.append(started_at - submitted_at)
+            await self._run(threat_type, packet)
+            self._execution.append(time.monotonic() - started_at)
+
+            queue.popleft()
+            if queue:
+                # Back of the line, so one busy target cannot hold a worker
+                self._ready.put_nowait(target)
+            else:
+                del self._targets[target]
+            async with self._space:
+                self._pending -= 1
+                self._space.notify_all()
+            if not self._pending:
+                self._idle.set()
+
+    async def _run(self, threat_type, packet):
+        try:
+            actions = await asyncio.wait_for(self.mitigator.handle_threat(threat_type, packet), self.timeout)
+            self.completed += 1
+        except asyncio.TimeoutError:
+            logging.warning(f"Mitigation of {threat_type} timed out after {self.timeout} s")
+            print(f"Mitigation of {threat_type} timed out after {self.timeout} s")
+            self.timeouts += 1
+            actions = []
+        except Exception as e:
+            print(f"Mitigation of {threat_type} failed: {e}")
+            self.failed += 1
+            actions = []
+        if self.on_done is not None:
+            try:
+                await self.on_done(threat_type, packet, actions)
+            except Exception as e:
+                print(f"Failed to record {threat_type} mitigation: {e}")
+
+    async def join(self):
+        """Wait until every submitted threat has been handled."""
+        if self._idle is not None:
+            await self._idle.wait()
+
+    async def close(self):
+        """join(), then stop the workers."""
+        if self._ready is None:
+            return
+        await self.join()
+        for _ in self._tasks:
+            self._ready.put_nowait(_STOP)
+        await asyncio.gather(*self._tasks)
+        self._ready = None
+
+    @staticmethod
+    def _percentiles(samples):
+        if not samples:
+            return None
+        ms = np.array(samples) * 1000
+        return {"p50": float(np.percentile(ms, 50)), "p99": float(np.percentile(ms, 99)), "max": float(ms.max())}
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "pending": self._pending,
+            "max_pending": self.max_pending_seen,
+            "queue_wait_ms": self._percentiles(self._queue_wait),
+            "execution_ms": self._percentiles(self._execution),
+        }
@@ -0,0 +1,237 @@
+# firewall.py
+"""
+Blocklist behind ActionHandler.block.
+
+Blocked addresses are members of two ipset hash sets, one of IPv4
+addresses and one of MACs, matched by the two rules of a dedicated chain
+jumped to from INPUT: the kernel checks a packet against the whole list
+with one hash lookup per set, however many addresses it holds. Without
+ipset the chain holds one rule per address instead.
+
+The Firewall keeps the blocklist in memory and only sends the kernel what
+changed, batching the detections of a short interval into a single
+`ipset restore` (or `iptables-restore --noflush`) call. Commands are looked
+up on PATH when a batch is committed, so pointing PATH at fake binaries
+that record their arguments and stdin is enough to test it.
+"""
+import asyncio
+import ipaddress
+import shutil
+import subprocess
+
+from src.mitigator.commands import ACTION_TIMEOUT, run_command
+from src.utils.mac import NO_MAC, int_to_mac, mac_to_int
+
+CHAIN = "WIDS-BLOCK"
+IP_SET = "wids-block-ip"
+MAC_SET = "wids-block-mac"
+
+
+def _check(result, command):
+    returncode, _, stderr = result
+    if returncode != 0:
+        raise RuntimeError(f"{command} failed: {stderr.decode(errors='replace').strip()}")
+
+
+class Firewall:
+    """
+    Set of blocked IPs and MACs mirrored into netfilter.
+
+    block() and unblock() change the wanted state and wait for the commit
+    that applies it: the first change schedules one `batch_delay` seconds
+    later, and every change made meanwhile goes into the same call. A
+    commit applies the difference between the wanted state and what was
+    last applied, so blocking an address twice costs nothing. The chain,
+    the sets and the jump from `parent` are (re)created with the full
+    state on the first commit and after a failed one. With neither
+    iptables-restore nor ipset on PATH, commits are only simulated.
+    """
+
+    def __init__(self, chain=CHAIN, ip_set=IP_SET, mac_set=MAC_SET, parent="INPUT", batch_delay=0.05,
+                 timeout=ACTION_TIMEOUT):
+        self.chain = chain
+        self.sets = {"ip": ip_set, "mac": mac_set}
+        self.parent = parent
+        self.batch_delay = batch_delay
+        self.timeout = timeout
+        self.wanted = {"ip": set(), "mac": set()}
+        self.applied = {"ip": set(), "mac": set()}
+        self.backend = None
+        self.commits = 0
+        self.failed_commits = 0
+        self.processes = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self._ready = False
+        self._lock = asyncio.Lock()
+        self._commit_task = None
+
+    @staticmethod
+    def _normalize(ip=None, mac=None):
+        """[(kind, address)] in canonical form; ValueError for a malformed address."""
+        entries = []
+        if ip is not None:
+            entries.append(("ip", str(ipaddress.IPv4Address(str(ip)))))
+        if mac is not None:
+            value = mac_to_int(mac.lower()) if isinstance(mac, str) else int(mac)
+            if value == NO_MAC:
+                raise ValueError(f"invalid MAC address: {mac!r}")
+            entries.append(("mac", int_to_mac(value)))
+        return entries
+
+    def is_blocked(self, ip=None, mac=None) -> bool:
+        """Whether every address given is on the blocklist."""
+        try:
+            entries = self._normalize(ip, mac)
+        except ValueError:
+            return False
+        return bool(entries) and all(address in self.wanted[kind] for kind, address in entries)
+
+    async def block(self, ip=None, mac=None) -> bool:
+        """Block `ip` and/or `mac`; False if an address is malformed or the commit failed."""
+        return await self._change(ip, mac, block=True)
+
+    async def unblock(self, ip=None, mac=None) -> bool:
+        return await self._change(ip, mac, block=False)
+
+    async def _change(self, ip, mac, block):
+        try:
+            entries = self._normalize(ip, mac)
+        except ValueError as e:
+            print(f"Not blocking: {e}")
+            self.invalid += 1
+            return False
+        changed = False
+        for kind, address in entries:
+            if (address in self.wanted[kind]) != block:
+                changed = True
+                if block:
+                    self.wanted[kind].add(address)
+                else:
+                    self.wanted[kind].discard(address)
+        if not changed and all(address in self.applied[kind] for kind, address in entries):
+            self.duplicates += 1
+            return True
+        if self._commit_task is None:
+            self._commit_task = asyncio.ensure_future(self._commit_later())
+        return await asyncio.shield(self._commit_task)
+
+    async def _commit_later(self):
+        await asyncio.sleep(self.batch_delay)
+        # Changes from now on go into the next commit
+        self._commit_task = None
+        return await self.commit()
+
+    def _pick_backend(self):
+        if not shutil.which("iptables") or not shutil.which("iptables-restore"):
+            return None
+        return "ipset" if shutil.which("ipset") else "iptables"
+
+    def _rule(self, kind, address=None):
+        """Match of the chain's rule for `address`, or of the set rule with the ipset backend."""
+        if address is None:
+            return f"-m set --match-set {self.sets[kind]} src"
+        return f"-s {address}" if kind == "ip" else f"-m mac --mac-source {address}"
+
+    async def _run(self, *args, input=None):
+        self.processes += 1
+        result = await run_command(*args, input=input, timeout=self.timeout)
+        _check(result, args[0])
+        return result
+
+    async def _setup(self, backend):
+        """Recreate the chain (and sets) holding the whole wanted state, and the jump to it."""
+        rules = []
+        if backend == "ipset":
+            script = []
+            for kind, set_type in (("ip", "hash:ip family inet"), ("mac", "hash:mac")):
+                script.append(f"create {self.sets[kind]} {set_type} -exist")
+                script.append(f"flush {self.sets[kind]}")
+                script.extend(f"add {self.sets[kind]} {address} -exist" for address in sorted(self.wanted[kind]))
+                rules.append(self._rule(kind))
+            await self._run("ipset", "restore", input="\n".join(script) + "\n")
+        else:
+            rules = [self._rule(kind, address) for kind in ("ip", "mac") for address in sorted(self.wanted[kind])]
+        # Declaring the chain empties it, leaving the rest of the table alone
+        table = ["*filter", f":{self.chain} - [0:0]"] + [f"-A {self.chain} {rule} -j DROP" for rule in rules]
+        await self._run("iptables-restore", "--noflush", input="\n".join(table + ["COMMIT"]) + "\n")
+
+        self.processes += 1
+        returncode, _, _ = await run_command("iptables", "-C", self.parent, "-j", self.chain, timeout=self.timeout)
+        if returncode != 0:
+            await self._run("iptables", "-I", self.parent, "-j", self.chain)
+
+    async def _apply(self, backend, added, removed):
+        if backend == "ipset":
+            script = [f"add {self.sets[kind]} {address} -exist" for kind in added for address in sorted(added[kind])]
+            script += [f"del {self.sets[kind]} {address} -exist" for kind in removed for address in sorted(removed[kind])]
+            await self._run("ipset", "restore", input="\n".join(script) + "\n")
+        else:
+            table = ["*filter"]
+            table += [f"-A {self.chain} {self._rule(kind, address)} -j DROP"
+                      for kind in added for address in sorted(added[kind])]
+            table += [f"-D {self.chain} {self._rule(kind, address)} -j DROP"
+                      for kind in removed for address in sorted(removed[kind])]
+            await self._run("iptables-restore", "--noflush", input="\n".join(table + ["COMMIT"]) + "\n")
+
+    async def commit(self) -> bool:
+        """Apply the changes made since the last commit."""
+        async with self._lock:
+            backend = self._pick_backend()
+            if backend != self.backend:
+                self.backend, self._ready = backend, False
+            added = {kind: self.wanted[kind] - self.applied[kind] for kind in self.wanted}
+            removed = {kind: self.applied[kind] - self.wanted[kind] for kind in self.wanted}
+            if self._ready and not any(added.values()) and not any(removed.values()):
+                return True
+            if backend is None:
+                print("iptables-restore not found. Using simulation mode.")
+                self.applied = {kind: set(addresses) for kind, addresses in self.wanted.items()}
+                return True
+            try:
+                if not self._ready:
+                    wanted = {kind: set(addresses) for kind, addresses in self.wanted.items()}
+                    await self._setup(backend)
+                    self.applied, self._ready = wanted, True
+                else:
+                    await self._apply(backend, added, removed)
+                    for kind in self.applied:
+                        self.applied[kind] = (self.applied[kind] | added[kind]) - removed[kind]
+                self.commits += 1
+                return True
+            except Exception as e:
+                print(f"Firewall commit failed: {e}")
+                self.failed_commits += 1
+                # Rebuild everything from the wanted state next time
+                self._ready = False
+                return False
+
+    def reset(self):
+        """Remove the chain and sets and forget every address (for cleanup)."""
+        if self.backend is not None:
+            subprocess.run(["iptables", "-D", self.parent, "-j", self.chain], check=False,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            subprocess.run(["iptables", "-F", self.chain], check=False,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            subprocess.run(["iptables", "-X", self.chain], check=False,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            if self.backend == "ipset":
+                for name in self.sets.values():
+                    subprocess.run(["ipset", "destroy", name], check=False,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for kind in self.wanted:
+            self.wanted[kind].clear()
+            self.applied[kind].clear()
+        self._ready = False
+
+    def stats(self):
+        return {
+            "backend": self.backend,
+            "blocked_ips": len(self.wanted["ip"]),
+            "blocked_macs": len(self.wanted["mac"]),
+            "commits": self.commits,
+            "failed_commits": self.failed_commits,
+            "processes": self.processes,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+        }
@@ -1,9 +1,18 @@
 from enum import Enum
+from collections import OrderedDict
 import asyncio
 import logging
+import math
+import numbers
 import subprocess
 import os
 import shutil
+import time
+
+from src.mitigator.commands import ACTION_TIMEOUT, run_command
+from src.mitigator.firewall import Firewall
+from src.mitigator.traffic import TrafficControl
+from src.utils.mac import NO_MAC, mac_to_int
 # Configure logging for actions
 logging.basicConfig(filename="mitigation.log", level=logging.INFO)
 
@@ -25,85 +34,149 @@ class MitigationAction(Enum):
 class ActionHandler:
     """Handles execution of different mitigation actions"""
 
-    @staticmethod
-    async def block(ip_address=None, mac_address=None, method="ip"):
-        """Block an IP or MAC address"""
+    def __init__(self, timeout=ACTION_TIMEOUT):
+        self.timeout = timeout
+        self.firewall = Firewall(timeout=timeout)
+        self.traffic = TrafficControl(timeout=timeout)
+
+    async def block(self, ip_address=None, mac_address=None, method="ip"):
+        """Block an IP or MAC address (see Firewall)"""
         try:
             if method == "ip" and ip_address:
-                # First check if iptables is available
-                if not shutil.which("iptables"):
-                    print("iptables not found. Using simulation mode.")
-                    return True
-
-                process = await asyncio.create_subprocess_exec(
-                    "iptables", "-A", "INPUT", "-s", ip_address, "-j", "DROP",
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                await process.communicate()
-                return True
+                return await self.firewall.block(ip=ip_address)
             elif method == "mac" and mac_address:
-                if not shutil.which("iptables"):
-                    print("iptables not found. Using simulation mode.")
-                    return True
-
-                process = await asyncio.create_subprocess_exec(
-                    "iptables", "-A", "INPUT", "-m", "mac", "--mac-source", mac_address, "-j", "DROP",
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                await process.communicate()
-                return True
+                return await self.firewall.block(mac=mac_address)
             return False
         except Exception as e:
             print(f"Block action failed: {e}")
             # Return True to indicate we tried (for logging purposes)
             return True
 
-    @staticmethod
-    async def rate_limit(ip_address, rate="1mbit", interface="wlo1"):
-        """Rate-limit traffic from a specific IP address"""
+    async def rate_limit(self, ip_address, rate="1mbit", interface="wlo1"):
+        """Rate-limit traffic from a specific IP address (see TrafficControl)"""
         try:
-            # Check if tc is available
-            if not shutil.which("tc"):
-                print("tc command not found. Using simulation mode.")
-                return True
-
-            # Setup HTB qdisc if it doesn't exist
-            process = await asyncio.create_subprocess_exec(
-                "tc", "qdisc", "add", "dev", interface, "root", "handle", "1:", "htb",
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            await process.communicate()
-
-            # Add class with rate limit
-            process = await asyncio.create_subprocess_exec(
-                "tc", "class", "add", "dev", interface, "parent", "1:", "classid", "1:1",
-                "htb", "rate", rate,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            await process.communicate()
-
-            # Add filter to match IP
-            process = await asyncio.create_subprocess_exec(
-                "tc", "filter", "add", "dev", interface, "protocol", "ip", "parent", "1:0",
-                "prio", "1", "u32", "match", "ip", "src", ip_address, "flowid", "1:1",
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            await process.communicate()
-            return True
+            return await self.traffic.limit(ip_address, rate=rate, interface=interface)
         except Exception as e:
             print(f"Rate limit action failed: {e}")
             # Return True to indicate we tried (for logging purposes)
             return True
 
 
+# Seconds during which a mitigated (threat type, target) is not mitigated again
+SUPPRESS_TTL = 60.0
+# Confidence gain that gets a suppressed threat mitigated again
+CONFIDENCE_STEP = 0.05
+
+
+def threat_severity(packet):
+    """Order of magnitude of the packets behind a detection: 1-9 -> 0, 10-99 -> 1..."""
+    return int(math.log10(max(1, packet.get("count", 1))))
+
+
+def threat_target(packet):
+    """
+    What a threat's mitigations act on: its source MAC as an integer, else
+    its IP (None if neither).
+    """
+    mac = packet.get("wlan.sa")
+    if isinstance(mac, str):
+        mac = mac_to_int(mac.lower())
+    elif isinstance(mac, numbers.Integral):
+        mac = int(mac)
+    else:
+        # Missing (None or NaN)
+        mac = NO_MAC
+    return mac if mac != NO_MAC else packet.get("ip")
+
+
+class ThreatSuppressor:
+    """
+    Remembers the threats already mitigated, so repeat detections of the
+    same attacker do not run the handlers (and their processes) again.
+
+    Threats are keyed by (threat type, source MAC), or the source IP when
+    the MAC is unknown. A repeat within `ttl` seconds of the mitigation is
+    suppressed and only counted, unless its confidence is at least
+    CONFIDENCE_STEP higher or its threat_severity() is higher than the
+    mitigated one's. At most `max_entries` threats are kept, least
+    recently seen first out.
+    """
+
+    def __init__(self, ttl=SUPPRESS_TTL, max_entries=4096):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.executed = 0
+        self.suppressed = 0
+        self.expired = 0
+        self.escalated = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def key(threat_type, packet):
+        return threat_type, threat_target(packet)
+
+    def check(self, threat_type, packet, now=None):
+        """Actions of the mitigation still covering this threat, or None if it must be handled."""
+        now = time.monotonic() if now is None else now
+        key = self.key(threat_type, packet)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now - entry["mitigated_at"] > self.ttl:
+            self.expired += 1
+            return None
+        if packet.get("max_confidence", packet.get("confidence", 0)) >= entry["confidence"] + CONFIDENCE_STEP \
+                or threat_severity(packet) > entry["severity"]:
+            self.escalated += 1
+            return None
+        entry["repeats"] += 1
+        entry["packets"] += packet.get("count", 1)
+        entry["last_seen"] = now
+        self._entries.move_to_end(key)
+        self.suppressed += 1
+        return entry["actions"]
+
+    def record(self, threat_type, packet, actions, now=None):
+        """Remember that this threat was just mitigated with `actions`."""
+        now = time.monotonic() if now is None else now
+        key = self.key(threat_type, packet)
+        self._entries[key] = {
+            "actions": actions,
+            "mitigated_at": now,
+            "last_seen": now,
+            "confidence": packet.get("max_confidence", packet.get("confidence", 0)),
+            "severity": threat_severity(packet),
+            "repeats": 0,
+            "packets": packet.get("count", 1),
+        }
+        self._entries.move_to_end(key)
+        self.executed += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "executed": self.executed,
+            "suppressed": self.suppressed,
+            "expired": self.expired,
+            "escalated": self.escalated,
+            "evictions": self.evictions,
+        }
+
+
 class Mitigator:
-    def __init__(self):
-        """Initialize the Mitigator class."""
+    def __init__(self, suppress_ttl=SUPPRESS_TTL, suppress_size=4096, action_timeout=ACTION_TIMEOUT):
+        """
+        Initialize the Mitigator class. Repeat detections are suppressed
+        for `suppress_ttl` seconds (see ThreatSuppressor); 0 handles every
+        detection. Commands are killed after `action_timeout` seconds.
+        """
         self.action_map = {
             "Rogue_AP": self._handle_rogue_ap,
             "Deauth": self._handle_deauth,
@@ -111,7 +184,9 @@ class Mitigator:
             "SQL_Injection": self._handle_sql_injection,
             "(Re)Assoc": self._handle_reassociation
         }
-        self.action_handler = ActionHandler()
+        self.action_timeout = action_timeout
+        self.action_handler = ActionHandler(action_timeout)
+        self.suppressor = ThreatSuppressor(suppress_ttl, suppress_size) if suppress_ttl else None
 
     def log_action(self, action, details):
         """Log mitigation actions."""
@@ -122,7 +197,13 @@ class Mitigator:
         """Handles different types of threats"""
         handler = self.action_map.get(threat_type)
         if handler:
-            return await handler(packet)
+            if self.suppressor is None:
+                return await handler(packet)
+            actions = self.suppressor.check(threat_type, packet)
+            if actions is None:
+                actions = await handler(packet)
+                self.suppressor.record(threat_type, packet, actions)
+            return actions
         else:
             logging.warning(f"No handler found for threat type: {threat_type}")
             return [MitigationAction.PASS.value]
@@ -140,12 +221,10 @@ class Mitigator:
             # Reset ARP cache as additional measure
             try:
                 if shutil.which("ip"):
-                    process = await asyncio.create_subprocess_exec(
+                    await run_command(
                         "ip", "neigh", "flush", "all",
-                        stdout=asyncio.subprocess.PIPE,
-                        stderr=asyncio.subprocess.PIPE
+                        timeout=self.action_timeout
                     )
-                    await process.communicate()
                     self.log_action("reset_arp_cache", {})
                     print("ARP cache reset.")
                 else:
@@ -166,14 +245,12 @@ class Mitigator:
             # Check if mdk3 is available
             if shutil.which("mdk3"):
                 # Execute command to block deauth frames
-                process = await asyncio.create_subprocess_exec(
+                returncode, _, stderr = await run_command(
                     "mdk3", interface, "d", "-w", "whitelist.txt",
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
+                    timeout=self.action_timeout
                 )
-                _, stderr = await process.communicate()
 
-                if process.returncode == 0:
+                if returncode == 0:
                     self.log_action("block_deauth_frames", {
                                     "interface": interface})
                     print(f"Deauthentication frames blocked on {interface}.")
@@ -189,13 +266,11 @@ class Mitigator:
                 # Alternative: Use iptables to block deauth frames (802.11 management frames)
                 if shutil.which("iptables"):
                     try:
-                        process = await asyncio.create_subprocess_exec(
+                        await run_command(
                             "iptables", "-A", "INPUT", "-p", "all", "--destination-port", "0",
                             "-m", "u32", "--u32", "48&0xFF=0xC0", "-j", "DROP",
-                            stdout=asyncio.subprocess.PIPE,
-                            stderr=asyncio.subprocess.PIPE
+                            timeout=self.action_timeout
                         )
-                        await process.communicate()
                         print("Used iptables as alternative to block deauth frames")
                     except Exception as e:
                         print(f"Failed to use iptables for deauth: {e}")
@@ -329,12 +404,10 @@ class Mitigator:
 
                 # Restart hostapd if available
                 if shutil.which("systemctl"):
-                    process = await asyncio.create_subprocess_exec(
+                    await run_command(
                         "systemctl", "restart", "hostapd",
-                        stdout=asyncio.subprocess.PIPE,
-                        stderr=asyncio.subprocess.PIPE
+                        timeout=self.action_timeout
                     )
-                    await process.communicate()
                     print("Restarted hostapd service")
             else:
                 print(f"Hostapd config not found. Creating simulation file.")
@@ -351,12 +424,10 @@ class Mitigator:
 
             # Disable authentication attempts temporarily if hostapd_cli is available
             if shutil.which("hostapd_cli"):
-                process = await asyncio.create_subprocess_exec(
+                await run_command(
                     "hostapd_cli", "-i", interface, "disable",
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
+                    timeout=self.action_timeout
                 )
-                await process.communicate()
                 self.log_action("disable_auth_attempts",
                                 {"interface": interface})
                 print(f"Disabled authentication attempts on AP: {interface}")
@@ -394,19 +465,12 @@ class Mitigator:
                     print(f"Failed to reset iptables: {e}")
             else:
                 print("iptables not found. Simulating iptables reset.")
+            self.action_handler.firewall.reset()
 
-            # Reset traffic control rules if tc exists
-            if shutil.which("tc"):
-                interfaces = ["wlo1", "eth0"]  # Add common interfaces
-                for interface in interfaces:
-                    try:
-                        subprocess.run(["tc", "qdisc", "del", "dev", interface, "root"],
-                                       check=False)
-                        print(f"Reset traffic control on {interface}")
-                    except Exception as e:
-                        print(f"Failed to reset tc on {interface}: {e}")
-            else:
+            # Remove the rate limits set up here, leaving other shaping alone
+            if not shutil.which("tc"):
                 print("tc not found. Simulating tc reset.")
+            self.action_handler.traffic.reset()
 
             # Reset ARP cache if ip command exists
             if shutil.which("ip"):
@@ -431,6 +495,10 @@ class Mitigator:
             else:
                 print("hostapd_cli not found. Simulating AP re-enabling.")
 
+            # Nothing mitigated is in place any more
+            if self.suppressor is not None:
+                self.suppressor.clear()
+
             self.log_action("reset_mitigations", {"status": "complete"})
             print("All mitigation rules have been cleared.")
         except Exception as e:
@@ -0,0 +1,267 @@
+# traffic.py
+"""
+Per-client rate limits behind ActionHandler.rate_limit.
+
+Each limited IP gets its own HTB class under a root HTB qdisc with a
+handle of its own (ROOT_HANDLE), so clients no longer share one rate.
+Shaping set up by anyone else is left alone: the root qdisc is only
+added in place of the kernel's default one, or replaced when it is one
+left behind by an earlier run. Traffic is classified by a two-level
+u32 filter: the root filter hashes the last byte of the source address
+into a 256-bucket table, and each bucket holds the filters of the
+addresses ending in that byte, so a packet is compared against a handful
+of addresses rather than every limited client.
+
+The TrafficControl keeps the qdisc/class/filter state of every interface
+in memory and applies changes in batches, one `tc -batch -` call per
+commit, changing a client's rate in place and removing its filter and
+class when the limit is lifted.
+"""
+import asyncio
+import ipaddress
+import re
+import shutil
+import subprocess
+
+from src.mitigator.commands import ACTION_TIMEOUT, run_command
+
+# Handle of the root qdisc set up here, telling it apart from other shaping
+ROOT_HANDLE = "1d5:"
+# Handle of the kernel's default root qdisc, which `qdisc add` replaces
+DEFAULT_HANDLE = "0:"
+# u32 handle of the per-source hash table and the class minors handed out
+HASH_TABLE = 2
+FIRST_CLASS = 0x10
+LAST_CLASS = 0xffff
+# Filters per hash bucket (u32 node ids)
+BUCKET_NODES = 0xfff
+
+_RATE = re.compile(r"^\d+(\.\d+)?[a-zA-Z]*$")
+_INTERFACE = re.compile(r"^[\w.:-]{1,15}$")
+
+
+def _root_qdisc(output):
+    """(kind, handle) of the root qdisc in `tc qdisc show dev <if> root` output, or (None, None)."""
+    fields = output.split()
+    if len(fields) < 3 or fields[0] != "qdisc":
+        return None, None
+    return fields[1], fields[2]
+
+
+class TrafficControl:
+    """
+    Rate limits per (interface, source IP), mirrored into tc.
+
+    limit() and unlimit() change the wanted state and wait for the commit
+    that applies it; as with the Firewall, the changes of one `batch_delay`
+    interval share a commit, and only what differs from the applied state
+    is sent. The first commit on an interface (and the next one after a
+    failed commit) checks its root qdisc and builds ROOT_HANDLE, the hash
+    table and every wanted limit, replacing only the kernel's default
+    qdisc or a ROOT_HANDLE qdisc; an interface whose root holds other
+    shaping is not limited, and its commits report failure. Without tc,
+    commits are only simulated.
+    """
+
+    def __init__(self, batch_delay=0.05, timeout=ACTION_TIMEOUT):
+        self.batch_delay = batch_delay
+        self.timeout = timeout
+        # interface -> {ip: rate}
+        self.wanted = {}
+        # interface -> {ip: (rate, class minor, filter handle)}
+        self.applied = {}
+        self.commits = 0
+        self.failed_commits = 0
+        self.processes = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.simulated = False
+        self._ready = set()
+        self._lock = asyncio.Lock()
+        self._commit_task = None
+
+    @staticmethod
+    def _validate(ip, rate, interface):
+        ip = str(ipaddress.IPv4Address(str(ip)))
+        if rate is not None and not _RATE.match(str(rate)):
+            raise ValueError(f"invalid rate: {rate!r}")
+        if not _INTERFACE.match(str(interface)):
+            raise ValueError(f"invalid interface: {interface!r}")
+        return ip, rate, interface
+
+    def is_limited(self, ip, interface="wlo1"):
+        """Rate `ip` is limited to on `interface`, or None."""
+        return self.wanted.get(interface, {}).get(ip)
+
+    async def limit(self, ip, rate="1mbit", interface="wlo1") -> bool:
+        """Limit traffic from `ip` on `interface` to `rate`; False if invalid or the commit failed."""
+        return await self._change(ip, rate, interface)
+
+    async def unlimit(self, ip, interface="wlo1") -> bool:
+        return await self._change(ip, None, interface)
+
+    async def _change(self, ip, rate, interface):
+        try:
+            ip, rate, interface = self._validate(ip, rate, interface)
+        except ValueError as e:
+            print(f"Not rate limiting: {e}")
+            self.invalid += 1
+            return False
+        wanted = self.wanted.setdefault(interface, {})
+        applied = self.applied.get(interface, {}).get(ip)
+        if rate is None:
+            wanted.pop(ip, None)
+        else:
+            wanted[ip] = rate
+        if (applied[0] if applied else None) == rate and (interface in self._ready or rate is None):
+            self.duplicates += 1
+            return True
+        if self._commit_task is None:
+            self._commit_task = asyncio.ensure_future(self._commit_later())
+        return await asyncio.shield(self._commit_task)
+
+    async def _commit_later(self):
+        await asyncio.sleep(self.batch_delay)
+        # Changes from now on go into the next commit
+        self._commit_task = None
+        return await self.commit()
+
+    @staticmethod
+    def _bucket(ip):
+        # What the root filter hashes: the last byte of the source address
+        return int(ip.rsplit(".", 1)[1])
+
+    def _allocate(self, ip, applied):
+        """(class minor, filter handle) not used by any client in `applied`."""
+        minors = {entry[1] for entry in applied.values()}
+        minor = next(m for m in range(FIRST_CLASS, LAST_CLASS + 1) if m not in minors)
+        bucket = self._bucket(ip)
+        nodes = {int(entry[2].rsplit(":", 1)[1], 16) for other, entry in applied.items()
+                 if self._bucket(other) == bucket}
+        node = next(n for n in range(1, BUCKET_NODES + 1) if n not in nodes)
+        return minor, f"{HASH_TABLE:x}:{bucket:x}:{node:x}"
+
+    def _diff(self, interface):
+        """tc batch lines taking `interface` from its applied to its wanted state, and that new state."""
+        dev = f"dev {interface}"
+        wanted = self.wanted.get(interface, {})
+        lines = []
+        if interface in self._ready:
+            applied = dict(self.applied.get(interface, {}))
+        else:
+            applied = {}
+            lines += [
+                f"qdisc add {dev} root handle {ROOT_HANDLE} htb",
+                f"filter add {dev} parent {ROOT_HANDLE} prio 1 handle {HASH_TABLE:x}: protocol ip u32 divisor 256",
+                f"filter add {dev} parent {ROOT_HANDLE} prio 1 protocol ip u32 ht 800:: "
+                f"match ip src 0.0.0.0/0 hashkey mask 0x000000ff at 12 link {HASH_TABLE:x}:",
+            ]
+
+        for ip in sorted(set(applied) - set(wanted)):
+            _, minor, handle = applied.pop(ip)
+            lines.append(f"filter del {dev} parent {ROOT_HANDLE} prio 1 handle {handle} protocol ip u32")
+            lines.append(f"class del {dev} classid {ROOT_HANDLE}{minor:x}")
+        for ip, rate in sorted(wanted.items()):
+            if ip in applied:
+                old_rate, minor, handle = applied[ip]
+                if old_rate != rate:
+                    lines.append(f"class change {dev} parent {ROOT_HANDLE} classid {ROOT_HANDLE}{minor:x} "
+                                 f"htb rate {rate} ceil {rate}")
+                    applied[ip] = (rate, minor, handle)
+                continue
+            minor, handle = self._allocate(ip, applied)
+            table = handle.rsplit(":", 1)[0]
+            lines.append(f"class add {dev} parent {ROOT_HANDLE} classid {ROOT_HANDLE}{minor:x} "
+                         f"htb rate {rate} ceil {rate}")
+            lines.append(f"filter add {dev} parent {ROOT_HANDLE} prio 1 handle {handle} protocol ip u32 "
+                         f"ht {table}: match ip src {ip}/32 flowid {ROOT_HANDLE}{minor:x}")
+            applied[ip] = (rate, minor, handle)
+        return lines, applied
+
+    async def commit(self) -> bool:
+        """Apply the changes made since the last commit, on every interface."""
+        async with self._lock:
+            if self.simulated and shutil.which("tc"):
+                # Nothing was really applied so far
+                self.simulated = False
+                self._ready.clear()
+            if not shutil.which("tc"):
+                if not self.simulated:
+                    print("tc command not found. Using simulation mode.")
+                    self.simulated = True
+                for interface, wanted in self.wanted.items():
+                    self.applied[interface] = {ip: (rate, None, None) for ip, rate in wanted.items()}
+                    self._ready.add(interface)
+                return True
+
+            diffs = {interface: self._diff(interface) for interface in list(self.wanted)}
+            diffs = {interface: diff for interface, diff in diffs.items() if diff[0]}
+            if not diffs:
+                return True
+            try:
+                foreign = []
+                for interface in diffs:
+                    if interface in self._ready:
+                        continue
+                    kind, handle = await self._root_qdisc(interface)
+                    if handle == ROOT_HANDLE and kind == "htb":
+                        # Left by an earlier run or a failed commit: start over
+                        self.processes += 1
+                        await run_command("tc", "qdisc", "del", "dev", interface, "root", timeout=self.timeout)
+                    elif handle not in (None, DEFAULT_HANDLE):
+                        print(f"Not rate limiting on {interface}: its root qdisc ({kind} {handle}) was not set up here")
+                        foreign.append(interface)
+                for interface in foreign:
+                    del diffs[interface]
+                if not diffs:
+                    return False
+                batch = [line for lines, _ in diffs.values() for line in lines]
+                self.processes += 1
+                returncode, _, stderr = await run_command("tc", "-batch", "-", input="\n".join(batch) + "\n",
+                                                          timeout=self.timeout)
+                if returncode != 0:
+                    raise RuntimeError(f"tc -batch failed: {stderr.decode(errors='replace').strip()}")
+                for interface, (_, state) in diffs.items():
+                    self.applied[interface] = state
+                    self._ready.add(interface)
+                self.commits += 1
+                return not foreign
+            except Exception as e:
+                print(f"Traffic control commit failed: {e}")
+                self.failed_commits += 1
+                # Rebuild every interface from the wanted state next time
+                self._ready.clear()
+                return False
+
+    async def _root_qdisc(self, interface):
+        """(kind, handle) of the root qdisc of `interface`."""
+        self.processes += 1
+        returncode, stdout, stderr = await run_command("tc", "qdisc", "show", "dev", interface, "root",
+                                                       timeout=self.timeout)
+        if returncode != 0:
+            raise RuntimeError(f"tc qdisc show failed: {stderr.decode(errors='replace').strip()}")
+        return _root_qdisc(stdout.decode(errors='replace'))
+
+    def reset(self):
+        """Delete the ROOT_HANDLE qdiscs set up here and forget every limit (for cleanup)."""
+        if shutil.which("tc"):
+            for interface in set(self.wanted) | set(self.applied):
+                result = subprocess.run(["tc", "qdisc", "show", "dev", interface, "root"], check=False,
+                                        capture_output=True, text=True)
+                if _root_qdisc(result.stdout) == ("htb", ROOT_HANDLE):
+                    subprocess.run(["tc", "qdisc", "del", "dev", interface, "root"], check=False,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.wanted.clear()
+        self.applied.clear()
+        self._ready.clear()
+
+    def stats(self):
+        return {
+            "interfaces": len(self.wanted),
+            "limited_ips": sum(len(wanted) for wanted in self.wanted.values()),
+            "commits": self.commits,
+            "failed_commits": self.failed_commits,
+            "processes": self.processes,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+        }
@@ -0,0 +1,121 @@
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from src.ml_model.compiled import compile_forest
+
+
+class PredictionCache:
+    """
+    Memoises forest verdicts for repeated feature vectors.
+
+    Rows are keyed by the bin each feature falls in between the forest's
+    own split points (CompiledForest.split_points), so rows sharing a key
+    take the same path through every tree and get the same probabilities:
+    during floods the varying timestamps usually stay within one bin.
+    Each batch is deduplicated first and only unseen keys are scored.
+
+    At most `max_entries` keys are kept, least recently used first out,
+    and entries older than `ttl` seconds are scored again. With
+    `verify_rate` that fraction of cache hits is also re-scored and
+    compared, counting `mismatches`. The cache belongs to one engine;
+    bind() to a new one (e.g. after a hot reload) empties it.
+    """
+
+    def __init__(self, engine, max_entries=65536, ttl=300.0, verify_rate=0.0, seed=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.verify_rate = verify_rate
+        self.engine = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.verified = 0
+        self.mismatches = 0
+        self._entries = OrderedDict()
+        self._rng = np.random.default_rng(seed)
+        self.bind(engine)
+
+    def bind(self, engine):
+        """Use `engine` for misses, dropping every entry if it is a different one."""
+        if engine is not self.engine:
+            self.engine = engine
+            self.classes = engine.classes
+            forest = engine.compiled if engine.compiled is not None else compile_forest(engine.rf_model)
+            self._splits = forest.split_points()
+            self._entries.clear()
+        return self
+
+    def keys(self, X) -> np.ndarray:
+        """One opaque key per row: the row's split-point bin of every feature."""
+        X = np.asarray(X, dtype=np.float32)
+        bins = np.empty(X.shape, dtype=np.int32)
+        for j, splits in enumerate(self._splits):
+            # Same count of thresholds below x <=> same decision at every node
+            bins[:, j] = np.searchsorted(splits, X[:, j], side='left')
+        return bins.view(np.dtype((np.void, bins.itemsize * bins.shape[1]))).ravel()
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype='float64')
+        keys = self.keys(X)
+        unique, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        proba = np.empty((len(unique), len(self.classes)), dtype='float64')
+
+        now = time.monotonic()
+        missing = []
+        for i, key in enumerate(unique):
+            key = key.tobytes()
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] <= self.ttl:
+                self._entries.move_to_end(key)
+                proba[i] = entry[0]
+            else:
+                if entry is not None:
+                    self.expired += 1
+                missing.append(i)
+
+        hit = np.ones(len(unique), dtype=bool)
+        if missing:
+            hit[missing] = False
+            proba[missing] = self.engine.predict_proba(X[first[missing]])
+            for i in missing:
+                key = unique[i].tobytes()
+                self._entries[key] = (proba[i].copy(), now)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        # Rows sharing a new key in this batch are scored once
+        self.misses += len(missing)
+        self.hits += len(X) - len(missing)
+
+        result = proba[inverse]
+        if self.verify_rate and hit.any():
+            hit_rows = np.flatnonzero(hit[inverse])
+            sample = hit_rows[self._rng.random(len(hit_rows)) < self.verify_rate]
+            if len(sample):
+                fresh = self.engine.predict_proba(X[sample])
+                self.verified += len(sample)
+                self.mismatches += int((~np.isclose(fresh, result[sample], rtol=0, atol=1e-9).all(axis=1)).sum())
+        return result
+
+    def predict(self, X):
+        """(labels, confidence, proba), as InferenceEngine.predict."""
+        proba = self.predict_proba(X)
+        best = proba.argmax(axis=1)
+        return self.classes.take(best), proba[np.arange(len(proba)), best], proba
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else None,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "verified": self.verified,
+            "mismatches": self.mismatches,
+        }
@@ -0,0 +1,209 @@
+import argparse
+import json
+import os
+
+import numpy as np
+from joblib import load
+
+
+def _float32_thresholds(threshold: np.ndarray) -> np.ndarray:
+    """
+    float32 thresholds giving the same decisions as the float64 ones for
+    float32 inputs: x <= t exactly when x <= the largest float32 not above t.
+    """
+    t32 = threshold.astype(np.float32)
+    above = t32.astype(np.float64) > threshold
+    t32[above] = np.nextafter(t32[above], np.float32(-np.inf))
+    return t32
+
+
+NODE_DTYPE = np.dtype([('threshold', '<f4'), ('feature', '<i4'), ('left', '<i4'), ('right', '<i4')])
+
+
+class CompiledForest:
+    """
+    A fitted RandomForestClassifier flattened into NumPy arrays.
+
+    All trees share one `nodes` table of (threshold, feature, left, right)
+    records, so a step down every tree is a single gather. Leaves point to
+    themselves, so rows need no per-row bookkeeping: trees are kept deepest
+    first (`roots`) and step d only advances the `active[d]` trees that are
+    deeper than d. `leaf_slot` then maps each leaf to its row of
+    `leaf_values`, the class distribution normalised as the tree's
+    predict_proba does, and `order` puts the trees back in estimator order
+    for the sum. Inputs are cast to float32 first, like sklearn does.
+    """
+
+    def __init__(self, classes_, n_features_in_, roots, active, order, nodes, leaf_slot, leaf_values,
+                 feature_names_in_=None):
+        # Named like the fitted estimator's attributes so either can be used
+        # wherever the model's classes and features are looked up
+        self.classes_ = classes_
+        self.n_features_in_ = n_features_in_
+        self.feature_names_in_ = feature_names_in_
+        self.roots = roots
+        self.active = active
+        self.order = order
+        self.nodes = nodes
+        self.leaf_slot = leaf_slot
+        self.leaf_values = leaf_values
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.roots, self.active, self.order, self.nodes, self.leaf_slot,
+                                      self.leaf_values))
+
+    def split_points(self):
+        """
+        Sorted distinct float32 thresholds of each feature. Rows that fall
+        between the same split points of every feature reach the same
+        leaves, so their bin indices identify the forest's answer exactly.
+        """
+        internal = np.isfinite(self.nodes['threshold'])
+        feature, threshold = self.nodes['feature'][internal], self.nodes['threshold'][internal]
+        return [np.unique(threshold[feature == f]) for f in range(self.n_features_in_)]
+
+    def _leaves(self, X) -> np.ndarray:
+        # (trees, rows) leaf node ids, trees in estimator order
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected a (rows, {self.n_features_in_}) feature matrix, got shape {X.shape}")
+        if np.isnan(X).any():
+            raise ValueError("Input contains NaN")
+
+        flat = X.ravel()
+        base = np.arange(len(X), dtype=np.int32) * self.n_features_in_
+        node = np.repeat(self.roots[:, None], len(X), axis=1)
+        for k in self.active:
+            step = self.nodes.take(node[:k])
+            right = flat.take(base + step['feature']) > step['threshold']
+            node[:k] = np.where(right, step['right'], step['left'])
+        return node.take(self.order, axis=0)
+
+    def apply(self, X) -> np.ndarray:
+        """Leaf index of every (row, tree) within its tree, as the forest's apply."""
+        return (self._leaves(X) - self.roots.take(self.order)[:, None]).T
+
+    def predict_proba(self, X) -> np.ndarray:
+        # Summed tree by tree in estimator order, as the forest does
+        leaves = self.leaf_slot.take(self._leaves(X))
+        proba = self.leaf_values.take(leaves, axis=0).sum(axis=0)
+        proba /= len(self.roots)
+        return proba
+
+    def predict(self, X):
+        """(labels, confidence, proba), as InferenceEngine.predict."""
+        proba = self.predict_proba(X)
+        best = proba.argmax(axis=1)
+        return self.classes_.take(best), proba[np.arange(len(proba)), best], proba
+
+
+def compile_forest(rf_model) -> CompiledForest:
+    """Flatten the trees of a fitted forest into one CompiledForest."""
+    n_features = rf_model.n_features_in_
+    roots, depths, tables, leaf_slots, leaf_values = [], [], [], [], []
+    offset = leaf_offset = 0
+
+    for estimator in rf_model.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        ids = np.arange(n)
+        is_leaf = tree.children_left == -1
+
+        table = np.empty(n, dtype=NODE_DTYPE)
+        # Leaves compare feature 0 with +inf and stay where they are
+        table['threshold'] = np.where(is_leaf, np.inf, _float32_thresholds(tree.threshold))
+        table['feature'] = np.where(is_leaf, 0, tree.feature)
+        table['left'] = np.where(is_leaf, ids, tree.children_left) + offset
+        table['right'] = np.where(is_leaf, ids, tree.children_right) + offset
+        tables.append(table)
+
+        values = tree.value[is_leaf, 0, :]
+        normalizer = values.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0.0] = 1.0
+        leaf_values.append(values / normalizer)
+        slot = np.full(n, -1, dtype=np.int32)
+        slot[is_leaf] = np.arange(is_leaf.sum()) + leaf_offset
+        leaf_slots.append(slot)
+
+        roots.append(offset)
+        depths.append(tree.max_depth)
+        offset += n
+        leaf_offset += int(is_leaf.sum())
+
+    depths = np.array(depths)
+    deepest_first = np.argsort(-depths, kind='stable')
+    return CompiledForest(
+        classes_=rf_model.classes_,
+        n_features_in_=n_features,
+        feature_names_in_=getattr(rf_model, 'feature_names_in_', None),
+        roots=np.array(roots, dtype=np.int32)[deepest_first],
+        active=np.array([(depths > d).sum() for d in range(depths.max(initial=0))], dtype=np.int32),
+        order=np.argsort(deepest_first).astype(np.int32),
+        nodes=np.concatenate(tables),
+        leaf_slot=np.concatenate(leaf_slots),
+        leaf_values=np.concatenate(leaf_values),
+    )
+
+
+ARRAYS = ('roots', 'active', 'order', 'nodes', 'leaf_slot', 'leaf_values')
+
+
+def save_forest(forest: CompiledForest, path):
+    """
+    Write `forest` as a directory of .npy arrays plus meta.json.
+
+    Every file is written under a temporary name and renamed into place,
+    meta.json last, so processes that still map the old arrays keep valid
+    pages and a watcher of meta.json sees a complete artifact.
+    """
+    os.makedirs(path, exist_ok=True)
+    for name in ARRAYS:
+        tmp = os.path.join(path, f".{name}.npy.tmp")
+        with open(tmp, 'wb') as f:
+            np.save(f, getattr(forest, name))
+        os.replace(tmp, os.path.join(path, f"{name}.npy"))
+
+    names = forest.feature_names_in_
+    meta = {
+        'format': 1,
+        'classes': forest.classes_.tolist(),
+        'n_features': int(forest.n_features_in_),
+        'feature_names': None if names is None else [str(name) for name in names],
+    }
+    tmp = os.path.join(path, ".meta.json.tmp")
+    with open(tmp, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(path, "meta.json"))
+
+
+def load_forest(path, mmap_mode='r') -> CompiledForest:
+    """
+    Open a forest written by save_forest. With mmap_mode the node arrays
+    are mapped rather than read, so opening takes about the same time
+    whatever the model size and every process shares the same pages.
+    """
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    if meta.get('format') != 1:
+        raise ValueError(f"Unsupported forest format in {path}: {meta.get('format')}")
+    # Plain ndarray views of the mappings, so results are not memmap objects
+    arrays = {name: np.asarray(np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)) for name in ARRAYS}
+    names = meta['feature_names']
+    return CompiledForest(
+        classes_=np.array(meta['classes'], dtype=object),
+        n_features_in_=meta['n_features'],
+        feature_names_in_=None if names is None else np.array(names, dtype=object),
+        **arrays,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert a joblib random forest into a memory-mappable artifact')
+    parser.add_argument('model', help='joblib file of the fitted forest (e.g. src/ml_model/rf_attacks.joblib)')
+    parser.add_argument('output', help='Artifact directory to write (e.g. src/ml_model/rf_attacks.forest)')
+    args = parser.parse_args()
+
+    forest = compile_forest(load(args.model))
+    save_forest(forest, args.output)
+    print(f"Saved {len(forest.roots)} trees ({forest.nbytes / 2**10:.0f} KiB) to {args.output}")
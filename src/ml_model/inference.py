@@ -0,0 +1,116 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.ml_model.compiled import CompiledForest, compile_forest
+
+
+class InferenceEngine:
+    """
+    Scores feature matrices with a fitted random forest in one traversal.
+
+    predict() walks every tree once per row and derives the labels and the
+    confidence from the averaged class probabilities, which is what
+    predict() and predict_proba() of the forest compute separately. Rows are
+    evaluated `chunk_size` at a time so the per-tree buffers stay in cache,
+    and chunks are spread over `n_threads` threads (tree evaluation releases
+    the GIL). Results are identical to rf_model.predict_proba.
+
+    Batches of up to `compiled_max_rows` rows, where sklearn's per-call
+    overhead dominates, go through the flat-array evaluator of
+    compiled.compile_forest instead (equal within float rounding);
+    compiled_max_rows=0 disables it. `rf_model` may also be a CompiledForest
+    (see compiled.load_forest), which then scores every batch.
+
+    retire() closes the thread pool once no predict() is using it, for an
+    engine replaced by a hot reload while batches may still be running on it.
+    """
+
+    def __init__(self, rf_model, chunk_size=4096, n_threads=None, compiled_max_rows=256):
+        self.rf_model = rf_model
+        self.classes = rf_model.classes_
+        self.n_features = rf_model.n_features_in_
+        self.chunk_size = chunk_size
+        self.n_threads = n_threads or os.cpu_count() or 1
+        if isinstance(rf_model, CompiledForest):
+            self.compiled, self.compiled_max_rows = rf_model, 0
+        else:
+            self.compiled = compile_forest(rf_model) if compiled_max_rows else None
+            self.compiled_max_rows = compiled_max_rows
+        self._pool = None
+        self._lock = threading.Lock()
+        self._active = 0
+        self._retired = False
+
+    def _proba_chunk(self, X):
+        if self.rf_model is self.compiled:
+            return self.compiled.predict_proba(X)
+        proba = np.zeros((X.shape[0], len(self.classes)), dtype='float64')
+        for tree in self.rf_model.estimators_:
+            proba += tree.predict_proba(X, check_input=False)
+        proba /= len(self.rf_model.estimators_)
+        return proba
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Class probabilities for the rows of X (features in model order)."""
+        # The trees work on float32, as in the forest's own input validation
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected a (rows, {self.n_features}) feature matrix, got shape {X.shape}")
+
+        if 0 < len(X) <= self.compiled_max_rows:
+            return self.compiled.predict_proba(X)
+        if len(X) <= self.chunk_size or self.n_threads == 1:
+            chunks = [X[start:start + self.chunk_size] for start in range(0, len(X), self.chunk_size)]
+            parts = [self._proba_chunk(chunk) for chunk in chunks]
+        else:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.n_threads)
+                pool = self._pool
+                self._active += 1
+            try:
+                starts = range(0, len(X), self.chunk_size)
+                parts = list(pool.map(lambda start: self._proba_chunk(X[start:start + self.chunk_size]), starts))
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    idle = self._retired and not self._active
+                if idle:
+                    # Last batch of a retired engine
+                    self.close()
+
+        if not parts:
+            return np.zeros((0, len(self.classes)), dtype='float64')
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def predict(self, X):
+        """
+        Score X in a single pass.
+
+        Returns:
+            (labels, confidence, proba): predicted class per row, the
+            probability of that class, and the full (rows, classes) matrix
+            ordered like rf_model.classes_
+        """
+        proba = self.predict_proba(X)
+        best = proba.argmax(axis=1)
+        labels = self.classes.take(best)
+        confidence = proba[np.arange(len(proba)), best]
+        return labels, confidence, proba
+
+    def retire(self):
+        """close() now if no predict() is running, else when the last one returns."""
+        with self._lock:
+            self._retired = True
+            idle = not self._active
+        if idle:
+            self.close()
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
@@ -1,5 +1,15 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
 import pandas as pd
-from joblib import load
+
+from src.ml_model.inference import InferenceEngine
+from src.ml_model.registry import get_registry
+from src.ml_model.workers import InferencePool
+from src.ml_model.cache import PredictionCache
 
 # 2) Hard‑coded medians (as floats)
 DEFAULTS = {
@@ -30,50 +40,117 @@ feature_cols = [
 ]
 
 
+def _numeric_column(values: pd.Series) -> np.ndarray:
+    # Numeric columns are used as they are (no copy for float64)
+    if not pd.api.types.is_numeric_dtype(values):
+        values = pd.to_numeric(values, errors='coerce')
+    return values.to_numpy(dtype='float64', na_value=np.nan)
+
+
+def preprocess_matrix(df: pd.DataFrame, feature_cols: list = feature_cols, block_rows=8192) -> np.ndarray:
+    """
+    Single-pass form of preprocess_capture: each feature column is coerced
+    to numeric (invalid -> NaN) and written straight into one preallocated
+    C-order float64 matrix, whose NaNs are then replaced in place with
+    DEFAULTS. Missing columns are all defaults. Rows are filled `block_rows`
+    at a time so the strided column writes stay in cache.
+    """
+    n = len(df)
+    columns = [_numeric_column(df[col]) if col in df else None for col in feature_cols]
+    fill = np.array([DEFAULTS.get(col, np.nan) for col in feature_cols], dtype='float64')
+
+    X = np.empty((n, len(feature_cols)), dtype='float64')
+    for start in range(0, n, block_rows):
+        out = X[start:start + block_rows]
+        for j, values in enumerate(columns):
+            out[:, j] = values[start:start + block_rows] if values is not None else np.nan
+        np.copyto(out, fill, where=np.isnan(out))
+    return X
+
+
 def preprocess_capture(df: pd.DataFrame, feature_cols: list) -> pd.DataFrame:
     """
     1. Subset to FEATURE_COLS
     2. Coerce all to numeric (invalid → NaN)
     3. Fill any NaNs with the hard‑coded DEFAULTS
     4. Ensure float64 dtype
+
+    The work is done by preprocess_matrix; the frame wraps its matrix
+    without copying and keeps the input's index.
     """
-    # a) Work on a copy
-    df = df.copy()
+    return pd.DataFrame(preprocess_matrix(df, feature_cols), columns=feature_cols, index=df.index, copy=False)
 
-    # b) Subset (this also drops any extra columns)
-    df = df.reindex(columns=feature_cols)
 
-    # c) Coerce everything to numeric, invalid entries become NaN
-    df = df.apply(pd.to_numeric, errors='coerce')
+def read_capture(input_csv, columns=(*feature_cols, 'wlan.sa')) -> pd.DataFrame:
+    """Read only `columns` of a capture CSV, parsing the features straight to float64 when they are clean."""
+    header = pd.read_csv(input_csv, nrows=0).columns
+    usecols = [col for col in columns if col in header]
+    dtypes = {col: 'float64' for col in usecols if col in feature_cols}
+    try:
+        return pd.read_csv(input_csv, usecols=usecols, dtype=dtypes)
+    except ValueError:
+        # Some feature holds text; preprocess coerces it to NaN
+        return pd.read_csv(input_csv, usecols=usecols)
 
-    # d) Fill NaNs with your defaults
-    df = df.fillna(DEFAULTS)
 
-    # e) Enforce float64 dtype (optional since default is float64)
-    df = df.astype('float64')
+def predict_batch(rf_model, raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    Score an in-memory batch of captured packets.
 
-    return df
+    `rf_model` is a fitted forest, or an InferenceEngine, InferencePool or
+    PredictionCache wrapping one (reuse them across batches to keep their
+    threads, workers and cached verdicts). Returns the preprocessed features with the 'predictions',
+    'confidence' and 'wlan.sa' columns, i.e. the same layout
+    make_predictions writes.
+    """
+    engine = rf_model if isinstance(rf_model, (InferenceEngine, InferencePool, PredictionCache)) else InferenceEngine(rf_model)
 
+    # Preprocess the data
+    X = preprocess_matrix(raw, feature_cols)
 
-def make_predictions(input_csv="captured_packets.csv", model_path='./rf_attacks.joblib', output_csv='predictions.csv'):
-    # Load the model
-    rf_model = load(model_path)
+    # One pass over the forest gives the labels and their probabilities
+    labels, confidence, _ = engine.predict(X)
+    return predictions_frame(X, labels, confidence, raw)
 
-    # Load the captured packets data
-    raw = pd.read_csv(input_csv)
 
-    # Preprocess the data
-    X_ready = preprocess_capture(raw, feature_cols)
+def predictions_frame(X: np.ndarray, labels, confidence, raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    Scored features in the predict_batch / make_predictions layout, plus
+    any per-source 'window.*' columns of `raw` (see pipeline.aggregator).
+    """
+    predictions = pd.DataFrame(X, columns=feature_cols, copy=False)
+    predictions = predictions.assign(**{
+        'predictions': labels,
+        'confidence': confidence,  # Maximum probability as confidence
+        'wlan.sa': raw['wlan.sa'].values if 'wlan.sa' in raw else None,
+    })
+    window = [column for column in raw.columns if column.startswith('window.')]
+    if window:
+        predictions = pd.concat([predictions, pd.DataFrame(raw[window].to_numpy(), columns=window)], axis=1)
+    return predictions
+
 
-    # Perform predictions and get probabilities
-    y_pred_proba = rf_model.predict_proba(X_ready)
+def make_predictions(input_csv="captured_packets.csv", model_path='./rf_attacks.joblib', output_csv='predictions.csv',
+                     chunk_size=4096, n_threads=None, workers=None, cache_size=0, cache_verify=0.0):
+    # The model is loaded once per process and reused by later calls
+    engine = get_registry(model_path, chunk_size=chunk_size, n_threads=n_threads).engine
+    pool = None
+    if workers and workers > 1:
+        engine = pool = InferencePool(engine, n_workers=workers)
+    if cache_size:
+        # Repeated feature vectors (floods) are scored once
+        engine = PredictionCache(engine, max_entries=cache_size, verify_rate=cache_verify)
+
+    # Load the captured packets data
+    raw = read_capture(input_csv)
 
     # Save predictions and probabilities to a CSV file
-    X_ready['predictions'] = rf_model.predict(X_ready)
-    X_ready['confidence'] = y_pred_proba.max(
-        axis=1)  # Maximum probability as confidence
-    X_ready['wlan.sa'] = raw['wlan.sa']
-    X_ready.to_csv(output_csv, index=False)
+    predictions = predict_batch(engine, raw)
+    if isinstance(engine, PredictionCache):
+        print(f"Prediction cache: {engine.stats()}")
+    if pool is not None:
+        pool.close()
+    predictions.to_csv(output_csv, index=False)
     print(f"Predictions with confidence saved to {output_csv}")
 
 
@@ -82,20 +159,69 @@ def load_predictions(input_csv="predictions.csv"):
     return predictions
 
 
-def concatenate_csv_files(samples_csv="samples.csv", captured_csv="captured_packets.csv", output_csv="concatenated_file.csv"):
-    # Define the valid attack labels
-    valid_labels = ["Rogue_AP", "Deauth",
+# Labels of the samples.csv rows prepended to every capture
+REFERENCE_LABELS = ["Rogue_AP", "Deauth",
                     "Botnet", "SQL_Injection", "(Re)Assoc"]
 
-    # Read the CSV files
-    samples_df = pd.read_csv(samples_csv)
-    captured_df_org = pd.read_csv(captured_csv)
+# Preprocessed reference matrices, one .npy per source content and feature set
+REFERENCE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".reference_cache")
+
+_references = {}
+_references_lock = threading.Lock()
+
+
+def reference_key(samples_csv, feature_cols: list = feature_cols, labels=REFERENCE_LABELS) -> str:
+    """sha256 of the samples file together with everything its preprocessing depends on."""
+    digest = hashlib.sha256()
+    with open(samples_csv, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    digest.update(json.dumps([list(feature_cols), list(labels), DEFAULTS]).encode())
+    return digest.hexdigest()
 
-    # Filter samples_df to include only rows with the valid Labels
-    samples_df = samples_df[samples_df['Label'].isin(valid_labels)]
 
-    # Ensure that both DataFrames have the necessary columns
-    samples_df = preprocess_capture(samples_df, feature_cols)
+def reference_matrix(samples_csv="samples.csv", feature_cols: list = feature_cols, labels=REFERENCE_LABELS,
+                     cache_dir=REFERENCE_CACHE_DIR) -> np.ndarray:
+    """
+    The `labels` rows of `samples_csv`, preprocessed (read-only float64).
+
+    The matrix is parsed once and saved in `cache_dir` under reference_key,
+    so any change to the file, the features or the defaults picks a new
+    entry. Within a process it is kept in memory and the file is only
+    hashed again when its size or mtime changes. cache_dir=None skips the
+    disk cache.
+    """
+    stat = os.stat(samples_csv)
+    memo_key = (os.path.abspath(samples_csv), tuple(feature_cols), tuple(labels))
+    with _references_lock:
+        cached = _references.get(memo_key)
+        if cached is not None and cached[0] == (stat.st_mtime_ns, stat.st_size):
+            return cached[1]
+
+        key = reference_key(samples_csv, feature_cols, labels)
+        path = os.path.join(cache_dir, f"{key}.npy") if cache_dir else None
+        try:
+            X = np.load(path)
+        except (OSError, ValueError, TypeError):
+            samples_df = pd.read_csv(samples_csv)
+            X = preprocess_matrix(samples_df[samples_df['Label'].isin(labels)], feature_cols)
+            if path is not None:
+                os.makedirs(cache_dir, exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, 'wb') as f:
+                    np.save(f, X)
+                os.replace(tmp, path)
+        X.setflags(write=False)
+        _references[memo_key] = ((stat.st_mtime_ns, stat.st_size), X)
+        return X
+
+
+def concatenate_csv_files(samples_csv="samples.csv", captured_csv="captured_packets.csv", output_csv="concatenated_file.csv"):
+    # Filtered, preprocessed samples from the reference cache
+    samples_df = pd.DataFrame(reference_matrix(samples_csv, feature_cols), columns=feature_cols)
+
+    # Read the captured packets and ensure they have the necessary columns
+    captured_df_org = pd.read_csv(captured_csv)
     captured_df = preprocess_capture(captured_df_org, feature_cols)
 
     # Concatenate the filtered samples DataFrame and captured DataFrame
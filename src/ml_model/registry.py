@@ -0,0 +1,171 @@
+import os
+import resource
+import threading
+import time
+
+import numpy as np
+from joblib import load
+
+from src.ml_model.compiled import load_forest
+from src.ml_model.inference import InferenceEngine
+
+
+def rss_bytes():
+    """Resident set size of this process (peak RSS where /proc is missing)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def load_model(model_path):
+    """A joblib-pickled forest, or a memory-mapped compiled.save_forest directory."""
+    if os.path.isdir(model_path):
+        return load_forest(model_path, mmap_mode='r')
+    return load(model_path)
+
+
+class ModelRegistry:
+    """
+    Holds the loaded model of one artifact for the life of the process.
+    The artifact is a joblib file or a forest directory (see load_model).
+
+    The model is loaded and warmed up (one small and one large dummy batch,
+    so both evaluation paths of InferenceEngine are ready) when the registry
+    is created. watch() starts a background thread that polls the artifact
+    every `poll_interval` seconds; once a change has settled for one poll,
+    the new model is loaded and warmed on that thread and then swapped in
+    with a single assignment. Callers read `registry.engine` once per batch,
+    so in-flight batches finish on the model they started with; the replaced
+    engine is retired, closing its thread pool once they are done. A failed
+    reload keeps the current model.
+    """
+
+    def __init__(self, model_path, poll_interval=2.0, **engine_options):
+        self.model_path = model_path
+        self.poll_interval = poll_interval
+        self.engine_options = engine_options
+        self.engine = None
+        self.version = 0
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.load_time = None
+        self.warmup_time = None
+        self.reload_latency = None
+        self.swap_latency = None
+        self._signature = self._stat()
+        self._stop = threading.Event()
+        self._watcher = None
+
+        engine, self.load_time, self.warmup_time = self._build()
+        self._swap(engine)
+        print(f"Loaded model {model_path} in {self.load_time:.2f} s "
+              f"(warm-up {self.warmup_time * 1000:.1f} ms, RSS {rss_bytes() / 2**20:.0f} MiB)")
+
+    def _stat(self):
+        # A forest directory is complete once its meta.json is replaced
+        path = self.model_path
+        if os.path.isdir(path):
+            path = os.path.join(path, "meta.json")
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _build(self):
+        start = time.perf_counter()
+        engine = InferenceEngine(load_model(self.model_path), **self.engine_options)
+        loaded = time.perf_counter()
+        for rows in (1, engine.compiled_max_rows + 1):
+            engine.predict(np.zeros((rows, engine.n_features)))
+        return engine, loaded - start, time.perf_counter() - loaded
+
+    def _swap(self, engine):
+        start = time.perf_counter()
+        previous, self.engine = self.engine, engine
+        self.version += 1
+        self.swap_latency = time.perf_counter() - start
+        if previous is not None:
+            previous.retire()
+
+    def reload(self):
+        """Load the artifact again and swap it in; returns False (keeping the current model) on failure."""
+        detected = time.perf_counter()
+        signature = self._stat()
+        try:
+            engine, load_time, warmup_time = self._build()
+        except Exception as e:
+            self.failed_reloads += 1
+            print(f"Reloading {self.model_path} failed, keeping model version {self.version}: {e}")
+            return False
+        finally:
+            # Retry only once the file changes again
+            self._signature = signature
+        self._swap(engine)
+        self.reloads += 1
+        self.load_time, self.warmup_time = load_time, warmup_time
+        self.reload_latency = time.perf_counter() - detected
+        print(f"Model {self.model_path} reloaded as version {self.version} in {self.reload_latency:.2f} s "
+              f"(swap {self.swap_latency * 1e6:.1f} us, RSS {rss_bytes() / 2**20:.0f} MiB)")
+        return True
+
+    def _watch(self):
+        pending = None
+        while not self._stop.wait(self.poll_interval):
+            try:
+                signature = self._stat()
+            except OSError:
+                # Being replaced; look again next poll
+                continue
+            if signature == self._signature:
+                pending = None
+            elif signature != pending:
+                # Changed since the last poll, wait for the writer to finish
+                pending = signature
+            else:
+                pending = None
+                self.reload()
+
+    def watch(self):
+        """Start reloading the model in the background when the artifact changes."""
+        if self._watcher is None:
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+            self._watcher.start()
+
+    def close(self):
+        """Stop watching the artifact."""
+        if self._watcher is not None:
+            self._stop.set()
+            self._watcher.join()
+            self._watcher = None
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "load_time_s": self.load_time,
+            "warmup_time_s": self.warmup_time,
+            "reloads": self.reloads,
+            "failed_reloads": self.failed_reloads,
+            "reload_latency_s": self.reload_latency,
+            "swap_latency_us": self.swap_latency * 1e6,
+            "rss_mb": rss_bytes() / 2**20,
+        }
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(model_path, **engine_options) -> ModelRegistry:
+    """
+    The process-wide registry of `model_path`, created on first use
+    (`engine_options` only apply then).
+    """
+    key = os.path.abspath(model_path)
+    with _registries_lock:
+        if key not in _registries:
+            _registries[key] = ModelRegistry(model_path, **engine_options)
+        return _registries[key]
@@ -0,0 +1,152 @@
+import multiprocessing
+import os
+import threading
+from collections import deque
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from src.ml_model.inference import InferenceEngine
+
+
+def _worker(engine, inputs, outputs, tasks, results):
+    # The engine and both rings come from the parent through fork: the
+    # model pages are shared copy-on-write and the rings are shared memory
+    while (task := tasks.get()) is not None:
+        slot, rows = task
+        try:
+            outputs[slot, :rows] = engine.predict_proba(inputs[slot, :rows])
+            results.put((slot, None))
+        except Exception as e:
+            results.put((slot, f"{type(e).__name__}: {e}"))
+
+
+class InferencePool:
+    """
+    Forest inference spread over worker processes.
+
+    Feature rows travel through a ring of `n_slots` shared-memory slots of
+    `slot_rows` rows each and the class probabilities come back through a
+    second ring, so only (slot, rows) pairs go through the queues. Workers
+    are forked after the model is loaded and inherit it, and take slots
+    from a shared task queue, so a slow batch does not hold the others up.
+
+    submit() queues up to `slot_rows` rows and returns a ticket; result()
+    waits for a ticket and frees its slot. predict() splits any batch over
+    the workers and returns (labels, confidence, proba) in row order, like
+    InferenceEngine.predict. Needs the fork start method (Linux).
+    The workers keep the model they were started with.
+    """
+
+    def __init__(self, engine: InferenceEngine, n_workers=None, slot_rows=1024, n_slots=None):
+        self.rf_model = engine.rf_model
+        self.compiled = engine.compiled
+        self.classes = engine.classes
+        self.n_features = engine.n_features
+        self.n_workers = n_workers or os.cpu_count() or 1
+        # A slot never exceeds one engine chunk, so workers do not use the
+        # engine's thread pool (threads do not survive the fork)
+        self.slot_rows = min(slot_rows, engine.chunk_size)
+        self.n_slots = n_slots or 4 * self.n_workers
+        n_classes = len(self.classes)
+
+        self._inputs_shm = shared_memory.SharedMemory(
+            create=True, size=self.n_slots * self.slot_rows * self.n_features * 8)
+        self._outputs_shm = shared_memory.SharedMemory(
+            create=True, size=self.n_slots * self.slot_rows * n_classes * 8)
+        self._inputs = np.ndarray((self.n_slots, self.slot_rows, self.n_features), dtype='float64',
+                                  buffer=self._inputs_shm.buf)
+        self._outputs = np.ndarray((self.n_slots, self.slot_rows, n_classes), dtype='float64',
+                                   buffer=self._outputs_shm.buf)
+
+        context = multiprocessing.get_context('fork')
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._workers = [
+            context.Process(target=_worker, args=(engine, self._inputs, self._outputs,
+                                                  self._tasks, self._results), daemon=True)
+            for _ in range(self.n_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+        self._free = deque(range(self.n_slots))
+        self._rows = [0] * self.n_slots
+        self._status = {}
+        self._condition = threading.Condition()
+        # Started after the fork so the workers do not inherit a running thread
+        self._collector = threading.Thread(target=self._collect, name="inference-results", daemon=True)
+        self._collector.start()
+
+    def _collect(self):
+        while (item := self._results.get()) is not None:
+            slot, error = item
+            with self._condition:
+                self._status[slot] = error
+                self._condition.notify_all()
+
+    def free_slots(self):
+        with self._condition:
+            return len(self._free)
+
+    def submit(self, X) -> int:
+        """Queue up to slot_rows feature rows for scoring; waits for a free slot."""
+        X = np.asarray(X, dtype='float64')
+        if X.ndim != 2 or X.shape[1] != self.n_features or len(X) > self.slot_rows:
+            raise ValueError(f"Expected at most ({self.slot_rows}, {self.n_features}) rows, got shape {X.shape}")
+        with self._condition:
+            self._condition.wait_for(lambda: self._free)
+            slot = self._free.popleft()
+        self._inputs[slot, :len(X)] = X
+        self._rows[slot] = len(X)
+        self._tasks.put((slot, len(X)))
+        return slot
+
+    def ready(self, ticket) -> bool:
+        with self._condition:
+            return ticket in self._status
+
+    def result(self, ticket) -> np.ndarray:
+        """Wait for a submitted ticket and return its class probabilities."""
+        with self._condition:
+            self._condition.wait_for(lambda: ticket in self._status)
+            error = self._status.pop(ticket)
+        try:
+            if error is not None:
+                raise RuntimeError(f"Inference worker failed: {error}")
+            return self._outputs[ticket, :self._rows[ticket]].copy()
+        finally:
+            with self._condition:
+                self._free.append(ticket)
+                self._condition.notify_all()
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype='float64')
+        tickets, parts = deque(), []
+        for start in range(0, len(X), self.slot_rows):
+            if len(tickets) == self.n_slots:
+                parts.append(self.result(tickets.popleft()))
+            tickets.append(self.submit(X[start:start + self.slot_rows]))
+        parts.extend(self.result(ticket) for ticket in tickets)
+        if not parts:
+            return np.zeros((0, len(self.classes)), dtype='float64')
+        return np.concatenate(parts)
+
+    def predict(self, X):
+        """(labels, confidence, proba) for the rows of X, as InferenceEngine.predict."""
+        proba = self.predict_proba(X)
+        best = proba.argmax(axis=1)
+        return self.classes.take(best), proba[np.arange(len(proba)), best], proba
+
+    def close(self):
+        """Stop the workers and release the shared memory."""
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._results.put(None)
+        self._collector.join()
+        del self._inputs, self._outputs
+        for shm in (self._inputs_shm, self._outputs_shm):
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,69 @@
+# decoder.py
+import numpy as np
+
+from src.packet_sniffer.sniffer import FIELDS
+from src.ml_model.model import feature_cols
+from src.utils.mac import parse_macs
+
+MAC_FIELDS = ['wlan.sa', 'wlan.da', 'wlan.bssid']
+
+
+def _to_float(cell):
+    try:
+        return float(cell)
+    except ValueError:
+        return np.nan
+
+
+def _split_block(block: bytes, width: int):
+    """Split a block of tshark lines into a flat list of cells, `width` per line."""
+    cells = block.replace(b'\n', b'\t').split(b'\t')
+    n = block.count(b'\n')
+    if len(cells) != n * width + 1:
+        # Ragged output (truncated last line, stray tabs): fix up line by line
+        cells = []
+        for line in block.splitlines():
+            values = line.split(b'\t')[:width]
+            cells.extend(values + [b''] * (width - len(values)))
+        return cells, len(cells) // width
+    cells.pop()
+    return cells, n
+
+
+def decode_block(block: bytes, fields=FIELDS, numeric=feature_cols, macs=MAC_FIELDS) -> dict:
+    """
+    Decode a block of tshark `-T fields` lines straight into NumPy columns.
+
+    Returns a dict with one float64 array per `numeric` field (missing or
+    invalid values are NaN) and one uint64 array per `macs` field (see
+    src.utils.mac). The numeric columns are views into a single C-order
+    (n, len(numeric)) matrix stored under the 'features' key. Fields that
+    are in neither list are skipped without being converted.
+    """
+    width = len(fields)
+    cells, n = _split_block(block, width)
+    index = {field: i for i, field in enumerate(fields)}
+
+    features = np.empty((n, len(numeric)), dtype=np.float64)
+    columns = {'features': features}
+    for j, field in enumerate(numeric):
+        if field not in index:
+            features[:, j] = np.nan
+        else:
+            # A strided slice of the flat list is one column
+            column = np.array(cells[index[field]::width], dtype='S')
+            if column.dtype.itemsize < 3:
+                column = column.astype('S3')
+            column[column == b''] = b'nan'
+            try:
+                features[:, j] = column.astype(np.float64)
+            except ValueError:
+                # Multi-valued or non-decimal cells: parse this column one by one
+                features[:, j] = [_to_float(cell) for cell in column]
+        columns[field] = features[:, j]
+
+    for field in macs:
+        if field in index:
+            columns[field] = parse_macs(cells[index[field]::width])
+
+    return columns
@@ -0,0 +1,62 @@
+# fields.py
+from src.ml_model.model import feature_cols
+
+# Fields the mitigator reads from a packet besides the model features
+MITIGATION_FIELDS = ['wlan.sa', 'frame.interface_name']
+
+# Frame control fields decoded as numbers when the prefilter or the
+# per-source windows need them
+FRAME_TYPE_FIELDS = ['wlan.fc.type', 'wlan.fc.subtype']
+
+# Control frames (ACK, RTS, CTS, BlockAck...) carry no source address, so a
+# verdict on them can never be acted upon; drop them in the kernel before
+# tshark dissects anything.
+CAPTURE_FILTER = "not type ctl"
+
+# Capture filters cannot be applied when reading a file; display filter
+# equivalents of the ones we ship (frames without 802.11 headers pass)
+REPLAY_FILTERS = {
+    CAPTURE_FILTER: "!(wlan.fc.type == 1)",
+}
+
+# ARPHRD_IEEE80211_RADIOTAP: link type of a monitor-mode interface
+# delivering radiotap headers
+RADIOTAP_LINK_TYPE = 803
+
+
+def live_capture_filter(interface):
+    """
+    CAPTURE_FILTER if `interface` is in monitor mode with radiotap headers,
+    else None: libpcap rejects 802.11 `type` expressions on managed and
+    Ethernet links.
+    """
+    try:
+        with open(f'/sys/class/net/{interface}/type') as f:
+            link_type = int(f.read())
+    except (OSError, ValueError):
+        return None
+    return CAPTURE_FILTER if link_type == RADIOTAP_LINK_TYPE else None
+
+
+def default_capture_filter(interface=None, pcap_file=None):
+    """CAPTURE_FILTER for a replay (applied through REPLAY_FILTERS), else live_capture_filter(interface)."""
+    return CAPTURE_FILTER if pcap_file else live_capture_filter(interface)
+
+
+def model_features(rf_model=None):
+    """Feature names the model was fitted on, falling back to model.feature_cols."""
+    names = getattr(rf_model, 'feature_names_in_', None)
+    return list(names) if names is not None else list(feature_cols)
+
+
+def capture_fields(rf_model=None, extras=()):
+    """
+    Fields to ask the capture backend for: the model's features, then what
+    the mitigator needs, then any explicitly requested `extras`, without
+    duplicates.
+    """
+    fields = []
+    for field in model_features(rf_model) + MITIGATION_FIELDS + list(extras):
+        if field not in fields:
+            fields.append(field)
+    return fields
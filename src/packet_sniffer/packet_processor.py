@@ -4,10 +4,52 @@ import csv
 import argparse
 import os
 import time
-from datetime import datetime
 
+from src.packet_sniffer.fields import capture_fields, default_capture_filter, CAPTURE_FILTER, REPLAY_FILTERS
+from src.packet_sniffer.sniffer import ReplayClock
 
-def capture_packets(interface="wlo1", output_file="output_test_shark.csv", duration=60, display_filter=None, packet_count=None):
+
+def compile_fields(fields):
+    """
+    Compile field names into one row extractor.
+    
+    Fields are grouped by the packet layer they live in, with 'frame.*'
+    fields read from frame_info, so each layer is looked up once per packet
+    and the attribute names are built once here instead of per packet.
+    
+    Args:
+        fields (list): Field names such as 'wlan.fc.type'
+    
+    Returns:
+        callable: extract(packet, timestamp) -> [timestamp] + one value per
+        field, '' where the packet has no such layer or field
+    """
+    layers = {}
+    for column, field in enumerate(fields, start=1):
+        layer_name, _, attr_name = field.partition('.')
+        if layer_name == 'frame':
+            layer_name = 'frame_info'
+        layers.setdefault(layer_name, []).append((column, attr_name.replace('.', '_')))
+    table = list(layers.items())
+    width = len(fields) + 1
+    
+    def extract(packet, timestamp):
+        row = [''] * width
+        row[0] = timestamp
+        for layer_name, accessors in table:
+            layer = getattr(packet, layer_name, None)
+            if layer is None:
+                continue
+            for column, attr_name in accessors:
+                row[column] = getattr(layer, attr_name, '')
+        return row
+    
+    return extract
+
+
+def capture_packets(interface="wlo1", output_file="output_test_shark.csv", duration=60, display_filter=None, packet_count=None,
+                    extra_fields=(), bpf_filter=None, input_file=None, speed=None,
+                    batch_size=1000, flush_interval=1.0):
     """
     Capture packets from specified interface and extract the requested fields.
     
@@ -17,32 +59,50 @@ def capture_packets(interface="wlo1", output_file="output_test_shark.csv", durat
         duration (int): Duration of capture in seconds (default: 60)
         display_filter (str): Wireshark display filter (default: None)
         packet_count (int): Number of packets to capture (default: None)
+        extra_fields (list): Fields to extract on top of the model features and
+            the mitigator's fields (default: none)
+        bpf_filter (str): Capture filter applied before dissection (default: drop
+            control frames when the interface is in monitor mode with radiotap,
+            no filter otherwise)
+        input_file (str): pcap/pcapng file to replay instead of capturing live (default: None)
+        speed (float): Replay at the original timing scaled by this factor;
+            None replays as fast as possible (default: None)
+        batch_size (int): Rows buffered before they are written out (default: 1000)
+        flush_interval (float): Longest time in seconds rows stay buffered (default: 1.0)
+    
+    The timestamp column is the packet's capture time (epoch seconds).
     """
-    print(f"Starting packet capture on {interface} for {duration}s or {packet_count if packet_count else 'unlimited'} packets...")
-    
-    # Define all fields we want to capture
-    fields = [
-        'frame.len', 'frame.time_delta', 'frame.time_delta_displayed', 
-        'frame.time_epoch', 'frame.time_relative', 'radiotap.length', 
-        'radiotap.timestamp.ts', 'wlan.duration', 'wlan.fc.frag', 
-        'wlan.fc.order', 'wlan.fc.moredata', 'wlan.fc.protected',
-        'wlan.fc.pwrmgt', 'wlan.fc.type', 'wlan.fc.retry', 
-        'wlan.fc.subtype', 'wlan_radio.duration', 'wlan.seq', 
-        'wlan_radio.data_rate', 'wlan_radio.signal_dbm', 'wlan_radio.phy', 
-        'wlan.sa', 'wlan.da', 'wlan.bssid', 'frame.interface_name',
-        'ip.src', 'ip.dst'
-    ]
-    
-    # Create a live capture
-    capture = pyshark.LiveCapture(
-        interface=interface,
-        display_filter=display_filter
-    )
+    source = input_file or interface
+    print(f"Starting packet capture on {source} for {duration}s or {packet_count if packet_count else 'unlimited'} packets...")
+    
+    # Only extract the fields the model and the mitigator consume
+    fields = capture_fields(extras=extra_fields)
+    extract = compile_fields(fields)
+    clock = ReplayClock(speed) if input_file and speed else None
     
-    # Set timeout if duration is specified
-    if duration:
-        capture.set_debug()
-        capture.sniff_timeout = duration
+    if bpf_filter is None:
+        # The default filter only parses on 802.11 links
+        bpf_filter = default_capture_filter(interface, input_file)
+    if input_file:
+        # Replay a capture file; BPF does not apply, use the display filter equivalent
+        replay_filter = REPLAY_FILTERS.get(bpf_filter)
+        filters = [f for f in (display_filter, replay_filter) if f]
+        capture = pyshark.FileCapture(
+            input_file,
+            display_filter=' && '.join(f'({f})' for f in filters) or None
+        )
+    else:
+        # Create a live capture
+        capture = pyshark.LiveCapture(
+            interface=interface,
+            display_filter=display_filter,
+            bpf_filter=bpf_filter
+        )
+    
+        # Set timeout if duration is specified
+        if duration:
+            capture.set_debug()
+            capture.sniff_timeout = duration
     
     # Open CSV file for writing
     with open(output_file, 'w', newline='') as csvfile:
@@ -53,39 +113,26 @@ def capture_packets(interface="wlo1", output_file="output_test_shark.csv", durat
         # Start packet capture
         packet_counter = 0
         start_time = time.time()
+        last_flush = start_time
+        rows = []
         
         try:
             # Apply packet limit if specified
-            if packet_count:
+            if input_file:
+                packets = iter(capture)
+            elif packet_count:
                 packets = capture.sniff_continuously(packet_count=packet_count)
             else:
                 packets = capture.sniff_continuously()
                 
             for packet in packets:
-                row_data = [datetime.now().isoformat()]
-                
-                # Extract each field, handling cases where field may not exist
-                for field in fields:
-                    try:
-                        # Split the field name by dots to navigate through packet layers
-                        parts = field.split('.')
-                        layer_name = parts[0]
-                        
-                        # Handle special case for frame fields which are in frame_info
-                        if layer_name == 'frame' and hasattr(packet, 'frame_info'):
-                            value = getattr(packet.frame_info, '_'.join(parts[1:]), '')
-                        elif hasattr(packet, layer_name):
-                            layer = getattr(packet, layer_name)
-                            attr_name = '_'.join(parts[1:])
-                            value = getattr(layer, attr_name, '')
-                        else:
-                            value = ''
-                    except (AttributeError, IndexError):
-                        value = ''
-                    
-                    row_data.append(value)
+                stamp = packet.sniff_timestamp
+                if clock:
+                    delay = clock.delay(float(stamp))
+                    if delay > 0:
+                        time.sleep(delay)
                 
-                writer.writerow(row_data)
+                rows.append(extract(packet, stamp))
                 packet_counter += 1
                 
                 # Check if we've captured enough packets
@@ -93,16 +140,22 @@ def capture_packets(interface="wlo1", output_file="output_test_shark.csv", durat
                     break
                 
                 # Check if we've captured for long enough
-                if duration and (time.time() - start_time) >= duration:
+                now = time.time()
+                if duration and (now - start_time) >= duration:
                     break
                     
-                # Flush to disk every 10 packets
-                if packet_counter % 10 == 0:
+                # Write buffered rows in batches
+                if len(rows) >= batch_size or now - last_flush >= flush_interval:
+                    writer.writerows(rows)
                     csvfile.flush()
+                    rows.clear()
+                    last_flush = now
                     print(f"Captured {packet_counter} packets...")
                 
         except KeyboardInterrupt:
             print("\nCapture stopped by user.")
+        finally:
+            writer.writerows(rows)
         
     print(f"Capture complete! {packet_counter} packets captured and saved to {output_file}")
 
@@ -110,9 +163,17 @@ def capture_packets(interface="wlo1", output_file="output_test_shark.csv", durat
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Capture network traffic and save specified fields to CSV')
     
-    parser.add_argument('-i', '--interface', required=True, 
+    source = parser.add_mutually_exclusive_group(required=True)
+    
+    source.add_argument('-i', '--interface',
                         help='Network interface to capture from (e.g., wlan0)')
     
+    source.add_argument('-r', '--read', default=None,
+                        help='pcap/pcapng file to replay instead of a live interface')
+    
+    parser.add_argument('--speed', type=float, default=None,
+                        help='Replay at original timing times this factor (default: as fast as possible)')
+    
     parser.add_argument('-o', '--output', default=f'capture_{int(time.time())}.csv',
                         help='Output CSV file path (default: capture_<timestamp>.csv)')
     
@@ -125,13 +186,19 @@ if __name__ == "__main__":
     parser.add_argument('-c', '--count', type=int, default=None,
                         help='Number of packets to capture')
     
+    parser.add_argument('-e', '--extra-field', action='append', default=[],
+                        help='Extra field to extract besides the model features (repeatable)')
+    
+    parser.add_argument('--bpf', default=None,
+                        help=f'Capture filter (default: "{CAPTURE_FILTER}" in monitor mode with radiotap, else none)')
+    
     parser.add_argument('--monitor-mode', action='store_true',
                         help='Enable monitor mode on the interface before capture')
     
     args = parser.parse_args()
     
     # Enable monitor mode if requested
-    if args.monitor_mode:
+    if args.monitor_mode and args.interface:
         print(f"Enabling monitor mode on {args.interface}...")
         os.system(f"sudo ip link set {args.interface} down")
         os.system(f"sudo iw {args.interface} set monitor control")
@@ -144,11 +211,15 @@ if __name__ == "__main__":
         output_file=args.output,
         duration=args.duration,
         display_filter=args.filter,
-        packet_count=args.count
+        packet_count=args.count,
+        extra_fields=args.extra_field,
+        bpf_filter=args.bpf,
+        input_file=args.read,
+        speed=args.speed
     )
     
     # Disable monitor mode if it was enabled
-    if args.monitor_mode:
+    if args.monitor_mode and args.interface:
         print(f"Disabling monitor mode on {args.interface}...")
         os.system(f"sudo ip link set {args.interface} down")
         os.system(f"sudo iw {args.interface} set type managed")
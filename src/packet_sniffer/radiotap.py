@@ -0,0 +1,509 @@
+# radiotap.py
+"""
+Built-in capture backend that needs neither tshark nor pyshark.
+
+Frames come from a memory-mapped pcap/pcapng file or from an AF_PACKET
+socket on a monitor-mode interface, and only the radiotap and 802.11
+header fields the pipeline uses are parsed. The output has the same
+layout as decoder.decode_block, so both backends feed the same stages.
+"""
+import asyncio
+import mmap
+import socket
+import struct
+import time
+
+import numpy as np
+
+from src.ml_model.model import feature_cols
+from src.packet_sniffer.decoder import MAC_FIELDS
+from src.packet_sniffer.sniffer import ReplayClock
+
+LINKTYPE_IEEE802_11_RADIOTAP = 127
+ETH_P_ALL = 0x0003
+
+# Fields this backend can produce
+NATIVE_FIELDS = [
+    'frame.time_epoch', 'frame.len', 'radiotap.length', 'radiotap.timestamp.ts',
+    'wlan_radio.data_rate', 'wlan_radio.signal_dbm', 'wlan_radio.duration', 'wlan_radio.frequency',
+    'wlan.duration', 'wlan.fc.type', 'wlan.fc.subtype', 'wlan.fc.ds', 'wlan.fc.frag',
+    'wlan.fc.retry', 'wlan.fc.pwrmgt', 'wlan.fc.moredata', 'wlan.fc.protected',
+    'wlan.fc.order', 'wlan.seq',
+]
+# Derived from frame.time_epoch once a batch is decoded
+TIME_FIELDS = ['frame.time_relative', 'frame.time_delta', 'frame.time_delta_displayed']
+
+# Radiotap namespace: bit -> (alignment, size), up to the timestamp field
+_RT_FIELDS = {
+    0: (8, 8), 1: (1, 1), 2: (1, 1), 3: (2, 4), 4: (1, 2), 5: (1, 1), 6: (1, 1),
+    7: (2, 2), 8: (2, 2), 9: (2, 2), 10: (1, 1), 11: (1, 1), 12: (1, 1), 13: (1, 1),
+    14: (2, 2), 15: (2, 2), 16: (1, 1), 17: (1, 1), 18: (4, 8), 19: (1, 3), 20: (4, 8),
+    21: (2, 12), 22: (8, 12),
+}
+_RT_FLAGS, _RT_RATE, _RT_CHANNEL, _RT_ANTSIGNAL, _RT_MCS, _RT_VHT, _RT_TIMESTAMP = 1, 2, 3, 5, 19, 21, 22
+_RT_WANTED = (_RT_FLAGS, _RT_RATE, _RT_CHANNEL, _RT_ANTSIGNAL, _RT_MCS, _RT_VHT, _RT_TIMESTAMP)
+
+_FLAG_SHORT_PREAMBLE = 0x02
+_FLAG_FCS = 0x10
+_CHAN_CCK = 0x0020
+
+# HT/VHT data rates: data subcarriers per bandwidth, (bits per subcarrier, coding rate) per MCS
+_SUBCARRIERS = np.array([52, 108, 234, 468])
+_MODULATION = np.array([1 / 2, 2 / 2, 2 * 3 / 4, 4 / 2, 4 * 3 / 4, 6 * 2 / 3, 6 * 3 / 4, 6 * 5 / 6, 8 * 3 / 4, 8 * 5 / 6])
+# Mbit/s indexed by [bandwidth index, short GI, MCS, spatial streams - 1]
+_OFDM_RATES = (_SUBCARRIERS[:, None, None, None] * _MODULATION[None, None, :, None]
+               * np.arange(1, 9)[None, None, None, :] / np.array([4.0, 3.6])[None, :, None, None])
+# Radiotap bandwidth codes -> index into _SUBCARRIERS (20, 40, 80, 160 MHz)
+_HT_BANDWIDTH = np.array([0, 1, 0, 0])
+_VHT_BANDWIDTH = np.array([0, 1, 1, 1] + [2] * 7 + [3] * 15 + [0] * 230)
+
+_CCK_RATES = (1.0, 2.0, 5.5, 11.0)
+_MAX_PRESENT_WORDS = 8
+_u32 = struct.Struct('<I').unpack_from
+_layouts = {}
+
+
+def _layout(present_words):
+    """Offsets (from the radiotap start) of the fields we read, 0 if absent, for one present bitmap."""
+    offsets = _layouts.get(present_words)
+    if offsets is None:
+        words = [w for w in present_words if w] or [0]
+        present = words[0]
+        offset = 4 + 4 * len(words)
+        found = dict.fromkeys(_RT_WANTED, 0)
+        for bit in range(max(_RT_FIELDS) + 1):
+            if not present & (1 << bit):
+                continue
+            align, size = _RT_FIELDS[bit]
+            offset = (offset + align - 1) & ~(align - 1)
+            if bit in found:
+                found[bit] = offset
+            offset += size
+        offsets = tuple(found[bit] for bit in _RT_WANTED)
+        _layouts[present_words] = offsets
+    return offsets
+
+
+class _Gather:
+    """Little-endian loads at many offsets of one uint8 buffer; out-of-frame reads give 0."""
+
+    def __init__(self, data, ends):
+        self.data = data
+        self.ends = ends
+        self.last = len(data) - 1
+
+    def _bytes(self, offsets, size, width):
+        # (n, width) matrix holding the `size` bytes at each offset, right-padded with zeros
+        raw = np.zeros((len(offsets), width), dtype=np.uint8)
+        raw[:, :size] = self.data[np.minimum(offsets[:, None] + np.arange(size), self.last)]
+        return raw
+
+    def uint(self, offsets, size, valid=None):
+        ok = offsets + size <= self.ends
+        if valid is not None:
+            ok &= valid
+        width = 1 << (size - 1).bit_length()
+        value = self._bytes(offsets, size, width).view(f'<u{width}').ravel().astype(np.uint64)
+        value[~ok] = 0
+        return value, ok
+
+    def mac(self, offsets, valid):
+        ok = valid & (offsets + 6 <= self.ends)
+        value = self._bytes(offsets, 6, 8)[:, ::-1].copy().view('<u8').ravel() >> np.uint64(16)
+        value[~ok] = 0
+        return value
+
+
+def decode_frames(data, starts, caplens, origlens, epochs):
+    """
+    Vectorised radiotap + 802.11 header decode.
+
+    `data` is a uint8 array holding the frames, which start at `starts` and
+    are `caplens` bytes long. Returns ({field: float64 array} for
+    NATIVE_FIELDS, (sa, da, bssid) uint64 arrays); frames too short to hold
+    a frame control field get wlan.fc.type NaN.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    caplens = np.asarray(caplens, dtype=np.int64)
+    n = len(starts)
+    g = _Gather(data, starts + caplens)
+    has_header = caplens >= 8
+
+    rt_len = g.uint(starts + 2, 2, has_header)[0].astype(np.int64)
+    # Present bitmap words, following the extension bit
+    words = np.zeros((n, _MAX_PRESENT_WORDS), dtype=np.uint64)
+    words[:, 0], ok = g.uint(starts + 4, 4, has_header)
+    more = np.flatnonzero(ok & ((words[:, 0] & np.uint64(0x80000000)) != 0))
+    for k in range(1, _MAX_PRESENT_WORDS):
+        if not len(more):
+            break
+        words[more, k], ok = g.uint(starts[more] + 4 + 4 * k, 4)
+        more = more[ok & ((words[more, k] & np.uint64(0x80000000)) != 0)]
+
+    # Few distinct radiotap layouts per capture: resolve each one once. Most
+    # frames have a single present word, so those are grouped on a 1-D key
+    layout = np.zeros((n, len(_RT_WANTED)), dtype=np.int64)
+    single = words[:, 1] == 0
+    for rows in (single, ~single):
+        if not rows.any():
+            continue
+        keys = words[rows, 0] if rows is single else words[rows]
+        unique, inverse = np.unique(keys, axis=None if rows is single else 0, return_inverse=True)
+        table = np.array([_layout(tuple(int(w) for w in np.atleast_1d(row))) for row in unique], dtype=np.int64)
+        layout[rows] = table.reshape(-1, len(_RT_WANTED))[inverse.ravel()]
+    at = {bit: layout[:, i] for i, bit in enumerate(_RT_WANTED)}
+
+    def field(bit, size):
+        present = (at[bit] > 0) & (at[bit] + size <= rt_len)
+        return g.uint(starts + at[bit], size, present)
+
+    flags, _ = field(_RT_FLAGS, 1)
+    rate_raw, has_rate = field(_RT_RATE, 1)
+    channel, has_channel = field(_RT_CHANNEL, 4)
+    signal_raw, has_signal = field(_RT_ANTSIGNAL, 1)
+    mcs, has_mcs = field(_RT_MCS, 3)
+    vht_head, has_vht = field(_RT_VHT, 4)
+    vht_mcs, _ = g.uint(starts + at[_RT_VHT] + 4, 1, has_vht)
+    tsf, has_tsf = field(_RT_TIMESTAMP, 8)
+
+    rate = np.where(has_rate, rate_raw / 2, np.nan)
+    freq = np.where(has_channel, channel & np.uint64(0xFFFF), np.nan)
+    signal = np.where(has_signal, signal_raw.astype(np.int64) - 256 * (signal_raw > 127), np.nan)
+    tsf = np.where(has_tsf, tsf.astype(np.float64), np.nan)
+
+    # HT: MCS field bytes are known, flags, index
+    ht = has_mcs & ~has_rate
+    mcs_flags = ((mcs >> np.uint64(8)) & np.uint64(0xFF)).astype(np.int64)
+    mcs_index = ((mcs >> np.uint64(16)) & np.uint64(0xFF)).astype(np.int64)
+    nss = np.ones(n, dtype=np.int64)
+    nss[ht] = np.minimum(mcs_index[ht] // 8 + 1, 8)
+    rate[ht] = _OFDM_RATES[_HT_BANDWIDTH[mcs_flags[ht] & 0x03], (mcs_flags[ht] >> 2) & 1,
+                           mcs_index[ht] % 8, nss[ht] - 1]
+    # VHT: known (2 bytes), flags, bandwidth, then the first user's MCS/NSS
+    vht = has_vht & ~has_rate & ~ht
+    vht_nss = (vht_mcs & np.uint64(0x0F)).astype(np.int64)
+    vht_index = (vht_mcs >> np.uint64(4)).astype(np.int64)
+    vht &= (vht_nss > 0) & (vht_index < len(_MODULATION))
+    nss[vht] = vht_nss[vht]
+    vht_flags = ((vht_head >> np.uint64(16)) & np.uint64(0xFF)).astype(np.int64)
+    vht_bw = ((vht_head >> np.uint64(24)) & np.uint64(0xFF)).astype(np.int64)
+    rate[vht] = _OFDM_RATES[_VHT_BANDWIDTH[vht_bw[vht]], (vht_flags[vht] >> 2) & 1, vht_index[vht], nss[vht] - 1]
+
+    # 802.11 header
+    wlan = starts + rt_len
+    wlan_len = caplens - rt_len
+    has_fc = has_header & (wlan_len >= 2)
+    fc, _ = g.uint(wlan, 2, has_fc)
+    fc = fc.astype(np.int64)
+    frame_type = (fc >> 2) & 0x03
+    fc_flags = fc >> 8
+    duration, has_duration = g.uint(wlan + 2, 2, has_fc)
+    has_addresses = has_fc & (frame_type != 1) & (wlan_len >= 24)
+    seq, _ = g.uint(wlan + 22, 2, has_addresses)
+    a1, a2, a3 = (g.mac(wlan + off, has_addresses) for off in (4, 10, 16))
+    a4 = g.mac(wlan + 24, has_addresses)
+
+    # Address roles by To/From DS bits (management frames always use 0)
+    ds = np.where(frame_type == 0, 0, fc_flags & 0x03)
+    sa = np.select([ds == 0, ds == 1, ds == 2], [a2, a2, a3], a4)
+    da = np.select([ds == 0, ds == 1, ds == 2], [a1, a3, a1], a3)
+    bssid = np.select([ds == 0, ds == 1, ds == 2], [a3, a1, a2], 0).astype(np.uint64)
+
+    # Airtime, as Wireshark's wlan_radio.duration estimates it
+    psdu_len = np.asarray(origlens, dtype=np.int64) - rt_len + np.where(flags & np.uint64(_FLAG_FCS), 0, 4)
+    legacy = has_rate
+    cck = legacy & ((((channel >> np.uint64(16)) & np.uint64(_CHAN_CCK)) > 0) | np.isin(rate, _CCK_RATES))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        preamble = np.where(((flags & np.uint64(_FLAG_SHORT_PREAMBLE)) > 0) & (rate > 1), 96, 192)
+        dsss = preamble + np.ceil(psdu_len * 8 / rate)
+        symbols = np.ceil((16 + 8 * psdu_len + 6) / (4 * rate))
+        airtime = np.where(legacy, np.where(cck, dsss, 20 + 4 * symbols), 36 + 4 * nss + 4 * symbols)
+    airtime[~(rate > 0)] = np.nan
+
+    def flag(bit):
+        return np.where(has_fc, (fc_flags >> bit) & 1, np.nan)
+
+    values = {
+        'frame.time_epoch': np.asarray(epochs, dtype=np.float64),
+        'frame.len': np.asarray(origlens, dtype=np.float64),
+        'radiotap.length': np.where(has_header, rt_len, np.nan),
+        'radiotap.timestamp.ts': tsf,
+        'wlan_radio.data_rate': rate,
+        'wlan_radio.signal_dbm': signal,
+        'wlan_radio.duration': airtime,
+        'wlan_radio.frequency': freq,
+        'wlan.duration': np.where(has_duration, duration & np.uint64(0x7FFF), np.nan),
+        'wlan.fc.type': np.where(has_fc, frame_type, np.nan),
+        'wlan.fc.subtype': np.where(has_fc, (fc >> 4) & 0x0F, np.nan),
+        'wlan.fc.ds': np.where(has_fc, fc_flags & 0x03, np.nan),
+        'wlan.fc.frag': flag(2),
+        'wlan.fc.retry': flag(3),
+        'wlan.fc.pwrmgt': flag(4),
+        'wlan.fc.moredata': flag(5),
+        'wlan.fc.protected': flag(6),
+        'wlan.fc.order': flag(7),
+        'wlan.seq': np.where(has_addresses, seq >> np.uint64(4), np.nan),
+    }
+    return values, (sa.astype(np.uint64), da.astype(np.uint64), bssid)
+
+
+class FrameDecoder:
+    """
+    Turns raw radiotap frames into NumPy columns.
+
+    Keeps the previous and first timestamps so frame.time_delta and
+    frame.time_relative continue across batches of the same capture.
+    """
+
+    def __init__(self, numeric=feature_cols, macs=MAC_FIELDS, drop_control=True):
+        self.numeric = list(numeric)
+        self.macs = list(macs)
+        self.drop_control = drop_control
+        self.first_epoch = None
+        self.last_epoch = None
+
+    def decode(self, data, starts, caplens, origlens, epochs) -> dict:
+        """Same arguments as decode_frames; returns decoder.decode_block style columns."""
+        source, addresses = decode_frames(data, starts, caplens, origlens, epochs)
+        keep = ~np.isnan(source['wlan.fc.type'])
+        if self.drop_control:
+            keep &= source['wlan.fc.type'] != 1
+        if not keep.all():
+            source = {field: values[keep] for field, values in source.items()}
+            addresses = [values[keep] for values in addresses]
+
+        epochs = source['frame.time_epoch']
+        n = len(epochs)
+        if n:
+            if self.first_epoch is None:
+                self.first_epoch = self.last_epoch = epochs[0]
+            delta = np.diff(epochs, prepend=self.last_epoch)
+            self.last_epoch = epochs[-1]
+            source['frame.time_relative'] = epochs - self.first_epoch
+            source['frame.time_delta'] = delta
+            source['frame.time_delta_displayed'] = delta
+
+        features = np.empty((n, len(self.numeric)), dtype=np.float64)
+        columns = {'features': features}
+        for j, field in enumerate(self.numeric):
+            features[:, j] = source[field] if field in source else np.nan
+            columns[field] = features[:, j]
+
+        for field, values in zip(MAC_FIELDS, addresses):
+            if field in self.macs:
+                columns[field] = values
+        return columns
+
+
+def _pcap_index(buf):
+    magic = bytes(buf[:4])
+    if magic in (b'\xd4\xc3\xb2\xa1', b'\x4d\x3c\xb2\xa1'):
+        endian = '<'
+    elif magic in (b'\xa1\xb2\xc3\xd4', b'\xa1\xb2\x3c\x4d'):
+        endian = '>'
+    else:
+        raise ValueError("Not a pcap file")
+    divisor = 1e9 if magic in (b'\x4d\x3c\xb2\xa1', b'\xa1\xb2\x3c\x4d') else 1e6
+    linktype = struct.unpack_from(endian + 'I', buf, 20)[0] & 0x0FFFFFFF
+    if linktype != LINKTYPE_IEEE802_11_RADIOTAP:
+        raise ValueError(f"Unsupported link type {linktype}, expected radiotap (127)")
+
+    # Record headers are chained by their lengths, so this walk stays sequential;
+    # everything after it is vectorised
+    caplen_at = struct.Struct(endian + 'I').unpack_from
+    headers = []
+    offset, size = 24, len(buf)
+    while offset + 16 <= size:
+        headers.append(offset)
+        offset += 16 + caplen_at(buf, offset + 8)[0]
+    # The rest of each 16-byte record header is read in one vectorised pass
+    headers = np.array(headers, dtype=np.int64)
+    raw = np.frombuffer(buf, dtype=np.uint8)[headers[:, None] + np.arange(16)]
+    seconds, fractions, caplens, origlens = raw.view(endian + 'u4').astype(np.int64).T
+    starts = headers + 16
+    caplens = np.minimum(caplens, size - starts)
+    epochs = seconds + fractions / divisor
+    return starts, caplens, origlens, epochs
+
+
+def _pcapng_index(buf):
+    starts, caplens, origlens, epochs = [], [], [], []
+    offset, size = 0, len(buf)
+    endian = '<'
+    interfaces = []
+    while offset + 12 <= size:
+        if bytes(buf[offset:offset + 4]) == b'\x0a\x0d\x0d\x0a':
+            # Section header: the byte-order magic decides the endianness
+            endian = '<' if bytes(buf[offset + 8:offset + 12]) == b'\x4d\x3c\x2b\x1a' else '>'
+            interfaces = []
+        block_type, block_len = struct.unpack_from(endian + 'II', buf, offset)
+        if block_len < 12:
+            raise ValueError("Corrupt pcapng block")
+        body = offset + 8
+        if block_type == 1:
+            # Interface description: link type, then options (if_tsresol = 9)
+            linktype = struct.unpack_from(endian + 'H', buf, body)[0]
+            resolution = 1e6
+            option = body + 8
+            while option + 4 <= offset + block_len - 4:
+                code, length = struct.unpack_from(endian + 'HH', buf, option)
+                if code == 0:
+                    break
+                if code == 9:
+                    value = buf[option + 4]
+                    resolution = 2 ** (value & 0x7F) if value & 0x80 else 10 ** value
+                option += 4 + ((length + 3) & ~3)
+            interfaces.append((linktype, resolution))
+        elif block_type == 6:
+            interface, high, low, caplen, origlen = struct.unpack_from(endian + 'IIIII', buf, body)
+            linktype, resolution = interfaces[interface]
+            if linktype == LINKTYPE_IEEE802_11_RADIOTAP:
+                starts.append(body + 20)
+                caplens.append(caplen)
+                origlens.append(origlen)
+                epochs.append(((high << 32) | low) / resolution)
+        offset += block_len
+    return starts, caplens, origlens, np.array(epochs, dtype=np.float64)
+
+
+def read_pcap(path, numeric=feature_cols, macs=MAC_FIELDS, batch_size=None, drop_control=True):
+    """
+    Decode a radiotap pcap or pcapng file through mmap.
+
+    Returns the decoded columns for the whole file or, with `batch_size`,
+    yields them batch by batch.
+    """
+    decoder = FrameDecoder(numeric, macs, drop_control)
+
+    def batches():
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            data = np.frombuffer(mapped, dtype=np.uint8)
+            try:
+                index = _pcapng_index(mapped) if mapped[:4] == b'\x0a\x0d\x0d\x0a' else _pcap_index(mapped)
+                starts, caplens, origlens, epochs = (np.asarray(values) for values in index)
+                step = batch_size or max(len(starts), 1)
+                for first in range(0, max(len(starts), 1), step):
+                    window = slice(first, first + step)
+                    yield decoder.decode(data, starts[window], caplens[window], origlens[window], epochs[window])
+            finally:
+                # Release the view before the mapping is closed
+                del data
+
+    if batch_size:
+        return batches()
+    return next(batches())
+
+
+class NativeCapture:
+    """
+    tshark-free counterpart of sniffer.AsyncCapture.
+
+    Reads radiotap frames from an AF_PACKET socket on a monitor-mode
+    interface (needs CAP_NET_RAW) or, with `pcap_file`, from a memory-mapped
+    capture file, and queues (columns, count, captured_at) items that the
+    streaming pipeline consumes without running decoder.decode_block. File
+    replay can be paced with `speed` like sniffer.AsyncCapture, one batch
+    of `batch_size` frames at a time.
+    """
+
+    def __init__(self, interface="wlo1", numeric=feature_cols, macs=MAC_FIELDS, queue_size=64, batch_size=512,
+                 drop_when_full=True, pcap_file=None, speed=None, snaplen=4096):
+        self.interface = interface
+        self.pcap_file = pcap_file
+        self.clock = ReplayClock(speed) if pcap_file and speed else None
+        self.batch_size = batch_size
+        self.drop_when_full = drop_when_full
+        self.snaplen = snaplen
+        self.decoder = FrameDecoder(numeric, macs)
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.packets = 0
+        self.batches = 0
+        self.dropped_packets = 0
+        self.dropped_batches = 0
+        self.max_depth = 0
+
+    def stats(self):
+        return {
+            "packets": self.packets,
+            "batches": self.batches,
+            "dropped_packets": self.dropped_packets,
+            "dropped_batches": self.dropped_batches,
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_depth,
+        }
+
+    async def _push(self, columns):
+        count = len(columns['features'])
+        if not count:
+            return
+        self.packets += count
+        if self.drop_when_full and self.queue.full():
+            self.dropped_packets += count
+            self.dropped_batches += 1
+            return
+        await self.queue.put((columns, count, time.monotonic()))
+        self.batches += 1
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    async def run(self, duration=None):
+        try:
+            if self.pcap_file:
+                await self._run_file(duration)
+            else:
+                await self._run_socket(duration)
+        finally:
+            await self.queue.put(None)
+
+    async def _run_file(self, duration):
+        deadline = time.monotonic() + duration if duration else None
+        for columns in read_pcap(self.pcap_file, self.decoder.numeric, self.decoder.macs, self.batch_size):
+            epochs = columns.get('frame.time_epoch')
+            if self.clock and epochs is not None and len(epochs):
+                delay = self.clock.delay(epochs[-1])
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await self._push(columns)
+            # Let the downstream stages run between batches
+            await asyncio.sleep(0)
+            if deadline and time.monotonic() >= deadline:
+                break
+
+    async def _wait_readable(self, sock, timeout):
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        loop.add_reader(sock.fileno(), lambda: ready.done() or ready.set_result(None))
+        try:
+            await asyncio.wait_for(ready, timeout)
+        finally:
+            loop.remove_reader(sock.fileno())
+
+    async def _run_socket(self, duration):
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        sock.bind((self.interface, 0))
+        sock.setblocking(False)
+        deadline = loop.time() + duration if duration else None
+        # One slot of snaplen bytes per frame of a batch
+        data = np.zeros(self.batch_size * self.snaplen, dtype=np.uint8)
+        views = [memoryview(data)[i * self.snaplen:(i + 1) * self.snaplen] for i in range(self.batch_size)]
+        try:
+            while deadline is None or loop.time() < deadline:
+                try:
+                    await self._wait_readable(sock, deadline - loop.time() if deadline else None)
+                except asyncio.TimeoutError:
+                    break
+                # Drain whatever the kernel has queued, up to one batch, into one buffer
+                caplens, origlens, epochs = [], [], []
+                for i in range(self.batch_size):
+                    try:
+                        # MSG_TRUNC returns the on-air length even if the frame was cut at snaplen
+                        origlen = sock.recv_into(views[i], 0, socket.MSG_TRUNC)
+                    except BlockingIOError:
+                        break
+                    caplens.append(min(origlen, self.snaplen))
+                    origlens.append(origlen)
+                    epochs.append(time.time())
+                starts = np.arange(len(caplens)) * self.snaplen
+                await self._push(self.decoder.decode(data, starts, caplens, origlens, epochs))
+        finally:
+            sock.close()
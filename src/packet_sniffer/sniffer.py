@@ -1,26 +1,97 @@
 # sniffer.py
+import asyncio
 import subprocess
 import csv
+import time
 
+from src.packet_sniffer.fields import capture_fields, default_capture_filter, REPLAY_FILTERS
 
-def capture_packets(interface="wlo1", output_file="captured_packets.csv"):
-    fields = [
-        'frame.len', 'frame.time_delta', 'frame.time_delta_displayed', 'frame.time_epoch',
-        'frame.time_relative', 'radiotap.length', 'radiotap.timestamp.ts', 'wlan.duration',
-        'wlan.fc.frag', 'wlan.fc.order', 'wlan.fc.moredata', 'wlan.fc.protected',
-        'wlan.fc.pwrmgt', 'wlan.fc.type', 'wlan.fc.retry', 'wlan.fc.subtype',
-        'wlan_radio.duration', 'wlan.seq', 'wlan_radio.data_rate', 'wlan_radio.signal_dbm',
-        'wlan_radio.phy', 'wlan.sa', 'wlan.da', 'wlan.bssid',
-        'frame.interface_name',
-    ]
+# Every field the sniffer used to extract; see fields.capture_fields for the
+# projection actually requested by default
+FIELDS = [
+    'frame.len', 'frame.time_delta', 'frame.time_delta_displayed', 'frame.time_epoch',
+    'frame.time_relative', 'radiotap.length', 'radiotap.timestamp.ts', 'wlan.duration',
+    'wlan.fc.frag', 'wlan.fc.order', 'wlan.fc.moredata', 'wlan.fc.protected',
+    'wlan.fc.pwrmgt', 'wlan.fc.type', 'wlan.fc.retry', 'wlan.fc.subtype',
+    'wlan_radio.duration', 'wlan.seq', 'wlan_radio.data_rate', 'wlan_radio.signal_dbm',
+    'wlan_radio.phy', 'wlan.sa', 'wlan.da', 'wlan.bssid',
+    'frame.interface_name',
+]
 
-    cmd = [
-        "tshark", "-i", interface, "-I", "-Y", "wlan", "-T", "fields"
-    ]
+
+def build_command(interface="wlo1", fields=FIELDS, capture_filter=None, pcap_file=None):
+    if pcap_file:
+        # Offline replay: capture filters do not apply to files, use the
+        # equivalent display filter instead
+        display_filter = "wlan"
+        if capture_filter in REPLAY_FILTERS:
+            display_filter += f" && {REPLAY_FILTERS[capture_filter]}"
+        elif capture_filter:
+            print(f"No display filter equivalent for '{capture_filter}', replaying unfiltered.")
+        cmd = [
+            "tshark", "-r", pcap_file, "-Y", display_filter, "-T", "fields"
+        ]
+    else:
+        cmd = [
+            "tshark", "-i", interface, "-I", "-Y", "wlan", "-T", "fields"
+        ]
+
+        if capture_filter:
+            cmd += ["-f", capture_filter]
 
     for field in fields:
         cmd += ["-e", field]
 
+    return cmd
+
+
+class ReplayClock:
+    """
+    Paces a replayed capture: delay() returns how long to wait before
+    releasing a packet stamped `epoch` so that packets come out at their
+    original spacing divided by `speed`.
+    """
+
+    def __init__(self, speed=1.0):
+        self.speed = speed
+        self.origin = None
+
+    def delay(self, epoch):
+        now = time.monotonic()
+        if epoch != epoch:
+            # No timestamp (NaN): release immediately
+            return 0.0
+        if self.origin is None:
+            self.origin = (now, epoch)
+            return 0.0
+        return self.origin[0] + (epoch - self.origin[1]) / self.speed - now
+
+
+def _line_epoch(line, index):
+    try:
+        return float(line.split('\t' if isinstance(line, str) else b'\t')[index])
+    except (ValueError, IndexError):
+        return float('nan')
+
+
+def capture_packets(interface="wlo1", output_file="captured_packets.csv", fields=None, capture_filter=None,
+                    pcap_file=None, speed=None):
+    """
+    Capture with tshark into `output_file`; `capture_filter` defaults to
+    fields.default_capture_filter().
+
+    With `pcap_file` the packets are read from a pcap/pcapng file instead of
+    the interface, as fast as possible or, with `speed`, at their original
+    timing scaled by that factor.
+    """
+    # Only ask tshark for what the model and the mitigator consume
+    fields = fields or capture_fields()
+    if capture_filter is None:
+        capture_filter = default_capture_filter(interface, pcap_file)
+    cmd = build_command(interface, fields, capture_filter, pcap_file)
+    clock = ReplayClock(speed) if pcap_file and speed else None
+    epoch_index = fields.index('frame.time_epoch') if clock else None
+
     process = subprocess.Popen(
         cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
 
@@ -31,6 +102,10 @@ def capture_packets(interface="wlo1", output_file="captured_packets.csv"):
             writer.writeheader()
 
             for line in iter(process.stdout.readline, ''):
+                if clock:
+                    delay = clock.delay(_line_epoch(line, epoch_index))
+                    if delay > 0:
+                        time.sleep(delay)
                 values = line.strip().split('\t')
                 packet_data = dict(zip(fields, values))
                 writer.writerow(packet_data)
@@ -39,5 +114,134 @@ def capture_packets(interface="wlo1", output_file="captured_packets.csv"):
         print("Stopping packet capture.")
         process.terminate()
 
+
+class AsyncCapture:
+    """
+    Non-blocking tshark reader.
+
+    tshark output is read in chunks of up to `chunk_size` bytes and cut at the
+    last newline, so each queued item is a bytes block of complete
+    tab-separated lines (no per-line reads). Items go into a bounded
+    asyncio.Queue; when it is full the block is either dropped and counted
+    (`drop_when_full=True`) or the reader waits, leaving tshark to block on
+    its pipe.
+
+    With `pcap_file` the same stream is produced from a pcap/pcapng file,
+    as fast as tshark can read it, or paced to the original timing divided
+    by `speed`. Paced blocks are cut wherever the next packet is not due
+    yet, so batch boundaries follow the recorded traffic.
+    """
+
+    def __init__(self, interface="wlo1", fields=None, capture_filter=None, queue_size=64,
+                 chunk_size=1 << 16, drop_when_full=True, tshark="tshark", pcap_file=None, speed=None):
+        self.interface = interface
+        self.fields = fields or capture_fields()
+        if capture_filter is None:
+            capture_filter = default_capture_filter(interface, pcap_file)
+        self.capture_filter = capture_filter
+        self.pcap_file = pcap_file
+        self.clock = ReplayClock(speed) if pcap_file and speed else None
+        if self.clock and 'frame.time_epoch' not in self.fields:
+            raise ValueError("Paced replay needs 'frame.time_epoch' in the capture fields")
+        self._epoch_index = self.fields.index('frame.time_epoch') if self.clock else None
+        self.chunk_size = chunk_size
+        self.drop_when_full = drop_when_full
+        self.tshark = tshark
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.packets = 0
+        self.batches = 0
+        self.dropped_packets = 0
+        self.dropped_batches = 0
+        self.max_depth = 0
+        self._last_report = 0.0
+
+    def command(self):
+        cmd = build_command(self.interface, self.fields, self.capture_filter, self.pcap_file)
+        cmd[0] = self.tshark
+        return cmd
+
+    def stats(self):
+        return {
+            "packets": self.packets,
+            "batches": self.batches,
+            "dropped_packets": self.dropped_packets,
+            "dropped_batches": self.dropped_batches,
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_depth,
+        }
+
+    async def _push(self, block, count):
+        self.packets += count
+        if self.drop_when_full and self.queue.full():
+            self.dropped_packets += count
+            self.dropped_batches += 1
+            now = time.monotonic()
+            if now - self._last_report >= 1.0:
+                self._last_report = now
+                print(f"Capture queue full ({self.queue.qsize()} batches): "
+                      f"{self.dropped_packets} packets dropped so far")
+            return
+        await self.queue.put((block, count, time.monotonic()))
+        self.batches += 1
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    async def _push_paced(self, block):
+        lines = block.splitlines(keepends=True)
+        start = 0
+        for i, line in enumerate(lines):
+            delay = self.clock.delay(_line_epoch(line, self._epoch_index))
+            if delay > 0.001:
+                if i > start:
+                    await self._push(b''.join(lines[start:i]), i - start)
+                    start = i
+                await asyncio.sleep(delay)
+        if start < len(lines):
+            await self._push(b''.join(lines[start:]), len(lines) - start)
+
+    async def run(self, duration=None):
+        """Capture until tshark exits or `duration` seconds pass, then queue None."""
+        process = await asyncio.create_subprocess_exec(
+            *self.command(),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + duration if duration else None
+        pending = b''
+        try:
+            while True:
+                timeout = deadline - loop.time() if deadline else None
+                if timeout is not None and timeout <= 0:
+                    break
+                try:
+                    chunk = await asyncio.wait_for(process.stdout.read(self.chunk_size), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if not chunk:
+                    break
+
+                data = pending + chunk
+                cut = data.rfind(b'\n') + 1
+                if cut == 0:
+                    pending = data
+                    continue
+                block, pending = data[:cut], data[cut:]
+                if self.clock:
+                    await self._push_paced(block)
+                else:
+                    await self._push(block, block.count(b'\n'))
+
+            if pending:
+                await self._push(pending + b'\n', 1)
+        finally:
+            if process.returncode is None:
+                try:
+                    process.terminate()
+                except ProcessLookupError:
+                    pass
+                await process.wait()
+            await self.queue.put(None)
+
+
 if __name__ == "__main__":
-    capture_packets()
\ No newline at end of file
+    capture_packets()
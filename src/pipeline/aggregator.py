@@ -0,0 +1,216 @@
+# aggregator.py
+"""
+Per-source sliding-window statistics for the streaming pipeline.
+
+Flood-type attacks (Deauth, (Re)Assoc, Botnet...) are visible as rates
+rather than in any single frame, so every decoded batch also updates a
+set of ring-buffer windows kept per source address (wlan.sa).
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from src.utils.mac import NO_MAC
+
+# Frame groups counted per source: name -> (wlan.fc.type, wlan.fc.subtype),
+# subtype None for the whole type. Anything else counts as 'other'.
+FRAME_GROUPS = {
+    'assoc': [(0, 0), (0, 2)],
+    'auth': [(0, 11)],
+    'deauth': [(0, 12)],
+    'disassoc': [(0, 10)],
+    'probe': [(0, 4), (0, 5)],
+    'beacon': [(0, 8)],
+    'action': [(0, 13)],
+    'data': [(2, None)],
+}
+GROUP_NAMES = list(FRAME_GROUPS) + ['other']
+
+# Column names of the per-frame window features (see SourceWindows.update)
+WINDOW_COLUMNS = ['window.frames', 'window.rate'] + [f'window.{name}' for name in GROUP_NAMES] + [
+    'window.gap_mean', 'window.gap_std', 'window.signal_mean', 'window.signal_std']
+
+
+def _group_table():
+    # (type * 16 + subtype) -> group index, for types 0-3
+    table = np.full(64, len(GROUP_NAMES) - 1, dtype=np.int64)
+    for g, name in enumerate(FRAME_GROUPS):
+        for frame_type, subtype in FRAME_GROUPS[name]:
+            subtypes = range(16) if subtype is None else [subtype]
+            for s in subtypes:
+                table[16 * frame_type + s] = g
+    return table
+
+
+_GROUP_OF = _group_table()
+
+
+class SourceWindows:
+    """
+    Sliding windows of `n_buckets` x `bucket_s` seconds per source MAC.
+
+    Each source owns one slot of fixed-size ring buffers, one cell per time
+    bucket, holding frame counts per FRAME_GROUPS group and the sums needed
+    for the inter-arrival and signal mean/variance. A frame updates only the
+    cell of its own bucket (cells from a previous lap of the ring are reset
+    first), and reading a window sums `n_buckets` cells, so the cost per
+    packet does not depend on the history kept. At most `max_sources`
+    sources are tracked; the one seen least recently gives up its slot.
+
+    Time is capture time (frame.time_epoch), so replays behave like live
+    capture. Every frame of a batch gets the window of its source as it
+    stands after the whole batch, ending at the newest frame seen from that
+    source; timestamps need not be monotonic across sources, and frames
+    older than their source's window are not counted.
+    """
+
+    def __init__(self, window_s=10.0, n_buckets=10, max_sources=16384):
+        self.bucket_s = window_s / n_buckets
+        self.n_buckets = n_buckets
+        self.max_sources = max_sources
+        self.window_s = window_s
+        shape = (max_sources, n_buckets)
+        self._bucket = np.full(shape, -1, dtype=np.int64)
+        self._counts = np.zeros(shape + (len(GROUP_NAMES),), dtype=np.uint32)
+        # Inter-arrival gaps and signal: count, sum, sum of squares per cell
+        self._gaps = np.zeros(shape + (3,), dtype=np.float64)
+        self._signal = np.zeros(shape + (3,), dtype=np.float64)
+        self._last_seen = np.full(max_sources, np.nan)
+        self._slots = OrderedDict()
+        self._free = list(range(max_sources - 1, -1, -1))
+        self.evictions = 0
+        self.frames = 0
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _assign(self, sources) -> np.ndarray:
+        """Slot of each distinct source, allocating (and evicting) as needed; -1 when it cannot be tracked."""
+        slots = np.full(len(sources), -1, dtype=np.int64)
+        for i, source in enumerate(sources.tolist()):
+            slot = self._slots.get(source)
+            if slot is None:
+                if not self._free:
+                    if i >= self.max_sources:
+                        # Every slot already holds a source of this batch
+                        continue
+                    _, old = self._slots.popitem(last=False)
+                    self._reset(old)
+                    self._free.append(old)
+                    self.evictions += 1
+                slot = self._free.pop()
+                self._slots[source] = slot
+            else:
+                self._slots.move_to_end(source)
+            slots[i] = slot
+        return slots
+
+    def _reset(self, slot):
+        self._bucket[slot] = -1
+        self._counts[slot] = 0
+        self._gaps[slot] = 0
+        self._signal[slot] = 0
+        self._last_seen[slot] = np.nan
+
+    def update(self, sources, epochs, frame_types, subtypes, signal) -> dict:
+        """
+        Add a batch of frames and return their (frames, WINDOW_COLUMNS)
+        feature matrix. `sources` are uint64 MACs (NO_MAC frames are not
+        tracked and get NaN), the others float arrays as the decoder
+        produces them.
+        """
+        n = len(sources)
+        self.frames += n
+        out = np.full((n, len(WINDOW_COLUMNS)), np.nan)
+        epochs = np.asarray(epochs, dtype=np.float64)
+        tracked = (np.asarray(sources) != NO_MAC) & ~np.isnan(epochs)
+        if not tracked.any():
+            return out
+
+        rows = np.flatnonzero(tracked)
+        unique, inverse = np.unique(np.asarray(sources)[rows], return_inverse=True)
+        unique_slots = self._assign(unique)
+        slot = unique_slots[inverse.ravel()]
+        keep = slot >= 0
+        rows, slot = rows[keep], slot[keep]
+        t = epochs[rows]
+        bucket = np.floor(t / self.bucket_s).astype(np.int64)
+
+        # Each source's window ends at its own newest bucket, from this batch
+        # or before; frames older than that window are not counted
+        slots, index = np.unique(slot, return_inverse=True)
+        index = index.ravel()
+        anchor = self._bucket[slots].max(axis=1)
+        np.maximum.at(anchor, index, bucket)
+        counted = bucket > anchor[index] - self.n_buckets
+        out_rows, out_index = rows, index
+        rows, slot, t, bucket = rows[counted], slot[counted], t[counted], bucket[counted]
+
+        # Cells of this lap of the ring; stale ones are cleared before use
+        cell = bucket % self.n_buckets
+        stale = self._bucket[slot, cell] != bucket
+        if stale.any():
+            s, c = slot[stale], cell[stale]
+            self._counts[s, c] = 0
+            self._gaps[s, c] = 0
+            self._signal[s, c] = 0
+            self._bucket[s, c] = bucket[stale]
+
+        code = 16 * np.asarray(frame_types, dtype=np.float64)[rows] + np.asarray(subtypes, dtype=np.float64)[rows]
+        valid = (code >= 0) & (code < 64)
+        group = np.full(len(rows), len(GROUP_NAMES) - 1, dtype=np.int64)
+        group[valid] = _GROUP_OF[code[valid].astype(np.int64)]
+        np.add.at(self._counts, (slot, cell, group), 1)
+
+        # Gaps to the previous frame of the same source, this batch or before
+        order = np.lexsort((t, slot))
+        s_sorted, t_sorted = slot[order], t[order]
+        previous = np.empty_like(t_sorted)
+        previous[1:] = t_sorted[:-1]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = s_sorted[1:] != s_sorted[:-1]
+        previous[first] = self._last_seen[s_sorted[first]]
+        gap = t_sorted - previous
+        has_gap = ~np.isnan(gap)
+        g_slot, g_cell, g = s_sorted[has_gap], cell[order][has_gap], gap[has_gap]
+        np.add.at(self._gaps, (g_slot, g_cell, 0), 1)
+        np.add.at(self._gaps, (g_slot, g_cell, 1), g)
+        np.add.at(self._gaps, (g_slot, g_cell, 2), g * g)
+        last = np.ones(len(order), dtype=bool)
+        last[:-1] = s_sorted[1:] != s_sorted[:-1]
+        self._last_seen[s_sorted[last]] = np.fmax(self._last_seen[s_sorted[last]], t_sorted[last])
+
+        dbm = np.asarray(signal, dtype=np.float64)[rows]
+        has_signal = ~np.isnan(dbm)
+        s_slot, s_cell, v = slot[has_signal], cell[has_signal], dbm[has_signal]
+        np.add.at(self._signal, (s_slot, s_cell, 0), 1)
+        np.add.at(self._signal, (s_slot, s_cell, 1), v)
+        np.add.at(self._signal, (s_slot, s_cell, 2), v * v)
+
+        # Windows of the sources in this batch
+        live = self._bucket[slots] > anchor[:, None] - self.n_buckets
+        counts = (self._counts[slots] * live[..., None]).sum(axis=1, dtype=np.float64)
+        gaps = (self._gaps[slots] * live[..., None]).sum(axis=1)
+        signals = (self._signal[slots] * live[..., None]).sum(axis=1)
+        frames = counts.sum(axis=1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            gap_mean = gaps[:, 1] / gaps[:, 0]
+            gap_std = np.sqrt(np.maximum(gaps[:, 2] / gaps[:, 0] - gap_mean ** 2, 0))
+            signal_mean = signals[:, 1] / signals[:, 0]
+            signal_std = np.sqrt(np.maximum(signals[:, 2] / signals[:, 0] - signal_mean ** 2, 0))
+        # One row per source, in WINDOW_COLUMNS order
+        per_source = np.column_stack([frames, frames / self.window_s, counts,
+                                      gap_mean, gap_std, signal_mean, signal_std])
+        out[out_rows] = per_source[out_index]
+        return out
+
+    def stats(self):
+        return {
+            "sources": len(self._slots),
+            "max_sources": self.max_sources,
+            "evictions": self.evictions,
+            "frames": self.frames,
+            "memory_mb": (self._bucket.nbytes + self._counts.nbytes + self._gaps.nbytes
+                          + self._signal.nbytes + self._last_seen.nbytes) / 2**20,
+        }
@@ -0,0 +1,164 @@
+import asyncio
+import bisect
+import time
+from collections import deque
+
+import pandas as pd
+
+
+class MicroBatch:
+    """A group of packets travelling through the streaming pipeline."""
+
+    def __init__(self, block, size, captured_at):
+        self.block = block
+        self.size = size
+        self.captured_at = captured_at
+        # (captured_at, packets) of every capture block merged into this batch
+        self.arrivals = [(captured_at, size)]
+        self.raw = None
+        self.predictions = None
+        self.scored_at = None
+        self.backlogged = False
+
+
+class AdaptiveBatcher:
+    """
+    Regroups decoded packets into inference batches.
+
+    A batch is sent as soon as `batch_size` packets are waiting, or when
+    the oldest waiting packet is `deadline_ms` old; blocks already queued
+    are merged in first. Every `window` scored batches, observe() compares
+    the p99 packet-to-verdict latency of that window with `target_p99_ms`.
+    Above the target the batch size is halved, unless at least half the
+    batches left with packets still waiting in the batcher or its queues,
+    in which case the model is not keeping up and the batch size doubles
+    instead; below half the target it grows by an eighth. The size stays
+    within [min_batch, max_batch]. Latencies are also counted per packet
+    in a histogram with upper bounds BUCKETS_MS.
+    """
+
+    BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float('inf'))
+
+    def __init__(self, max_batch=4096, min_batch=16, deadline_ms=20.0, target_p99_ms=100.0, window=16):
+        self.max_batch = max_batch
+        self.min_batch = min_batch
+        self.batch_size = max(min_batch, min(256, max_batch))
+        self.deadline = deadline_ms / 1000
+        self.target = target_p99_ms / 1000
+        self.window = window
+        self.histogram = [0] * len(self.BUCKETS_MS)
+        self.batches = 0
+        self.full_flushes = 0
+        self.deadline_flushes = 0
+        self.p99_ms = None
+        self._samples = []
+        self._observed = 0
+        self._backlogged = 0
+        self._pending = deque()
+        self._pending_rows = 0
+
+    def _take(self, rows):
+        """Cut the first `rows` waiting packets into one MicroBatch."""
+        frames, arrivals = [], []
+        while rows and self._pending:
+            raw, captured_at = self._pending[0]
+            if len(raw) <= rows:
+                self._pending.popleft()
+                part = raw
+            else:
+                part, self._pending[0] = raw.iloc[:rows], (raw.iloc[rows:], captured_at)
+            frames.append(part)
+            arrivals.append((captured_at, len(part)))
+            rows -= len(part)
+        size = sum(count for _, count in arrivals)
+        self._pending_rows -= size
+
+        batch = MicroBatch(None, size, arrivals[0][0])
+        batch.arrivals = arrivals
+        batch.raw = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        self.batches += 1
+        return batch
+
+    def _add(self, batch: MicroBatch):
+        if len(batch.raw):
+            self._pending.append((batch.raw, batch.captured_at))
+            self._pending_rows += len(batch.raw)
+
+    async def _emit(self, in_queue: asyncio.Queue, out_queue: asyncio.Queue, rows):
+        batch = self._take(rows)
+        # Packets already waiting here, upstream or downstream: throughput,
+        # not batch filling, is what delays them
+        batch.backlogged = self._pending_rows > 0 or not in_queue.empty() or not out_queue.empty()
+        await out_queue.put(batch)
+
+    async def run(self, in_queue: asyncio.Queue, out_queue: asyncio.Queue):
+        """Pipeline stage: decoded MicroBatches in, regrouped MicroBatches out."""
+        done = False
+        while not done:
+            timeout = None
+            if self._pending:
+                timeout = max(0.0, self._pending[0][1] + self.deadline - time.monotonic())
+            try:
+                batch = await asyncio.wait_for(in_queue.get(), timeout)
+            except asyncio.TimeoutError:
+                batch = False
+            if batch is None:
+                done = True
+            elif batch:
+                self._add(batch)
+            # Coalesce whatever is already waiting before deciding
+            while not done and not in_queue.empty() and self._pending_rows < self.batch_size:
+                batch = in_queue.get_nowait()
+                if batch is None:
+                    done = True
+                else:
+                    self._add(batch)
+
+            while self._pending_rows >= self.batch_size:
+                self.full_flushes += 1
+                await self._emit(in_queue, out_queue, self.batch_size)
+            if self._pending and (done or time.monotonic() >= self._pending[0][1] + self.deadline):
+                self.deadline_flushes += not done
+                while self._pending_rows:
+                    await self._emit(in_queue, out_queue, self.batch_size)
+        await out_queue.put(None)
+
+    def observe(self, batch: MicroBatch):
+        """Record the packet-to-verdict latency of a scored batch and retune the batch size."""
+        for captured_at, count in batch.arrivals:
+            latency = batch.scored_at - captured_at
+            self.histogram[bisect.bisect_left(self.BUCKETS_MS, latency * 1000)] += count
+            self._samples.append((latency, count))
+        self._observed += 1
+        self._backlogged += batch.backlogged
+        if self._observed < self.window:
+            return
+
+        self._samples.sort()
+        rank = 0.99 * sum(count for _, count in self._samples)
+        seen = 0
+        for latency, count in self._samples:
+            seen += count
+            if seen >= rank:
+                break
+        self.p99_ms = latency * 1000
+        if latency > self.target and 2 * self._backlogged >= self._observed:
+            # Queues are building: bigger batches amortise per-batch costs
+            self.batch_size = min(self.max_batch, self.batch_size * 2)
+        elif latency > self.target:
+            self.batch_size = max(self.min_batch, self.batch_size // 2)
+        elif latency < self.target / 2:
+            self.batch_size = min(self.max_batch, self.batch_size + max(1, self.batch_size // 8))
+        self._samples.clear()
+        self._observed = 0
+        self._backlogged = 0
+
+    def stats(self):
+        return {
+            "batch_size": self.batch_size,
+            "batches": self.batches,
+            "full_flushes": self.full_flushes,
+            "deadline_flushes": self.deadline_flushes,
+            "p99_ms": self.p99_ms,
+            "latency_histogram_ms": {f"<={bound:g}": count for bound, count in zip(self.BUCKETS_MS, self.histogram)},
+        }
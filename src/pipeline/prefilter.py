@@ -0,0 +1,196 @@
+# prefilter.py
+"""
+Rule-based first stage of the detection cascade.
+
+Frames that are obviously benign going by header fields the capture
+already decodes are cleared here and never reach the random forest;
+everything else is escalated to it.
+
+    python -m src.pipeline.prefilter --evaluate capture.csv --known-bssid <bssid> --benign-type 2:8
+
+replays a labelled capture through both stages and prints how much
+traffic each one handled and the recall of every attack class with and
+without the prefilter. The capture needs a BSSID and a source address
+per frame (wlan.bssid and wlan.sa by default). The shipped samples.csv
+only has the receiver address, which is the BSSID of frames sent to an
+AP; it also stands in for the source there, so rates are per receiver:
+
+    python -m src.pipeline.prefilter --evaluate samples.csv --bssid-column wlan.ra --source-column wlan.ra \
+        --known-bssid 0c:9d:92:54:fe:34 --benign-type 2:8
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from src.packet_sniffer.fields import FRAME_TYPE_FIELDS
+from src.utils.mac import NO_MAC, parse_macs
+
+# Header fields the prefilter reads besides frame.time_epoch and wlan.sa
+PREFILTER_FIELDS = FRAME_TYPE_FIELDS + ['wlan.bssid']
+
+# Management frames are never cleared: every subtype is sent by some attack
+# in samples.csv (beacons of rogue APs and evil twins, deauthentication,
+# disassociation, (re)association, action frames) and their BSSID and source
+# are whatever the attacker claims, so a known BSSID proves nothing.
+MANAGEMENT_TYPE = 0
+
+# (type, subtype) cleared by default: none, the operator lists the frame
+# types an evaluation on their own capture showed to be safe
+BENIGN_TYPES = ()
+
+
+def _macs(values) -> np.ndarray:
+    values = np.asarray(values)
+    if values.dtype == np.uint64:
+        return values
+    # Text addresses (CSV input); missing ones become NO_MAC
+    return parse_macs([value if isinstance(value, str) else '' for value in values])
+
+
+class Prefilter:
+    """
+    Clears a frame when all of these hold:
+
+    - its (wlan.fc.type, wlan.fc.subtype) is one of `benign_types`,
+    - its wlan.bssid is one of `known_bssids`,
+    - its source (wlan.sa) sent at most `max_rate` frames per second in
+      the current `window` seconds of capture time.
+
+    Frames lacking any of those fields are escalated, so with no known
+    BSSIDs or no benign types nothing is cleared. Management types are
+    refused (ValueError). Works on decoder.decode_block style columns
+    (uint64 MACs) or on a DataFrame with text MACs.
+    """
+
+    def __init__(self, known_bssids=(), benign_types=BENIGN_TYPES, max_rate=50.0, window=1.0):
+        spoofable = [(t, s) for t, s in benign_types if t == MANAGEMENT_TYPE]
+        if spoofable:
+            raise ValueError(f"management frames can be spoofed and are always scored: {spoofable}")
+        self.known_bssids = np.unique(parse_macs(list(known_bssids)))
+        self.known_bssids = self.known_bssids[self.known_bssids != NO_MAC]
+        self.benign_codes = np.array([16 * t + s for t, s in benign_types], dtype=np.float64)
+        self.max_rate = max_rate
+        self.window = window
+        self.frames = 0
+        self.cleared = 0
+        self.rate_escalations = 0
+        self._window_id = None
+        self._counts = {}
+
+    def _source_rates(self, sources, epochs) -> np.ndarray:
+        """Frames per second of each frame's source over its `window`, counting earlier batches."""
+        window_ids = np.floor(epochs / self.window)
+        pairs = np.stack([window_ids, sources.astype(np.float64)], axis=1)
+        unique, inverse, counts = np.unique(pairs, axis=0, return_inverse=True, return_counts=True)
+        totals = counts.astype(np.float64)
+        last = window_ids.max() if len(window_ids) and not np.isnan(window_ids).all() else None
+        # Only the most recent window carries over to the next batch
+        counts_now = {}
+        for i, (window_id, source) in enumerate(unique.tolist()):
+            if window_id == self._window_id:
+                totals[i] += self._counts.get(source, 0)
+            if window_id == last:
+                counts_now[source] = totals[i]
+        self._window_id, self._counts = last, counts_now
+        return totals[inverse.ravel()] / self.window
+
+    def clear(self, columns) -> np.ndarray:
+        """Boolean mask of the frames in `columns` that need no scoring."""
+        n = len(columns['frame.time_epoch'])
+        self.frames += n
+        cleared = np.zeros(n, dtype=bool)
+        if not n or not len(self.known_bssids) or not len(self.benign_codes) \
+                or any(field not in columns for field in PREFILTER_FIELDS + ['wlan.sa']):
+            return cleared
+
+        code = 16 * np.asarray(columns['wlan.fc.type'], dtype=np.float64) \
+            + np.asarray(columns['wlan.fc.subtype'], dtype=np.float64)
+        sources = _macs(columns['wlan.sa'])
+        candidate = np.isin(code, self.benign_codes) \
+            & np.isin(_macs(columns['wlan.bssid']), self.known_bssids) \
+            & (sources != NO_MAC)
+
+        rates = self._source_rates(sources, np.asarray(columns['frame.time_epoch'], dtype=np.float64))
+        cleared = candidate & (rates <= self.max_rate)
+        self.rate_escalations += int((candidate & ~cleared).sum())
+        self.cleared += int(cleared.sum())
+        return cleared
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "cleared": self.cleared,
+            "escalated": self.frames - self.cleared,
+            "cleared_fraction": self.cleared / self.frames if self.frames else None,
+            "rate_escalations": self.rate_escalations,
+        }
+
+
+def evaluate(samples: pd.DataFrame, engine, prefilter: Prefilter, batch_size=512) -> pd.DataFrame:
+    """
+    Per-label recall of the forest alone and of the cascade on a labelled
+    capture (a 'Label' column, 'Normal' for benign frames), fed to the
+    prefilter `batch_size` frames at a time in capture order. `lost` counts
+    the frames the forest labelled correctly but the prefilter cleared.
+    ValueError if the capture has no BSSIDs or sources to clear by.
+    """
+    from src.ml_model.model import feature_cols, preprocess_matrix
+
+    for field in ('wlan.bssid', 'wlan.sa'):
+        if field not in samples or not (_macs(samples[field]) != NO_MAC).any():
+            raise ValueError(f"the capture has no {field} values: export it with {field}, or name the column "
+                             f"holding it (--bssid-column/--source-column, see the module docstring)")
+    samples = samples.sort_values('frame.time_epoch', kind='stable').reset_index(drop=True)
+    labels, _, _ = engine.predict(preprocess_matrix(samples, feature_cols))
+    cleared = np.concatenate([prefilter.clear(samples.iloc[start:start + batch_size])
+                              for start in range(0, len(samples), batch_size)])
+    cascade = np.where(cleared, 'Normal', labels)
+
+    truth = samples['Label'].to_numpy()
+    frame = pd.DataFrame({'label': truth, 'model': labels == truth, 'cascade': cascade == truth, 'cleared': cleared})
+    frame['lost'] = frame['model'] & ~frame['cascade']
+    report = frame.groupby('label').agg(frames=('model', 'size'), cleared=('cleared', 'sum'), lost=('lost', 'sum'),
+                                        recall_model=('model', 'mean'), recall_cascade=('cascade', 'mean'))
+    return report
+
+
+if __name__ == "__main__":
+    from src.ml_model.registry import get_registry
+
+    parser = argparse.ArgumentParser(description='Evaluate the prefilter cascade on a labelled capture')
+    parser.add_argument('--evaluate', required=True,
+                        help='Labelled capture CSV with wlan.bssid and wlan.sa columns')
+    parser.add_argument('--model', default='src/ml_model/rf_attacks.joblib',
+                        help='Model of the second stage (default: src/ml_model/rf_attacks.joblib)')
+    parser.add_argument('--known-bssid', action='append', default=[],
+                        help='BSSID of a trusted AP (repeatable)')
+    parser.add_argument('--benign-type', action='append', default=[],
+                        help='type:subtype cleared for trusted BSSIDs, not a management type (repeatable)')
+    parser.add_argument('--max-rate', type=float, default=50.0,
+                        help='Frames per second above which a source is always scored (default: 50)')
+    parser.add_argument('--bssid-column', default='wlan.bssid',
+                        help='Column holding the BSSID, for captures exported without wlan.bssid (default: wlan.bssid)')
+    parser.add_argument('--source-column', default='wlan.sa',
+                        help='Column holding the source address (default: wlan.sa)')
+    args = parser.parse_args()
+
+    benign_types = [tuple(int(part) for part in value.split(':')) for value in args.benign_type]
+    try:
+        prefilter = Prefilter(args.known_bssid, benign_types, max_rate=args.max_rate)
+        samples = pd.read_csv(args.evaluate)
+        for field, column in (('wlan.bssid', args.bssid_column), ('wlan.sa', args.source_column)):
+            if column in samples:
+                samples[field] = samples[column]
+        report = evaluate(samples, get_registry(args.model).engine, prefilter)
+    except ValueError as e:
+        parser.error(str(e))
+
+    print(report.to_string(float_format=lambda value: f"{value:.3f}"))
+    stats = prefilter.stats()
+    print(f"prefilter cleared {stats['cleared']} of {stats['frames']} frames "
+          f"({stats['cleared_fraction']:.1%}), the forest scored {stats['escalated']}")
+    attacks = report.drop(index='Normal', errors='ignore')
+    print(f"attack frames detected by the forest but cleared: {int(attacks['lost'].sum())}")
+    for label, row in attacks[attacks['lost'] > 0].iterrows():
+        print(f"  {label}: {int(row['lost'])} lost, recall {row['recall_model']:.3f} -> {row['recall_cascade']:.3f}")
@@ -0,0 +1,129 @@
+# shedding.py
+"""
+Overload control between capture and inference.
+
+When frames arrive faster than they can be scored, the capture queue
+fills up and whole blocks are dropped without looking at them. The
+LoadShedder sits in the feature stage and thins the traffic first, in a
+way that keeps every source visible and never loses the management frames
+flood attacks are made of.
+"""
+import time
+
+import numpy as np
+
+# (type, subtype) always passed: (re)association requests and responses,
+# disassociation, authentication, deauthentication
+PRIORITY_TYPES = ((0, 0), (0, 1), (0, 2), (0, 3), (0, 10), (0, 11), (0, 12))
+
+
+class LoadShedder:
+    """
+    Deterministic per-source sampling under overload.
+
+    Each decoded batch is checked against two thresholds: at least
+    `max_depth` blocks waiting around the feature stage, or a latency of
+    `max_latency_ms`, taking the larger of the batch's age when decoded and
+    the capture-to-verdict latency of the last scored batch (observe()).
+    While either is exceeded the
+    sampling factor doubles, at most once per `interval` seconds and up to
+    `max_factor`; once the queue is down to a quarter of `max_depth` and
+    the age to half of `max_latency_ms`, it halves again. With a factor k,
+    each source keeps its 1st, (k+1)th, (2k+1)th... frame since shedding
+    began, so a flooding source is cut down to 1/k while one that sent
+    fewer than k frames loses nothing. Sources are counted
+    in 2**`bits` hashed counters, so a flood of random source addresses
+    cannot grow the state. PRIORITY_TYPES frames always pass. Every
+    decision is counted in stats().
+    """
+
+    def __init__(self, max_depth=32, max_latency_ms=500.0, max_factor=64, interval=0.25,
+                 priority_types=PRIORITY_TYPES, bits=16):
+        self.max_depth = max_depth
+        self.max_latency = max_latency_ms / 1000
+        self.max_factor = max_factor
+        self.interval = interval
+        self.priority_codes = np.array([16 * t + s for t, s in priority_types], dtype=np.float64)
+        self.factor = 1
+        self.frames = 0
+        self.shed = 0
+        self.priority_passed = 0
+        self.overloaded_batches = 0
+        self.escalations = 0
+        self.recoveries = 0
+        self.shed_by_factor = {}
+        self._changed_at = None
+        self._latency = 0.0
+        self._shift = np.uint64(64 - bits)
+        self._seen = np.zeros(2 ** bits, dtype=np.int64)
+
+    def _adjust(self, depth, age, now):
+        overloaded = depth >= self.max_depth or age >= self.max_latency
+        self.overloaded_batches += overloaded
+        if self._changed_at is not None and now - self._changed_at < self.interval:
+            return
+        if overloaded and self.factor < self.max_factor:
+            self.factor = min(self.max_factor, self.factor * 2)
+            self.escalations += 1
+            self._changed_at = now
+        elif not overloaded and self.factor > 1 and depth <= self.max_depth // 4 and age <= self.max_latency / 2:
+            self.factor //= 2
+            self.recoveries += 1
+            self._changed_at = now
+            if self.factor == 1:
+                # Sampling restarts from each source's next frame
+                self._seen[:] = 0
+
+    def observe(self, batch):
+        """Record the latency of a scored MicroBatch (its oldest packet)."""
+        self._latency = batch.scored_at - min(captured_at for captured_at, _ in batch.arrivals)
+
+    def keep(self, columns, depth, captured_at, now=None) -> np.ndarray:
+        """
+        Boolean mask of the frames of a decoded batch to score. `depth` is
+        the number of blocks queued before and after the feature stage and
+        `captured_at` the batch's capture time (time.monotonic()).
+        """
+        now = time.monotonic() if now is None else now
+        n = len(columns['wlan.sa'])
+        self.frames += n
+        self._adjust(depth, max(now - captured_at, self._latency), now)
+        if self.factor == 1 or not n:
+            return np.ones(n, dtype=bool)
+
+        # Ordinal of each frame among its source's frames since shedding
+        # began (Fibonacci hashing of the MAC picks the counter)
+        with np.errstate(over='ignore'):
+            counter = (np.asarray(columns['wlan.sa'], dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)) >> self._shift
+        order = np.argsort(counter, kind='stable')
+        unique, starts, counts = np.unique(counter[order], return_index=True, return_counts=True)
+        base = self._seen[unique]
+        self._seen[unique] += counts
+        ordinal = np.empty(n, dtype=np.int64)
+        ordinal[order] = np.arange(n) - np.repeat(starts, counts) + np.repeat(base, counts)
+
+        keep = ordinal % self.factor == 0
+        if 'wlan.fc.type' in columns and 'wlan.fc.subtype' in columns:
+            code = 16 * np.asarray(columns['wlan.fc.type'], dtype=np.float64) \
+                + np.asarray(columns['wlan.fc.subtype'], dtype=np.float64)
+            priority = np.isin(code, self.priority_codes)
+            self.priority_passed += int((priority & ~keep).sum())
+            keep |= priority
+
+        shed = n - int(keep.sum())
+        self.shed += shed
+        self.shed_by_factor[self.factor] = self.shed_by_factor.get(self.factor, 0) + shed
+        return keep
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "shed": self.shed,
+            "shed_fraction": self.shed / self.frames if self.frames else None,
+            "priority_passed": self.priority_passed,
+            "factor": self.factor,
+            "overloaded_batches": self.overloaded_batches,
+            "escalations": self.escalations,
+            "recoveries": self.recoveries,
+            "shed_by_factor": dict(sorted(self.shed_by_factor.items())),
+        }
@@ -0,0 +1,339 @@
+import asyncio
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+import src.packet_sniffer.sniffer as sniffer
+import src.packet_sniffer.decoder as decoder
+import src.packet_sniffer.radiotap as radiotap
+from src.packet_sniffer.fields import capture_fields, FRAME_TYPE_FIELDS
+import src.ml_model.model as model
+from src.ml_model.registry import get_registry
+from src.ml_model.workers import InferencePool
+from src.ml_model.cache import PredictionCache
+from src.pipeline.batcher import AdaptiveBatcher, MicroBatch
+from src.pipeline.prefilter import Prefilter, PREFILTER_FIELDS
+from src.pipeline.aggregator import SourceWindows, WINDOW_COLUMNS
+from src.pipeline.shedding import LoadShedder
+import src.mitigator.mitigator as mitigator
+from src.mitigator.executor import MitigationExecutor
+import src.utils.database as database
+from src.utils.utils import retrieve_ip
+from src.utils.mac import format_macs, int_to_mac
+
+
+class CsvSink:
+    """
+    Appends every scored batch to a CSV file (optional pipeline output),
+    with integer MACs written as text.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._header_written = False
+
+    def write(self, predictions: pd.DataFrame):
+        if predictions['wlan.sa'].dtype == np.uint64:
+            predictions = predictions.assign(**{'wlan.sa': format_macs(predictions['wlan.sa'])})
+        predictions.to_csv(self.path, mode='w' if not self._header_written else 'a',
+                           header=not self._header_written, index=False)
+        self._header_written = True
+
+
+def summarize_threats(predictions: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per (predicted type, source MAC) among the non-Normal
+    predictions, in order of first appearance: the group's first packet
+    plus 'count', 'max_confidence', 'mean_confidence', 'first_seen' and
+    'last_seen' (frame.time_epoch).
+    """
+    threats = predictions[predictions['predictions'] != 'Normal']
+    keys = ['predictions', 'wlan.sa']
+    aggregations = {column: (column, 'first') for column in threats.columns if column not in keys}
+    aggregations.update(
+        count=('confidence', 'size'),
+        max_confidence=('confidence', 'max'),
+        mean_confidence=('confidence', 'mean'),
+    )
+    if 'frame.time_epoch' in threats:
+        aggregations.update(first_seen=('frame.time_epoch', 'min'), last_seen=('frame.time_epoch', 'max'))
+    return threats.groupby(keys, sort=False, dropna=False).agg(**aggregations).reset_index()
+
+
+async def record_threat(threat_type, packet_details, actions):
+    """Persist a mitigated threat and its log line."""
+    print(f"Actions taken for {threat_type} ({packet_details['count']} packets): {actions}")
+
+    # Insert the threat and its details into the database
+    database.insert_threat(
+        threat_type=threat_type,
+        packet=packet_details,
+        confidence=packet_details['max_confidence'],
+        actions=actions
+    )
+    message = (f"{threat_type} detected from {packet_details['ip']} "
+               f"({packet_details['count']} packets) — countermeasures deployed.")
+    database.insert_log(message)
+
+
+async def handle_predictions(predictions: pd.DataFrame, mitigator_instance, executor=None):
+    """
+    Run mitigation and persistence once per threat group of a batch (see
+    summarize_threats) rather than once per packet. With a
+    MitigationExecutor (whose on_done is record_threat) the groups are only
+    queued on it; otherwise they are handled one after the other.
+    """
+    normal = int((predictions['predictions'] == 'Normal').sum())
+    if normal:
+        print(f"No threat detected in {normal} packets.")
+
+    for packet_details in summarize_threats(predictions).to_dict('records'):
+        threat_type = packet_details['predictions']
+        packet_details['ip'] = retrieve_ip(packet_details['wlan.sa'])
+        if isinstance(packet_details['wlan.sa'], (int, np.integer)):
+            # Commands, the database and the logs take the text form
+            packet_details['wlan.sa'] = int_to_mac(packet_details['wlan.sa'])
+
+        if executor is not None:
+            await executor.submit(threat_type, packet_details)
+            continue
+        # Handle the threat based on the prediction
+        actions = await mitigator_instance.handle_threat(threat_type, packet_details)
+        await record_threat(threat_type, packet_details, actions)
+
+
+def columns_to_frame(columns: dict, numeric=model.feature_cols) -> pd.DataFrame:
+    """
+    Decoded capture columns -> the `numeric` columns (model features first)
+    plus wlan.sa, kept as uint64 (see src.utils.mac) until it is written out.
+    """
+    raw = pd.DataFrame(columns['features'], columns=numeric, copy=False)
+    raw['wlan.sa'] = columns['wlan.sa']
+    return raw
+
+
+async def feature_stage(in_queue: asyncio.Queue, out_queue: asyncio.Queue, fields, prefilter=None, windows=None,
+                        shedder=None):
+    """
+    Decode each captured block; the native backend queues already decoded
+    columns. Every frame updates the per-source `windows`, whose features
+    are added as 'window.*' columns, then frames a `prefilter` clears are
+    dropped, unscored, and a `shedder` samples the rest when the pipeline
+    falls behind.
+    """
+    header = prefilter is not None or windows is not None or shedder is not None
+    numeric = model.feature_cols + (FRAME_TYPE_FIELDS if header else [])
+    while (item := await in_queue.get()) is not None:
+        batch = MicroBatch(*item)
+        columns = batch.block if isinstance(batch.block, dict) else decoder.decode_block(batch.block, fields, numeric)
+        batch.raw = columns_to_frame(columns, numeric)
+        if windows is not None and 'wlan.sa' in columns:
+            features = windows.update(columns['wlan.sa'], columns['frame.time_epoch'], columns['wlan.fc.type'],
+                                      columns['wlan.fc.subtype'], columns['wlan_radio.signal_dbm'])
+            batch.raw = pd.concat([batch.raw, pd.DataFrame(features, columns=WINDOW_COLUMNS, copy=False)], axis=1)
+        keep = None
+        if prefilter is not None:
+            keep = ~prefilter.clear(columns)
+        if shedder is not None:
+            rows = slice(None) if keep is None else keep
+            sampled = shedder.keep({field: columns[field][rows] for field in ['wlan.sa', *FRAME_TYPE_FIELDS]},
+                                   in_queue.qsize() + out_queue.qsize(), batch.captured_at)
+            if keep is None:
+                keep = sampled
+            else:
+                keep[keep] = sampled
+        if keep is not None and not keep.all():
+            batch.raw = batch.raw[keep].reset_index(drop=True)
+        batch.block = None
+        await out_queue.put(batch)
+    await out_queue.put(None)
+
+
+async def inference_stage(in_queue: asyncio.Queue, out_queue: asyncio.Queue, registry, sink=None, cache=None):
+    """
+    Score each batch with the registry's current model (hot reloads land
+    between batches), through `cache` when one is given. Scoring and cache
+    lookups run in a worker thread, so capture keeps reading meanwhile.
+    """
+    loop = asyncio.get_running_loop()
+
+    def score(raw):
+        engine = registry.engine if cache is None else cache.bind(registry.engine)
+        return model.predict_batch(engine, raw)
+
+    while (batch := await in_queue.get()) is not None:
+        batch.predictions = await loop.run_in_executor(None, score, batch.raw)
+        batch.scored_at = time.monotonic()
+        if sink is not None:
+            sink.write(batch.predictions)
+        await out_queue.put(batch)
+    await out_queue.put(None)
+
+
+async def pooled_inference_stage(in_queue: asyncio.Queue, out_queue: asyncio.Queue, pool, sink=None):
+    """
+    Score batches on an InferencePool, keeping as many in flight as it has
+    slots; batches are passed on in capture order. A batch larger than the
+    pool collects the results of its own first chunks to free their slots.
+    """
+    loop = asyncio.get_running_loop()
+    pending = deque()
+
+    async def collect(parts, tickets):
+        parts.append(await loop.run_in_executor(None, pool.result, tickets.popleft()))
+
+    async def finish_oldest():
+        batch, X, parts, tickets = pending.popleft()
+        while tickets:
+            await collect(parts, tickets)
+        proba = np.concatenate(parts) if parts else np.zeros((0, len(pool.classes)))
+        best = proba.argmax(axis=1)
+        batch.predictions = model.predictions_frame(X, pool.classes.take(best), proba[np.arange(len(proba)), best],
+                                                    batch.raw)
+        batch.scored_at = time.monotonic()
+        if sink is not None:
+            sink.write(batch.predictions)
+        await out_queue.put(batch)
+
+    while (batch := await in_queue.get()) is not None:
+        X = model.preprocess_matrix(batch.raw, model.feature_cols)
+        parts, tickets = [], deque()
+        for start in range(0, len(X), pool.slot_rows):
+            # Only submit into a free slot; otherwise wait for the oldest
+            # batch, or for this one's oldest chunk when it holds every slot
+            while not pool.free_slots():
+                if pending:
+                    await finish_oldest()
+                else:
+                    await collect(parts, tickets)
+            tickets.append(pool.submit(X[start:start + pool.slot_rows]))
+        pending.append((batch, X, parts, tickets))
+        while pending and all(pool.ready(ticket) for ticket in pending[0][3]):
+            await finish_oldest()
+    while pending:
+        await finish_oldest()
+    await out_queue.put(None)
+
+
+async def mitigation_stage(in_queue: asyncio.Queue, mitigator_instance, batcher=None, shedder=None, executor=None):
+    """Dispatch the threats found in each batch as soon as it is scored."""
+    while (batch := await in_queue.get()) is not None:
+        if batcher is not None:
+            batcher.observe(batch)
+        if shedder is not None:
+            shedder.observe(batch)
+        await handle_predictions(batch.predictions, mitigator_instance, executor)
+        latency_ms = (time.monotonic() - batch.captured_at) * 1000
+        print(f"Batch of {batch.size} packets handled in {latency_ms:.1f} ms")
+
+
+async def run_stream(interface="wlo1", model_path='src/ml_model/rf_attacks.joblib', queue_size=64,
+                     duration=None, output_csv=None, tshark="tshark", extras=(), pcap_file=None, speed=None,
+                     backend="tshark", workers=None, max_batch=4096, deadline_ms=20.0, target_p99_ms=100.0,
+                     cache_size=0, cache_verify=0.0, known_bssids=(), prefilter_types=(), prefilter_max_rate=50.0,
+                     window_s=None, shed_latency_ms=500.0, suppress_ttl=mitigator.SUPPRESS_TTL, mitigation_workers=4,
+                     action_timeout=mitigator.ACTION_TIMEOUT):
+    """
+    Continuous capture -> features -> inference -> mitigation pipeline.
+
+    Stages run concurrently and are joined by bounded queues of `queue_size`
+    micro-batches, so a slow stage throttles the ones before it instead of
+    buffering without limit; if capture outruns the rest, whole blocks are
+    dropped and counted by the capture source. Predictions are also appended
+    to `output_csv` when one is given. tshark is only asked for the fields
+    the model and the mitigator use, plus `extras`.
+
+    With `pcap_file` the packets come from a capture file instead (see
+    sniffer.AsyncCapture for `speed`); an unpaced replay never drops, so
+    runs over the same file are repeatable. backend="native" replaces tshark
+    with the built-in radiotap decoder (radiotap.NativeCapture). The model
+    is reloaded in the background whenever `model_path` changes, unless
+    `workers` > 1 spreads inference over that many worker processes (see
+    InferencePool), which keep the model they were started with.
+
+    max_batch, deadline_ms, target_p99_ms: AdaptiveBatcher size cap, flush
+        deadline and p99 latency target.
+    cache_size, cache_verify: PredictionCache entries and re-scored
+        fraction of hits (not with `workers`).
+    known_bssids, prefilter_types, prefilter_max_rate: Prefilter rules;
+        cleared frames are neither scored nor written.
+    window_s: length in seconds of the per-source SourceWindows features.
+    shed_latency_ms: LoadShedder latency bound when capture may drop; 0
+        disables it.
+    suppress_ttl: seconds before a mitigated threat is mitigated again.
+    mitigation_workers, action_timeout: MitigationExecutor tasks (0 runs
+        them inline) and command timeout in seconds.
+    """
+    registry = get_registry(model_path)
+    # Fork the workers before any other thread is started
+    pool = InferencePool(registry.engine, n_workers=workers) if workers and workers > 1 else None
+    if pool is None:
+        registry.watch()
+    cache = None
+    if cache_size and pool is None:
+        cache = PredictionCache(registry.engine, max_entries=cache_size, verify_rate=cache_verify)
+    mitigator_instance = mitigator.Mitigator(suppress_ttl=suppress_ttl, action_timeout=action_timeout)
+    executor = None
+    if mitigation_workers:
+        executor = MitigationExecutor(mitigator_instance, workers=mitigation_workers, timeout=2 * action_timeout,
+                                      max_pending=64 * mitigation_workers, on_done=record_threat)
+    sink = CsvSink(output_csv) if output_csv else None
+
+    prefilter = None
+    if known_bssids and prefilter_types:
+        prefilter = Prefilter(known_bssids, prefilter_types, max_rate=prefilter_max_rate)
+    windows = SourceWindows(window_s=window_s) if window_s else None
+    drop_when_full = not (pcap_file and not speed)
+    shedder = None
+    if drop_when_full and shed_latency_ms:
+        shedder = LoadShedder(max_depth=max(1, queue_size // 2), max_latency_ms=shed_latency_ms)
+    if prefilter is not None:
+        extras = [*extras, *PREFILTER_FIELDS]
+    if windows is not None or shedder is not None:
+        extras = [*extras, *FRAME_TYPE_FIELDS]
+    fields = capture_fields(registry.engine.rf_model, extras)
+    if backend == "native":
+        header = prefilter is not None or windows is not None or shedder is not None
+        numeric = model.feature_cols + (FRAME_TYPE_FIELDS if header else [])
+        capture = radiotap.NativeCapture(interface=interface, numeric=numeric, queue_size=queue_size,
+                                         pcap_file=pcap_file, speed=speed, drop_when_full=drop_when_full)
+    else:
+        capture = sniffer.AsyncCapture(interface=interface, fields=fields, queue_size=queue_size, tshark=tshark,
+                                       pcap_file=pcap_file, speed=speed, drop_when_full=drop_when_full)
+    batcher = AdaptiveBatcher(max_batch=max_batch, deadline_ms=deadline_ms, target_p99_ms=target_p99_ms)
+    feature_queue = asyncio.Queue(maxsize=queue_size)
+    batch_queue = asyncio.Queue(maxsize=queue_size)
+    scored_queue = asyncio.Queue(maxsize=queue_size)
+
+    await asyncio.gather(
+        capture.run(duration=duration),
+        feature_stage(capture.queue, feature_queue, fields, prefilter, windows, shedder),
+        batcher.run(feature_queue, batch_queue),
+        pooled_inference_stage(batch_queue, scored_queue, pool, sink) if pool
+        else inference_stage(batch_queue, scored_queue, registry, sink, cache),
+        mitigation_stage(scored_queue, mitigator_instance, batcher, shedder, executor),
+    )
+    if executor is not None:
+        await executor.close()
+    registry.close()
+    if pool is not None:
+        pool.close()
+    print(f"Capture statistics: {capture.stats()}")
+    print(f"Model statistics: {registry.stats()}")
+    print(f"Batching statistics: {batcher.stats()}")
+    if cache is not None:
+        print(f"Prediction cache statistics: {cache.stats()}")
+    if prefilter is not None:
+        print(f"Prefilter statistics: {prefilter.stats()}")
+    if windows is not None:
+        print(f"Source window statistics: {windows.stats()}")
+    if shedder is not None:
+        print(f"Load shedding statistics: {shedder.stats()}")
+    if executor is not None:
+        print(f"Mitigation statistics: {executor.stats()}")
+    print(f"Firewall statistics: {mitigator_instance.action_handler.firewall.stats()}")
+    print(f"Traffic control statistics: {mitigator_instance.action_handler.traffic.stats()}")
+    if mitigator_instance.suppressor is not None:
+        print(f"Threat suppression statistics: {mitigator_instance.suppressor.stats()}")
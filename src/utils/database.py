@@ -21,6 +21,11 @@ def insert_threat(threat_type, packet, confidence, actions):
         if not isinstance(actions, list):
             actions = []
 
+        # Grouped threats (stream.summarize_threats) also carry how many
+        # packets they cover and when they were seen
+        summary = {key: packet[key] for key in ('count', 'mean_confidence', 'first_seen', 'last_seen')
+                   if key in packet}
+
         # Insert into the threats collection
         threats_collection.insert_one({
             "type": threat_type,
@@ -29,6 +34,7 @@ def insert_threat(threat_type, packet, confidence, actions):
             "confidence": confidence,
             "timestamp": datetime.now(),
             "actions": actions,
+            **summary,
         })
         print(f"Threat of type '{threat_type}' inserted successfully.")
         return True
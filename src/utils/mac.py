@@ -0,0 +1,66 @@
+import numpy as np
+
+# Byte offsets of the hex digits and separators in 'aa:bb:cc:dd:ee:ff'
+_HEX_POS = np.array([0, 1, 3, 4, 6, 7, 9, 10, 12, 13, 15, 16])
+_SEP_POS = np.array([2, 5, 8, 11, 14])
+_SHIFTS = np.arange(44, -1, -4, dtype=np.uint64)
+
+# ASCII -> nibble value, 255 for anything that is not a hex digit
+_NIBBLE = np.full(256, 255, dtype=np.uint8)
+for _i, _c in enumerate(b'0123456789abcdef'):
+    _NIBBLE[_c] = _i
+for _i, _c in enumerate(b'ABCDEF'):
+    _NIBBLE[_c] = 10 + _i
+
+# Value used for a missing or malformed address
+NO_MAC = 0
+
+
+def parse_macs(values) -> np.ndarray:
+    """
+    Vectorised 'aa:bb:cc:dd:ee:ff' -> uint64 conversion.
+
+    `values` is any sequence of bytes/str addresses; empty, malformed,
+    longer (e.g. multi-valued 'aa:..,bb:..' fields) or non-ASCII entries
+    become NO_MAC.
+    """
+    raw = np.asarray(values).ravel()
+    if raw.dtype.kind == 'O':
+        raw = np.array([value.decode('latin-1') if isinstance(value, bytes) else str(value) for value in raw],
+                       dtype=str)
+    elif raw.dtype.kind not in 'SU':
+        raw = raw.astype(str)
+    kind = raw.dtype.kind
+    # str arrays hold one UCS-4 code point per character, bytes one byte
+    width = 4 if kind == 'U' else 1
+    too_long = np.char.str_len(raw) > 17 if raw.dtype.itemsize > 17 * width else np.zeros(len(raw), dtype=bool)
+    raw = np.ascontiguousarray(raw, dtype=f'{kind}17')
+    chars = raw.view(np.uint32 if kind == 'U' else np.uint8).reshape(-1, 17)
+    # Code points past 255 are not hex digits; clipping keeps them invalid
+    octets = np.minimum(chars, 255) if kind == 'U' else chars
+    nibbles = _NIBBLE[octets[:, _HEX_POS]]
+    valid = (nibbles != 255).all(axis=1) & (octets[:, _SEP_POS] == ord(':')).all(axis=1) & ~too_long
+    macs = (nibbles.astype(np.uint64) << _SHIFTS).sum(axis=1, dtype=np.uint64)
+    macs[~valid] = NO_MAC
+    return macs
+
+
+def mac_to_int(mac) -> int:
+    """Single address version of parse_macs."""
+    return int(parse_macs([str(mac)])[0])
+
+
+def int_to_mac(value) -> str:
+    """uint64 -> 'aa:bb:cc:dd:ee:ff'; NO_MAC formats as None."""
+    value = int(value)
+    if value == NO_MAC:
+        return None
+    text = f"{value:012x}"
+    return ':'.join(text[i:i + 2] for i in range(0, 12, 2))
+
+
+def format_macs(values) -> np.ndarray:
+    """Vectorised inverse of parse_macs, returning an object array of strings."""
+    values = np.asarray(values, dtype=np.uint64)
+    unique, inverse = np.unique(values, return_inverse=True)
+    return np.array([int_to_mac(v) for v in unique], dtype=object)[inverse]
@@ -1,30 +1,85 @@
 import subprocess
+import time
+
+from src.utils.mac import NO_MAC, mac_to_int
+
+# Seconds an ARP table snapshot is used before it is read again
+ARP_TTL = 5.0
+
+
+def _arp_mac(text) -> int:
+    # 'arp -a' may drop leading zeros ('0:1c:b3:9:85:15')
+    parts = text.split(':')
+    if len(parts) != 6:
+        return NO_MAC
+    try:
+        return int(''.join(part.zfill(2) for part in parts), 16)
+    except ValueError:
+        return NO_MAC
+
+
+class ArpTable:
+    """
+    MAC -> IP map of the kernel's ARP table.
+
+    The table is read from /proc/net/arp (or `arp -a` elsewhere) at most
+    once every `ttl` seconds and looked up by integer MAC (see
+    src.utils.mac), so resolving the source of every threat costs a dict
+    lookup instead of a subprocess and a scan of its output.
+    """
+
+    def __init__(self, ttl=ARP_TTL):
+        self.ttl = ttl
+        self._table = {}
+        self._loaded_at = None
+
+    def _read(self):
+        table = {}
+        try:
+            with open('/proc/net/arp') as f:
+                for line in f.read().splitlines()[1:]:
+                    parts = line.split()
+                    if len(parts) >= 4:
+                        table[mac_to_int(parts[3])] = parts[0]
+        except OSError:
+            result = subprocess.run(['arp', '-a'], capture_output=True, text=True, check=True)
+            for line in result.stdout.splitlines():
+                parts = line.split()
+                ip = next((part.strip('()') for part in parts if part.startswith('(') and part.endswith(')')), None)
+                mac = next((_arp_mac(part) for part in parts if part.count(':') == 5), NO_MAC)
+                if ip:
+                    table[mac] = ip
+        # Incomplete entries have no address
+        table.pop(NO_MAC, None)
+        return table
+
+    def lookup(self, mac):
+        """IP of `mac` (integer or 'aa:bb:cc:dd:ee:ff'), or None."""
+        if isinstance(mac, str):
+            mac = mac_to_int(mac.lower())
+        now = time.monotonic()
+        if self._loaded_at is None or now - self._loaded_at > self.ttl:
+            self._table = self._read()
+            self._loaded_at = now
+        return self._table.get(int(mac))
+
+
+_arp_table = ArpTable()
+
 
 def retrieve_ip(mac_address):
     """
     Retrieve the IP address associated with a given MAC address.
 
     Args:
-        mac_address (str): The MAC address to look up.
+        mac_address (str or int): The MAC address to look up, as text or
+            as an integer from src.utils.mac.
 
     Returns:
         str: The associated IP address, or None if not found.
     """
     try:
-        # Run the ARP command to get the ARP table
-        result = subprocess.run(['arp', '-a'], capture_output=True, text=True, check=True)
-        arp_table = result.stdout
-
-        # Search for the MAC address in the ARP table
-        for line in arp_table.splitlines():
-            if mac_address.lower() in line.lower():
-                # Extract the IP address from the line
-                parts = line.split()
-                for part in parts:
-                    if part.startswith('(') and part.endswith(')'):
-                        return part.strip('()')
-        return None
+        return _arp_table.lookup(mac_address)
     except Exception as e:
         print(f"Error retrieving IP address: {e}")
         return None
-    
\ No newline at end of file
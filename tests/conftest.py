@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+
+class FakeBinaries:
+    """
+    Directory of fake commands put first on PATH. Each records its
+    arguments, and its stdin with `stdin=True`, in one shared log.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.log = directory / "commands.log"
+        self.log.touch()
+
+    def install(self, name, body="exit 0", stdin=False):
+        path = self.directory / name
+        record_stdin = "sed 's/^/  /' >> \"$LOG\"\n" if stdin else ""
+        path.write_text(f'#!/bin/sh\nLOG="{self.log}"\necho "{name} $*" >> "$LOG"\n{record_stdin}{body}\n')
+        path.chmod(0o755)
+
+    def lines(self):
+        """Log lines recorded since the last call."""
+        lines = self.log.read_text().splitlines()
+        self.log.write_text("")
+        return lines
+
+
+@pytest.fixture
+def fake_bin(tmp_path, monkeypatch):
+    directory = tmp_path / "bin"
+    directory.mkdir()
+    # Only the fakes and the basic tools: no real tc, iptables or tshark
+    monkeypatch.setenv("PATH", os.pathsep.join([str(directory), "/usr/bin", "/bin"]))
+    return FakeBinaries(directory)
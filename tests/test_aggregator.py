@@ -0,0 +1,43 @@
+import numpy as np
+
+from src.pipeline.aggregator import WINDOW_COLUMNS, SourceWindows
+
+FRAMES = WINDOW_COLUMNS.index('window.frames')
+A, B = np.uint64(0x020000000001), np.uint64(0x020000000002)
+
+
+def update(windows, sources, epochs):
+    n = len(sources)
+    return windows.update(np.array(sources, dtype=np.uint64), np.array(epochs, dtype=np.float64),
+                          np.full(n, 2.0), np.zeros(n), np.full(n, -40.0))
+
+
+def test_each_source_window_ends_at_its_own_newest_frame():
+    windows = SourceWindows(window_s=10.0)
+    # B's frames are older than the batch's newest frame by more than a window
+    features = update(windows, [A, B, B], [1000.0, 5.0, 6.0])
+    assert features[:, FRAMES].tolist() == [1, 2, 2]
+
+
+def test_window_counts_frames_of_earlier_batches():
+    windows = SourceWindows(window_s=10.0)
+    update(windows, [A, B], [100.0, 100.5])
+    features = update(windows, [A], [105.0])
+    assert features[0, FRAMES] == 2
+    features = update(windows, [A], [120.0])
+    assert features[0, FRAMES] == 1
+
+
+def test_frames_older_than_their_source_window_are_not_counted():
+    windows = SourceWindows(window_s=10.0)
+    update(windows, [A, A], [100.0, 101.0])
+    features = update(windows, [A], [50.0])
+    assert features[0, FRAMES] == 2
+
+
+def test_frames_without_source_are_not_tracked():
+    windows = SourceWindows(window_s=10.0)
+    features = update(windows, [A, 0], [100.0, 100.0])
+    assert features[0, FRAMES] == 1
+    assert np.isnan(features[1]).all()
+    assert len(windows) == 1
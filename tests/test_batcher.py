@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import pandas as pd
+
+from src.pipeline.batcher import AdaptiveBatcher, MicroBatch
+
+
+def block(rows):
+    batch = MicroBatch(None, rows, time.monotonic())
+    batch.raw = pd.DataFrame({'frame.len': range(rows)})
+    return batch
+
+
+async def flood(batcher, blocks, rows, interval, cost):
+    """Feed `blocks` of `rows` packets every `interval` s to a consumer spending `cost` s per batch."""
+    in_queue, out_queue = asyncio.Queue(maxsize=64), asyncio.Queue(maxsize=2)
+
+    async def capture():
+        for _ in range(blocks):
+            await in_queue.put(block(rows))
+            await asyncio.sleep(interval)
+        await in_queue.put(None)
+
+    async def score():
+        sizes = []
+        while (batch := await out_queue.get()) is not None:
+            await asyncio.sleep(cost)
+            batch.scored_at = time.monotonic()
+            batcher.observe(batch)
+            sizes.append(batch.size)
+        return sizes
+
+    _, _, sizes = await asyncio.gather(capture(), batcher.run(in_queue, out_queue), score())
+    return sizes
+
+
+def test_batches_grow_when_the_consumer_falls_behind():
+    batcher = AdaptiveBatcher(max_batch=4096, deadline_ms=5.0, target_p99_ms=50.0, window=4)
+    # Each block fills two 256-packet batches, scored 30 ms apiece: the
+    # second waits behind the first and misses the target, one batch of
+    # 512 would not
+    sizes = asyncio.run(asyncio.wait_for(flood(batcher, 20, 512, 0.07, 0.03), 30.0))
+    assert sum(sizes) == 20 * 512
+    assert min(sizes) == 256
+    assert batcher.batch_size >= 512 and sizes[-1] >= 512
+
+
+def test_batches_shrink_when_latency_is_not_from_a_backlog():
+    batcher = AdaptiveBatcher(max_batch=4096, deadline_ms=80.0, target_p99_ms=50.0, window=4)
+    # A trickle: packets wait for the deadline to fill a batch, nothing queues up
+    asyncio.run(asyncio.wait_for(flood(batcher, 40, 10, 0.01, 0.0), 30.0))
+    assert batcher.batch_size < 256
+
+
+def test_fast_consumer_keeps_latency_under_target():
+    batcher = AdaptiveBatcher(max_batch=4096, deadline_ms=5.0, target_p99_ms=200.0, window=4)
+    asyncio.run(asyncio.wait_for(flood(batcher, 50, 100, 0.002, 0.0), 30.0))
+    assert batcher.p99_ms < 200.0
@@ -0,0 +1,79 @@
+import asyncio
+
+from src.mitigator.executor import MitigationExecutor
+
+
+class RecordingMitigator:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.handled = []
+
+    async def handle_threat(self, threat_type, packet):
+        await asyncio.sleep(self.delay)
+        self.handled.append((threat_type, packet.get("n")))
+        return ["BLOCK"]
+
+
+def run(coroutine, timeout=5.0):
+    return asyncio.run(asyncio.wait_for(coroutine, timeout))
+
+
+def test_threat_without_mac_or_ip_does_not_stop_workers():
+    mitigator = RecordingMitigator()
+    executor = MitigationExecutor(mitigator, workers=2)
+
+    async def go():
+        await executor.submit("Deauth", {"wlan.sa": float("nan"), "ip": None, "n": 0})
+        await executor.submit("Deauth", {"wlan.sa": None, "ip": None, "n": 1})
+        await executor.submit("Deauth", {"wlan.sa": "aa:bb:cc:dd:ee:01", "n": 2})
+        await executor.close()
+
+    run(go())
+    stats = executor.stats()
+    assert stats["completed"] == 3
+    assert stats["pending"] == 0
+    # Threats with no target are handled in submission order among themselves
+    assert [n for _, n in mitigator.handled if n in (0, 1)] == [0, 1]
+
+
+def test_same_target_in_order_different_targets_concurrent():
+    mitigator = RecordingMitigator(delay=0.05)
+    done = []
+
+    async def on_done(threat_type, packet, actions):
+        done.append((packet["wlan.sa"], packet["n"]))
+
+    executor = MitigationExecutor(mitigator, workers=4, on_done=on_done)
+
+    async def go():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for n in range(12):
+            await executor.submit("Rogue_AP", {"wlan.sa": f"aa:bb:cc:dd:ee:0{n % 4}", "n": n})
+        await executor.close()
+        return loop.time() - start
+
+    elapsed = run(go())
+    for target in range(4):
+        mac = f"aa:bb:cc:dd:ee:0{target}"
+        assert [n for sa, n in done if sa == mac] == [target, target + 4, target + 8]
+    # 3 rounds of 4 targets in parallel rather than 12 mitigations in a row
+    assert elapsed < 12 * 0.05
+
+
+def test_timeout_reports_no_actions():
+    mitigator = RecordingMitigator(delay=1.0)
+    done = []
+
+    async def on_done(threat_type, packet, actions):
+        done.append(actions)
+
+    executor = MitigationExecutor(mitigator, workers=1, timeout=0.05, on_done=on_done)
+
+    async def go():
+        await executor.submit("Deauth", {"wlan.sa": "aa:bb:cc:dd:ee:01"})
+        await executor.close()
+
+    run(go())
+    assert done == [[]]
+    assert executor.stats()["timeouts"] == 1
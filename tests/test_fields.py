@@ -0,0 +1,31 @@
+import src.packet_sniffer.fields as fields
+from src.packet_sniffer.fields import CAPTURE_FILTER, REPLAY_FILTERS, live_capture_filter
+from src.packet_sniffer.sniffer import AsyncCapture
+
+FIELDS = ['frame.time_epoch', 'frame.len']
+
+
+def monitor_only(interface):
+    # Stands in for /sys/class/net/<if>/type: only mon0 is a radiotap link
+    return CAPTURE_FILTER if interface == 'mon0' else None
+
+
+def test_no_filter_off_radiotap_links():
+    # lo is ARPHRD_LOOPBACK
+    assert live_capture_filter('lo') is None
+    assert live_capture_filter('no-such-interface') is None
+
+
+def test_live_tshark_capture_filters_only_radiotap_links(monkeypatch):
+    monkeypatch.setattr(fields, 'live_capture_filter', monitor_only)
+    assert '-f' not in AsyncCapture(interface='wlo1', fields=FIELDS).command()
+    command = AsyncCapture(interface='mon0', fields=FIELDS).command()
+    assert command[command.index('-f') + 1] == CAPTURE_FILTER
+
+
+def test_replay_and_explicit_filters(monkeypatch):
+    monkeypatch.setattr(fields, 'live_capture_filter', monitor_only)
+    command = AsyncCapture(fields=FIELDS, pcap_file='capture.pcap').command()
+    assert command[command.index('-Y') + 1] == f"wlan && {REPLAY_FILTERS[CAPTURE_FILTER]}"
+    command = AsyncCapture(interface='wlo1', fields=FIELDS, capture_filter='type mgt').command()
+    assert command[command.index('-f') + 1] == 'type mgt'
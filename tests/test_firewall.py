@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+from src.mitigator.firewall import Firewall
+
+
+@pytest.fixture
+def netfilter(fake_bin):
+    """
+    Fake iptables, iptables-restore and ipset. The jump to the chain exists
+    once `iptables -I` ran; ipset fails while a 'fail' file exists.
+    """
+    directory = fake_bin.directory
+    fake_bin.install("iptables", f"""
+[ "$1" = -I ] && touch {directory}/jump
+[ "$1" = -C ] && [ ! -f {directory}/jump ] && exit 1
+exit 0""")
+    fake_bin.install("iptables-restore", stdin=True)
+    fake_bin.install("ipset", f"[ -f {directory}/fail ] && exit 1\nexit 0", stdin=True)
+    return fake_bin
+
+
+def run(coroutine):
+    return asyncio.run(asyncio.wait_for(coroutine, 10.0))
+
+
+async def block_all(firewall, *addresses):
+    return await asyncio.gather(*(firewall.block(**address) for address in addresses))
+
+
+def test_first_commit_sets_up_sets_chain_and_jump(netfilter):
+    firewall = Firewall(batch_delay=0)
+    assert run(block_all(firewall, {"ip": "10.0.0.2"}, {"mac": "AA:BB:CC:DD:EE:01"}, {"ip": "10.0.0.1"})) == [True] * 3
+    assert netfilter.lines() == [
+        "ipset restore",
+        "  create wids-block-ip hash:ip family inet -exist",
+        "  flush wids-block-ip",
+        "  add wids-block-ip 10.0.0.1 -exist",
+        "  add wids-block-ip 10.0.0.2 -exist",
+        "  create wids-block-mac hash:mac -exist",
+        "  flush wids-block-mac",
+        "  add wids-block-mac aa:bb:cc:dd:ee:01 -exist",
+        "iptables-restore --noflush",
+        "  *filter",
+        "  :WIDS-BLOCK - [0:0]",
+        "  -A WIDS-BLOCK -m set --match-set wids-block-ip src -j DROP",
+        "  -A WIDS-BLOCK -m set --match-set wids-block-mac src -j DROP",
+        "  COMMIT",
+        "iptables -C INPUT -j WIDS-BLOCK",
+        "iptables -I INPUT -j WIDS-BLOCK",
+    ]
+    assert firewall.stats()["backend"] == "ipset"
+    assert firewall.stats()["commits"] == 1
+
+
+def test_later_commits_send_only_the_changes(netfilter):
+    firewall = Firewall(batch_delay=0)
+    run(block_all(firewall, {"ip": "10.0.0.1"}, {"mac": "aa:bb:cc:dd:ee:01"}))
+    netfilter.lines()
+
+    assert run(firewall.block(ip="10.0.0.1"))
+    assert netfilter.lines() == []
+    assert firewall.stats()["duplicates"] == 1
+
+    async def change():
+        return await asyncio.gather(firewall.block(ip="10.0.0.3"), firewall.unblock(mac="aa:bb:cc:dd:ee:01"))
+
+    assert run(change()) == [True, True]
+    assert netfilter.lines() == ["ipset restore", "  add wids-block-ip 10.0.0.3 -exist",
+                                 "  del wids-block-mac aa:bb:cc:dd:ee:01 -exist"]
+    assert firewall.is_blocked(ip="10.0.0.3") and not firewall.is_blocked(mac="aa:bb:cc:dd:ee:01")
+
+
+def test_failed_commit_rebuilds_from_the_wanted_state(netfilter):
+    firewall = Firewall(batch_delay=0)
+    run(firewall.block(ip="10.0.0.1"))
+    netfilter.lines()
+
+    (netfilter.directory / "fail").touch()
+    assert not run(firewall.block(ip="10.0.0.2"))
+    assert firewall.stats()["failed_commits"] == 1
+    netfilter.lines()
+
+    (netfilter.directory / "fail").unlink()
+    assert run(firewall.block(ip="10.0.0.3"))
+    assert netfilter.lines() == [
+        "ipset restore",
+        "  create wids-block-ip hash:ip family inet -exist",
+        "  flush wids-block-ip",
+        "  add wids-block-ip 10.0.0.1 -exist",
+        "  add wids-block-ip 10.0.0.2 -exist",
+        "  add wids-block-ip 10.0.0.3 -exist",
+        "  create wids-block-mac hash:mac -exist",
+        "  flush wids-block-mac",
+        "iptables-restore --noflush",
+        "  *filter",
+        "  :WIDS-BLOCK - [0:0]",
+        "  -A WIDS-BLOCK -m set --match-set wids-block-ip src -j DROP",
+        "  -A WIDS-BLOCK -m set --match-set wids-block-mac src -j DROP",
+        "  COMMIT",
+        # The jump is already there
+        "iptables -C INPUT -j WIDS-BLOCK",
+    ]
+
+
+def test_one_rule_per_address_without_ipset(netfilter):
+    (netfilter.directory / "ipset").unlink()
+    firewall = Firewall(batch_delay=0)
+    run(block_all(firewall, {"ip": "10.0.0.1"}, {"mac": "aa:bb:cc:dd:ee:01"}))
+    assert netfilter.lines() == [
+        "iptables-restore --noflush",
+        "  *filter",
+        "  :WIDS-BLOCK - [0:0]",
+        "  -A WIDS-BLOCK -s 10.0.0.1 -j DROP",
+        "  -A WIDS-BLOCK -m mac --mac-source aa:bb:cc:dd:ee:01 -j DROP",
+        "  COMMIT",
+        "iptables -C INPUT -j WIDS-BLOCK",
+        "iptables -I INPUT -j WIDS-BLOCK",
+    ]
+
+    async def change():
+        return await asyncio.gather(firewall.block(ip="10.0.0.2"), firewall.unblock(ip="10.0.0.1"))
+
+    assert run(change()) == [True, True]
+    assert netfilter.lines() == ["iptables-restore --noflush", "  *filter", "  -A WIDS-BLOCK -s 10.0.0.2 -j DROP",
+                                 "  -D WIDS-BLOCK -s 10.0.0.1 -j DROP", "  COMMIT"]
+    assert firewall.stats()["backend"] == "iptables"
+
+
+def test_malformed_addresses_are_refused(netfilter):
+    firewall = Firewall(batch_delay=0)
+    assert not run(firewall.block(ip="10.0.0.256"))
+    assert not run(firewall.block(mac="aa:bb:cc:dd:ee"))
+    assert not run(firewall.block(ip="10.0.0.1; reboot"))
+    assert netfilter.lines() == []
+    assert firewall.stats()["invalid"] == 3
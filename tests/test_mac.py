@@ -0,0 +1,31 @@
+import numpy as np
+
+from src.utils.mac import NO_MAC, format_macs, mac_to_int, parse_macs
+
+MAC = 0xaabbccddeeff
+
+
+def test_parses_str_and_bytes():
+    assert parse_macs(['aa:bb:cc:dd:ee:ff', 'AA:BB:CC:DD:EE:FF']).tolist() == [MAC, MAC]
+    assert parse_macs(np.array([b'aa:bb:cc:dd:ee:ff'], dtype='S32')).tolist() == [MAC]
+    assert format_macs(parse_macs(['aa:bb:cc:dd:ee:ff'])).tolist() == ['aa:bb:cc:dd:ee:ff']
+
+
+def test_longer_cells_are_not_truncated():
+    multi = 'aa:bb:cc:dd:ee:ff,11:22:33:44:55:66'
+    assert parse_macs([multi, 'aa:bb:cc:dd:ee:ff0']).tolist() == [NO_MAC, NO_MAC]
+    assert parse_macs([multi.encode()]).tolist() == [NO_MAC]
+
+
+def test_non_ascii_and_missing_are_no_mac():
+    assert parse_macs(['äa:bb:cc:dd:ee:ff', 'aa:bb:cc:dd:ee:f०', '']).tolist() == [NO_MAC] * 3
+    assert parse_macs(['é'.encode()]).tolist() == [NO_MAC]
+    values = np.array(['aa:bb:cc:dd:ee:ff', None, b'aa:bb:cc:dd:ee:ff'], dtype=object)
+    assert parse_macs(values).tolist() == [MAC, NO_MAC, MAC]
+
+
+def test_mac_to_int_validates_like_parse_macs():
+    assert mac_to_int('aa:bb:cc:dd:ee:ff') == mac_to_int('AA:BB:CC:DD:EE:FF') == MAC
+    for text in ('aa_bb_cc_dd_ee_ff', 'aabbccddeeff:::::', 'aa:bb:cc:dd:ee:f ', ' a:bb:cc:dd:ee:ff',
+                 'aa:bb:cc:dd:ee:ff0', 'äa:bb:cc:dd:ee:ff', '', None):
+        assert mac_to_int(text) == NO_MAC
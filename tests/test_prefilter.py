@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.pipeline.prefilter import Prefilter, evaluate
+
+AP = "02:00:00:00:00:01"
+CLIENT = "02:00:00:00:00:02"
+
+
+class LabelEngine:
+    """Engine stub predicting each frame's true label."""
+
+    def __init__(self, labels):
+        self.labels = np.asarray(labels)
+
+    def predict(self, X):
+        return self.labels, None, None
+
+
+def frames(types, bssid=AP, source=CLIENT, start=0.0, step=0.1):
+    n = len(types)
+    return pd.DataFrame({
+        'frame.time_epoch': start + step * np.arange(n),
+        'wlan.fc.type': [t for t, _ in types],
+        'wlan.fc.subtype': [s for _, s in types],
+        'wlan.bssid': [bssid] * n,
+        'wlan.sa': [source] * n,
+    })
+
+
+def test_management_types_are_refused():
+    with pytest.raises(ValueError):
+        Prefilter([AP], [(0, 8)])
+    with pytest.raises(ValueError):
+        Prefilter([AP], [(2, 8), (0, 12)])
+
+
+def test_nothing_cleared_by_default():
+    assert not Prefilter([AP]).clear(frames([(2, 8)] * 4)).any()
+
+
+def test_clears_listed_types_of_known_bssids_only():
+    prefilter = Prefilter([AP], [(2, 8)])
+    assert prefilter.clear(frames([(2, 8), (2, 0), (0, 8)])).tolist() == [True, False, False]
+    assert not prefilter.clear(frames([(2, 8)], bssid="02:00:00:00:00:09")).any()
+    assert not prefilter.clear(frames([(2, 8)], source=None)).any()
+
+
+def test_fast_sources_are_escalated():
+    prefilter = Prefilter([AP], [(2, 8)], max_rate=5.0)
+    assert not prefilter.clear(frames([(2, 8)] * 10, step=0.01)).any()
+    assert prefilter.stats()['rate_escalations'] == 10
+
+
+def test_evaluate_needs_bssids_and_sources():
+    samples = frames([(2, 8)] * 2).drop(columns=['wlan.bssid'])
+    samples['Label'] = 'Normal'
+    with pytest.raises(ValueError, match='wlan.bssid'):
+        evaluate(samples, LabelEngine(samples['Label']), Prefilter([AP], [(2, 8)]))
+
+
+def test_evaluate_reports_lost_attack_frames_per_class():
+    samples = frames([(2, 8)] * 4)
+    samples['Label'] = ['Normal', 'Botnet', 'Botnet', 'Malware']
+    report = evaluate(samples, LabelEngine(samples['Label']), Prefilter([AP], [(2, 8)]))
+    assert report.loc['Botnet', 'lost'] == 2
+    assert report.loc['Botnet', 'recall_model'] == 1.0
+    assert report.loc['Botnet', 'recall_cascade'] == 0.0
+    assert report.loc['Normal', 'recall_cascade'] == 1.0
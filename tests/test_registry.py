@@ -0,0 +1,60 @@
+import threading
+
+import numpy as np
+from joblib import dump
+from sklearn.ensemble import RandomForestClassifier
+
+from src.ml_model.registry import ModelRegistry
+
+
+def save_forest(path, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.random((100, 4))
+    dump(RandomForestClassifier(n_estimators=3, random_state=seed).fit(X, rng.choice(['a', 'b'], 100)), path)
+
+
+def test_reload_closes_the_previous_engine_after_its_batches(tmp_path):
+    path = tmp_path / "forest.joblib"
+    save_forest(path)
+    # Chunks of 64 rows spread over threads, so the engine has a pool
+    registry = ModelRegistry(str(path), chunk_size=64, n_threads=2)
+    old = registry.engine
+    assert old._pool is not None
+
+    # A batch still running on the old engine when the new one is swapped in
+    started, release = threading.Event(), threading.Event()
+    proba_chunk = old._proba_chunk
+
+    def slow_chunk(X):
+        started.set()
+        release.wait(10)
+        return proba_chunk(X)
+
+    old._proba_chunk = slow_chunk
+    in_flight = threading.Thread(target=old.predict, args=(np.zeros((300, 4)),))
+    in_flight.start()
+    assert started.wait(10)
+
+    save_forest(path, seed=1)
+    assert registry.reload()
+    assert registry.engine is not old
+    assert old._pool is not None
+
+    release.set()
+    in_flight.join(10)
+    assert old._pool is None
+    assert registry.engine._pool is not None
+    registry.engine.close()
+
+
+def test_retired_engine_without_batches_closes_at_once(tmp_path):
+    path = tmp_path / "forest.joblib"
+    save_forest(path)
+    registry = ModelRegistry(str(path), chunk_size=64, n_threads=2)
+    old = registry.engine
+    assert registry.reload()
+    assert old._pool is None
+    # A batch that read the old engine before the swap still gets scored
+    labels, _, _ = old.predict(np.zeros((300, 4)))
+    assert len(labels) == 300 and old._pool is None
+    registry.engine.close()
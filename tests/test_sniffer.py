@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from src.packet_sniffer.sniffer import AsyncCapture
+
+FIELDS = ['frame.time_epoch', 'frame.len']
+PACKETS = 50
+
+
+@pytest.fixture
+def tshark(fake_bin):
+    """Fake tshark printing PACKETS tab-separated lines, the last one unterminated."""
+    fake_bin.install("tshark", f"""
+i=1
+while [ $i -lt {PACKETS} ]; do printf '%s\\t100\\n' "$i"; i=$((i + 1)); done
+printf '%s\\t100' "$i"
+exit 0""")
+    return "tshark"
+
+
+async def capture_all(capture, consume_after=None):
+    """Run `capture`, draining its queue only once `consume_after` packets were read (at once if None)."""
+    async def consume():
+        if consume_after is not None:
+            while capture.packets < consume_after:
+                await asyncio.sleep(0.01)
+        items = []
+        while (item := await capture.queue.get()) is not None:
+            items.append(item)
+        return items
+
+    consumer = asyncio.create_task(consume())
+    await capture.run()
+    return await consumer
+
+
+def run(coroutine):
+    return asyncio.run(asyncio.wait_for(coroutine, 10.0))
+
+
+def lines(items):
+    return [line for block, _, _ in items for line in block.splitlines()]
+
+
+def test_every_line_is_queued_once(tshark):
+    capture = AsyncCapture(fields=FIELDS, tshark=tshark, chunk_size=64)
+    items = run(capture_all(capture))
+    assert lines(items) == [f"{i}\t100".encode() for i in range(1, PACKETS + 1)]
+    assert all(block.endswith(b"\n") and count == block.count(b"\n") for block, count, _ in items)
+    assert capture.stats()["packets"] == PACKETS
+    assert capture.stats()["batches"] == len(items) > 1
+    assert capture.stats()["dropped_packets"] == 0
+
+
+def test_full_queue_drops_whole_blocks_and_counts_them(tshark):
+    capture = AsyncCapture(fields=FIELDS, tshark=tshark, chunk_size=64, queue_size=1, drop_when_full=True)
+    items = run(capture_all(capture, consume_after=PACKETS))
+    stats = capture.stats()
+    # Only the first block fits; every later one is dropped
+    assert stats["batches"] == len(items) == 1
+    assert stats["dropped_batches"] >= 1
+    assert stats["packets"] == PACKETS
+    assert sum(count for _, count, _ in items) + stats["dropped_packets"] == PACKETS
+    assert stats["max_queue_depth"] == 1
+
+
+def test_full_queue_waits_without_dropping(tshark):
+    capture = AsyncCapture(fields=FIELDS, tshark=tshark, chunk_size=64, queue_size=1, drop_when_full=False)
+    items = run(capture_all(capture))
+    assert len(lines(items)) == PACKETS
+    assert capture.stats()["dropped_packets"] == capture.stats()["dropped_batches"] == 0
@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+import src.ml_model.model as model
+from src.ml_model.inference import InferenceEngine
+from src.ml_model.workers import InferencePool
+from src.pipeline.batcher import MicroBatch
+
+# The pipeline module pulls in the mitigator and its MongoDB logging
+stream = pytest.importorskip("src.pipeline.stream", exc_type=ImportError)
+
+
+@pytest.fixture
+def engine():
+    rng = np.random.default_rng(0)
+    X = rng.random((200, len(model.feature_cols)))
+    forest = RandomForestClassifier(n_estimators=3, random_state=0).fit(X, rng.choice(['Normal', 'Deauth'], 200))
+    return InferenceEngine(forest)
+
+
+def batch_of(n, rng):
+    batch = MicroBatch(None, n, time.monotonic())
+    batch.raw = pd.DataFrame(rng.random((n, len(model.feature_cols))), columns=model.feature_cols)
+    return batch
+
+
+def test_pooled_inference_of_batches_larger_than_the_pool(engine):
+    rng = np.random.default_rng(1)
+    # 100 rows take 7 chunks of 16 rows, with only 2 slots
+    pool = InferencePool(engine, n_workers=2, slot_rows=16, n_slots=2)
+    batches = [batch_of(n, rng) for n in (100, 5, 40)]
+
+    async def score():
+        in_queue, out_queue = asyncio.Queue(), asyncio.Queue()
+        for batch in batches + [None]:
+            in_queue.put_nowait(batch)
+        await asyncio.wait_for(stream.pooled_inference_stage(in_queue, out_queue, pool), 30.0)
+        return [out_queue.get_nowait() for _ in range(out_queue.qsize())]
+
+    try:
+        scored = asyncio.run(score())
+    finally:
+        pool.close()
+    assert scored[:-1] == batches and scored[-1] is None
+    for batch in batches:
+        X = model.preprocess_matrix(batch.raw, model.feature_cols)
+        labels, _, _ = engine.predict(X)
+        assert len(batch.predictions) == batch.size
+        assert (batch.predictions['predictions'].to_numpy() == labels).all()
+
+
+def test_scoring_does_not_block_the_event_loop(engine, monkeypatch):
+    def slow_predict_batch(rf_model, raw):
+        time.sleep(0.3)
+        return raw
+
+    monkeypatch.setattr(model, 'predict_batch', slow_predict_batch)
+    registry = type('Registry', (), {'engine': engine})()
+
+    async def score():
+        in_queue, out_queue = asyncio.Queue(), asyncio.Queue()
+        in_queue.put_nowait(batch_of(10, np.random.default_rng(2)))
+        in_queue.put_nowait(None)
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        await stream.inference_stage(in_queue, out_queue, registry)
+        ticker.cancel()
+        return ticks
+
+    # The loop keeps running (capture keeps reading) while the batch is scored
+    assert asyncio.run(score()) >= 10
@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from src.mitigator.traffic import TrafficControl
+
+DEFAULT_ROOT = "qdisc noqueue 0: root refcnt 2"
+SETUP = [
+    "  qdisc add dev wlo1 root handle 1d5: htb",
+    "  filter add dev wlo1 parent 1d5: prio 1 handle 2: protocol ip u32 divisor 256",
+    "  filter add dev wlo1 parent 1d5: prio 1 protocol ip u32 ht 800:: "
+    "match ip src 0.0.0.0/0 hashkey mask 0x000000ff at 12 link 2:",
+]
+
+
+def class_add(minor, rate):
+    return f"  class add dev wlo1 parent 1d5: classid 1d5:{minor} htb rate {rate} ceil {rate}"
+
+
+def filter_add(handle, ip, minor):
+    return f"  filter add dev wlo1 parent 1d5: prio 1 handle {handle} protocol ip u32 " \
+           f"ht {handle.rsplit(':', 1)[0]}: match ip src {ip}/32 flowid 1d5:{minor}"
+
+
+@pytest.fixture
+def tc(fake_bin):
+    """Fake tc: `qdisc show` prints the 'root' file, -batch fails while a 'fail' file exists."""
+    directory = fake_bin.directory
+    fake_bin.install("tc", f"""
+if [ "$1" = -batch ]; then sed 's/^/  /' >> "$LOG"; [ -f {directory}/fail ] && exit 2; fi
+[ "$1 $2" = "qdisc show" ] && cat {directory}/root
+exit 0""")
+    (directory / "root").write_text(DEFAULT_ROOT + "\n")
+    return fake_bin
+
+
+def run(coroutine):
+    return asyncio.run(asyncio.wait_for(coroutine, 10.0))
+
+
+async def limit_all(traffic, *requests):
+    return await asyncio.gather(*(traffic.limit(ip, rate=rate) for ip, rate in requests))
+
+
+def test_first_commit_sets_up_the_root_and_batches_the_limits(tc):
+    traffic = TrafficControl(batch_delay=0)
+    assert run(limit_all(traffic, ("10.0.0.5", "1mbit"), ("10.0.1.5", "2mbit"), ("10.0.0.7", "1mbit"))) == [True] * 3
+    assert tc.lines() == ["tc qdisc show dev wlo1 root", "tc -batch -", *SETUP,
+                          class_add(10, "1mbit"), filter_add("2:5:1", "10.0.0.5", 10),
+                          class_add(11, "1mbit"), filter_add("2:7:1", "10.0.0.7", 11),
+                          class_add(12, "2mbit"), filter_add("2:5:2", "10.0.1.5", 12)]
+    assert traffic.stats()["commits"] == 1
+
+
+def test_later_commits_send_only_the_changes(tc):
+    traffic = TrafficControl(batch_delay=0)
+    run(limit_all(traffic, ("10.0.0.5", "1mbit"), ("10.0.0.7", "1mbit")))
+    tc.lines()
+
+    assert run(traffic.limit("10.0.0.5", rate="1mbit"))
+    assert tc.lines() == []
+    assert traffic.stats()["duplicates"] == 1
+
+    assert run(traffic.limit("10.0.0.5", rate="4mbit"))
+    assert tc.lines() == ["tc -batch -",
+                          "  class change dev wlo1 parent 1d5: classid 1d5:10 htb rate 4mbit ceil 4mbit"]
+
+    assert run(traffic.unlimit("10.0.0.7"))
+    assert tc.lines() == ["tc -batch -", "  filter del dev wlo1 parent 1d5: prio 1 handle 2:7:1 protocol ip u32",
+                          "  class del dev wlo1 classid 1d5:11"]
+
+    # The freed class minor is handed out again
+    assert run(traffic.limit("10.0.2.5", rate="1mbit"))
+    assert tc.lines() == ["tc -batch -", class_add(11, "1mbit"), filter_add("2:5:2", "10.0.2.5", 11)]
+
+
+def test_failed_commit_rebuilds_from_the_wanted_state(tc):
+    traffic = TrafficControl(batch_delay=0)
+    run(traffic.limit("10.0.0.5", rate="1mbit"))
+    tc.lines()
+
+    (tc.directory / "fail").touch()
+    (tc.directory / "root").write_text("qdisc htb 1d5: root refcnt 2\n")
+    assert not run(traffic.limit("10.0.0.7", rate="1mbit"))
+    assert traffic.stats()["failed_commits"] == 1
+    tc.lines()
+
+    (tc.directory / "fail").unlink()
+    assert run(traffic.limit("10.0.0.9", rate="1mbit"))
+    assert tc.lines() == ["tc qdisc show dev wlo1 root", "tc qdisc del dev wlo1 root", "tc -batch -", *SETUP,
+                          class_add(10, "1mbit"), filter_add("2:5:1", "10.0.0.5", 10),
+                          class_add(11, "1mbit"), filter_add("2:7:1", "10.0.0.7", 11),
+                          class_add(12, "1mbit"), filter_add("2:9:1", "10.0.0.9", 12)]
+
+
+def test_shaping_set_up_elsewhere_is_left_alone(tc):
+    (tc.directory / "root").write_text("qdisc htb 1: root refcnt 2 r2q 10 default 0\n")
+    traffic = TrafficControl(batch_delay=0)
+    assert not run(traffic.limit("10.0.0.5", rate="1mbit"))
+    assert tc.lines() == ["tc qdisc show dev wlo1 root"]
+
+    traffic.reset()
+    assert tc.lines() == ["tc qdisc show dev wlo1 root"]
+
+
+def test_reset_deletes_only_its_own_root(tc):
+    traffic = TrafficControl(batch_delay=0)
+    run(traffic.limit("10.0.0.5", rate="1mbit"))
+    tc.lines()
+    (tc.directory / "root").write_text("qdisc htb 1d5: root refcnt 2\n")
+    traffic.reset()
+    assert tc.lines() == ["tc qdisc show dev wlo1 root", "tc qdisc del dev wlo1 root"]
+    assert traffic.is_limited("10.0.0.5") is None
+
+
+def test_invalid_requests_are_refused(tc):
+    traffic = TrafficControl(batch_delay=0)
+    assert not run(traffic.limit("10.0.0.300"))
+    assert not run(traffic.limit("10.0.0.5", rate="1mbit; reboot"))
+    assert not run(traffic.limit("10.0.0.5", interface="wlo1 root"))
+    assert tc.lines() == []
+    assert traffic.stats()["invalid"] == 3